@@ -0,0 +1,127 @@
+"""Compose filtering benchmark.
+
+Compares filtering a large synthetic composefile before rendering (only
+selected services are rendered) with the previous approach (deep copy of
+the whole document, then rendering everything).
+
+Usage (docknv installed, e.g. `pip install -e .`):
+
+    python benchmarks/bench_compose_filter.py [services] [selected]
+"""
+
+from collections import OrderedDict
+import copy
+import sys
+import timeit
+
+from docknv.compose.filtering import composefile_filter_entries
+from docknv.template import renderer_render_compose_template
+
+
+def generate_content(service_count):
+    """
+    Generate a synthetic composefile content.
+
+    :param service_count:   Service count (int)
+    :rtype: Content (dict)
+    """
+    services = OrderedDict()
+    volumes = OrderedDict()
+    for i in range(service_count):
+        services[f"service{i}"] = OrderedDict(
+            [
+                ("image", f"registry/service{i}:{{{{ TAG }}}}"),
+                ("restart", "on-failure"),
+                ("ports", [f"{{{{ PORT_BASE + {i} }}}}:80"]),
+                (
+                    "environment",
+                    OrderedDict(
+                        (f"KEY_{k}", f"{{{{ VALUE }}}}_{k}") for k in range(10)
+                    ),
+                ),
+                (
+                    "volumes",
+                    OrderedDict(
+                        [
+                            ("standard", [f"volume{i}:/data"]),
+                            ("templates", [f"service{i}/conf.j2:/conf"]),
+                        ]
+                    ),
+                ),
+                ("networks", OrderedDict([("net", None)])),
+            ]
+        )
+        volumes[f"volume{i}"] = None
+
+    return OrderedDict(
+        [
+            ("version", "3"),
+            ("services", services),
+            ("volumes", volumes),
+            ("networks", OrderedDict([("net", None)])),
+        ]
+    )
+
+
+def legacy_filter(content, services, volumes, networks):
+    """Previous filtering: deep copy then delete unneeded entries."""
+    output = copy.deepcopy(content)
+    for key, needed in (
+        ("services", services),
+        ("volumes", volumes),
+        ("networks", networks),
+    ):
+        for name in [n for n in output[key] if n not in needed]:
+            del output[key][name]
+    return output
+
+
+def main(service_count=400, selected_count=10, number=5):
+    """Run benchmark."""
+    content = generate_content(service_count)
+    environment = {"TAG": "latest", "PORT_BASE": 8000, "VALUE": "value"}
+    services = [f"service{i}" for i in range(selected_count)]
+    volumes = [f"volume{i}" for i in range(selected_count)]
+    networks = ["net"]
+
+    cases = OrderedDict(
+        [
+            (
+                "legacy filter",
+                lambda: legacy_filter(content, services, volumes, networks),
+            ),
+            (
+                "indexed filter",
+                lambda: composefile_filter_entries(
+                    content, services, volumes, networks
+                ),
+            ),
+            (
+                "render all, then filter",
+                lambda: composefile_filter_entries(
+                    renderer_render_compose_template(content, environment),
+                    services,
+                    volumes,
+                    networks,
+                ),
+            ),
+            (
+                "filter, then render",
+                lambda: renderer_render_compose_template(
+                    composefile_filter_entries(
+                        content, services, volumes, networks
+                    ),
+                    environment,
+                ),
+            ),
+        ]
+    )
+
+    print(f"{service_count} services, {selected_count} selected")
+    for name, fn in cases.items():
+        elapsed = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        print(f"  {name:<25} {elapsed * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,126 @@
+"""Server benchmark.
+
+Compares command latency when each command starts from scratch (cold)
+and when it is forwarded to a `docknv serve` process (warm).
+
+Usage (docknv installed, e.g. `pip install -e .`):
+
+    python benchmarks/bench_server.py [runs]
+"""
+
+from collections import OrderedDict
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SAMPLE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "samples", "sample01"
+)
+
+
+def docknv_command(args):
+    """
+    Get a command line running docknv.
+
+    :param args:    Arguments (list)
+    :rtype: Command line (list)
+    """
+    code = (
+        "import sys\n"
+        "from docknv.shell.main import docknv_entry_point\n"
+        f"sys.argv = ['docknv'] + {args!r}\n"
+        "docknv_entry_point()\n"
+    )
+    return [sys.executable, "-c", code]
+
+
+def run_command(args, env):
+    """
+    Run a docknv command.
+
+    :param args:    Arguments (list)
+    :param env:     Environment (dict)
+    :rtype: Elapsed time (float)
+    """
+    start = time.perf_counter()
+    subprocess.run(
+        docknv_command(args),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def main(runs=20):
+    """Run benchmark."""
+    with tempfile.TemporaryDirectory() as tempdir:
+        project_path = os.path.join(tempdir, "sample01")
+        shutil.copytree(SAMPLE_PATH, project_path)
+
+        socket_path = os.path.join(tempdir, "docknv.sock")
+        env = dict(
+            os.environ, DOCKNV_SOCKET=socket_path, DOCKNV_FAKE_WRAPPER="1"
+        )
+        cold_env = dict(env, DOCKNV_NO_SERVER="1")
+
+        for name in ("first", "second"):
+            run_command(
+                [
+                    "-p",
+                    project_path,
+                    "config",
+                    "create",
+                    name,
+                    "-e",
+                    "default",
+                ],
+                cold_env,
+            )
+
+        commands = OrderedDict(
+            [
+                ("config ls", ["-p", project_path, "config", "ls"]),
+                ("schema ls", ["-p", project_path, "schema", "ls"]),
+                ("config status", ["-p", project_path, "config", "status"]),
+            ]
+        )
+
+        server = subprocess.Popen(
+            docknv_command(["-p", project_path, "serve"]),
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.05)
+
+            print(f"median of {runs} runs")
+            for name, args in commands.items():
+                results = []
+                for command_env in (cold_env, env):
+                    # Warm-up (and project load on the server side)
+                    run_command(args, command_env)
+                    results.append(
+                        statistics.median(
+                            run_command(args, command_env) for _ in range(runs)
+                        )
+                    )
+
+                cold_time, warm_time = results
+                print(
+                    f"  {name:<14} cold {cold_time * 1000:8.1f} ms"
+                    f"   warm {warm_time * 1000:8.1f} ms"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,87 @@
+"""CLI startup benchmark.
+
+Runs a few commands that never talk to the Docker daemon in fresh
+interpreters, with heavy dependencies loaded lazily (current behaviour)
+and eagerly (docker, jinja2 and slugify imported upfront, as before).
+
+Usage (docknv installed, e.g. `pip install -e .`):
+
+    python benchmarks/bench_startup.py [runs]
+"""
+
+from collections import OrderedDict
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ("docker", "jinja2", "slugify")
+SAMPLE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "samples", "sample01"
+)
+
+
+def run_command(args, eager=False):
+    """
+    Run a docknv command in a fresh interpreter.
+
+    :param args:    Arguments (list)
+    :param eager:   Import heavy modules upfront (bool) (default: False)
+    :rtype: Elapsed time (float)
+    """
+    preamble = f"import {', '.join(HEAVY_MODULES)}\n" if eager else ""
+    code = (
+        f"{preamble}"
+        "import sys\n"
+        "from docknv.shell.main import docknv_entry_point\n"
+        f"sys.argv = ['docknv'] + {args!r}\n"
+        "docknv_entry_point()\n"
+    )
+
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main(runs=10):
+    """Run benchmark."""
+    with tempfile.TemporaryDirectory() as tempdir:
+        project_path = os.path.join(tempdir, "sample01")
+        shutil.copytree(SAMPLE_PATH, project_path)
+
+        commands = OrderedDict(
+            [
+                ("--help", ["--help"]),
+                ("config ls", ["-p", project_path, "config", "ls"]),
+                ("schema ls", ["-p", project_path, "schema", "ls"]),
+            ]
+        )
+
+        print(f"median of {runs} runs")
+        for name, args in commands.items():
+            results = []
+            for eager in (True, False):
+                # Warm-up (filesystem caches, bytecode)
+                run_command(args, eager)
+                results.append(
+                    statistics.median(
+                        run_command(args, eager) for _ in range(runs)
+                    )
+                )
+
+            eager_time, lazy_time = results
+            print(
+                f"  {name:<12} eager {eager_time * 1000:8.1f} ms"
+                f"   lazy {lazy_time * 1000:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,248 @@
+"""Benchmark suite over synthetic projects.
+
+Measures project loading, environment resolution, configuration
+rendering, database saving and CLI startup on generated projects (see
+`generator.py`). Nothing talks to Docker: the CLI runs with `--dry-run`.
+
+Results can be saved as a baseline, and compared with a saved baseline
+(exit code 1 on regression).
+
+Usage (docknv installed, e.g. `pip install -e .`):
+
+    python benchmarks/bench_suite.py [--size small|large] [--repeat 5]
+        [--save NAME] [--compare NAME] [--tolerance 0.25]
+"""
+
+import argparse
+from collections import OrderedDict
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generator import SIZES, generate_project  # noqa: E402
+
+from docknv.compose import ComposeDefinition  # noqa: E402
+from docknv.compose.merging import composefile_clear_cache  # noqa: E402
+from docknv.environment import Environment  # noqa: E402
+from docknv.logger import Logger  # noqa: E402
+from docknv.project import Project  # noqa: E402
+
+BASELINES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baselines"
+)
+
+
+def measure(fn, repeat):
+    """
+    Measure a function.
+
+    :param fn:      Function (fn)
+    :param repeat:  Repetitions (int)
+    :rtype: Durations in seconds (list)
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+
+    return durations
+
+
+def run_cli(project_path):
+    """
+    Run `docknv config ls` in a fresh interpreter.
+
+    :param project_path:    Project path (str)
+    """
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys\n"
+            "from docknv.shell.main import docknv_entry_point\n"
+            "sys.argv = ['docknv', '--dry-run', '-p', sys.argv[1],"
+            " 'config', 'ls']\n"
+            "docknv_entry_point()\n",
+            project_path,
+        ],
+        env=dict(os.environ, DOCKNV_NO_SERVER="1"),
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+def get_cases(project_path, environment):
+    """
+    Get benchmark cases for a generated project.
+
+    :param project_path:    Project path (str)
+    :param environment:     Deepest environment name (str)
+    :rtype: Cases: name -> function (OrderedDict)
+    """
+    project = Project.load_from_path(project_path)
+    config = project.database.get_configuration("config1")
+    compose_def = ComposeDefinition.load_from_project(project_path)
+
+    def compose_merge():
+        # Measure parsing too, as a new process would
+        composefile_clear_cache()
+        ComposeDefinition.load_from_project(project_path)
+
+    return OrderedDict(
+        [
+            ("project_load", lambda: Project.load_from_path(project_path)),
+            (
+                "environment_load",
+                lambda: Environment.load_from_project(
+                    project_path, environment
+                ),
+            ),
+            ("compose_merge", compose_merge),
+            (
+                "apply_configuration",
+                lambda: compose_def.copy().apply_configuration(config),
+            ),
+            ("database_save", project.database.save),
+            ("cli_startup", lambda: run_cli(project_path)),
+        ]
+    )
+
+
+def run_suite(sizes, repeat):
+    """
+    Run the suite.
+
+    :param sizes:   Size names (list)
+    :param repeat:  Repetitions (int)
+    :rtype: Results: "size.case" -> {min, median} in seconds (dict)
+    """
+    results = OrderedDict()
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tempdir:
+            project_path = os.path.join(tempdir, "project")
+            environment = generate_project(project_path, **SIZES[size])
+
+            for name, fn in get_cases(project_path, environment).items():
+                # Warm-up
+                fn()
+                durations = measure(fn, repeat)
+                results[f"{size}.{name}"] = {
+                    "min": min(durations),
+                    "median": statistics.median(durations),
+                }
+
+            # Generated files could be big
+            shutil.rmtree(project_path)
+
+    return results
+
+
+def get_baseline_path(name):
+    """
+    Get a baseline path.
+
+    :param name:    Baseline name (str)
+    :rtype: Path (str)
+    """
+    return os.path.join(BASELINES_PATH, f"{name}.json")
+
+
+def save_baseline(name, results):
+    """
+    Save results as a baseline.
+
+    :param name:    Baseline name (str)
+    :param results: Results (dict)
+    """
+    os.makedirs(BASELINES_PATH, exist_ok=True)
+    with open(get_baseline_path(name), mode="w") as handle:
+        json.dump(
+            {
+                "machine": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "processor": platform.processor(),
+                },
+                "results": results,
+            },
+            handle,
+            indent=2,
+        )
+        handle.write("\n")
+
+
+def compare_baseline(name, results, tolerance):
+    """
+    Compare results with a baseline.
+
+    :param name:        Baseline name (str)
+    :param results:     Results (dict)
+    :param tolerance:   Allowed slowdown ratio (float)
+    :rtype: Regressed cases (list)
+    """
+    with open(get_baseline_path(name)) as handle:
+        baseline = json.load(handle)["results"]
+
+    regressions = []
+    print(f"\ncomparison with baseline '{name}' (best times)")
+    for case, values in results.items():
+        if case not in baseline:
+            continue
+
+        ratio = values["min"] / baseline[case]["min"]
+        marker = ""
+        if ratio > 1 + tolerance:
+            marker = "  REGRESSION"
+            regressions.append(case)
+        print(f"  {case:<28} {ratio:6.2f}x{marker}")
+
+    return regressions
+
+
+def main():
+    """Run benchmark suite."""
+    parser = argparse.ArgumentParser(description="docknv benchmark suite")
+    parser.add_argument(
+        "--size", choices=list(SIZES), action="append", help="project size"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions")
+    parser.add_argument("--save", help="save results as baseline NAME")
+    parser.add_argument("--compare", help="compare with baseline NAME")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown before reporting a regression",
+    )
+    args = parser.parse_args()
+
+    Logger.set_log_level("NONE")
+    results = run_suite(args.size or list(SIZES), args.repeat)
+
+    print(f"{'case':<30} {'min (ms)':>10} {'median (ms)':>12}")
+    for case, values in results.items():
+        print(
+            f"{case:<30} {values['min'] * 1000:>10.2f}"
+            f" {values['median'] * 1000:>12.2f}"
+        )
+
+    if args.save:
+        save_baseline(args.save, results)
+    if args.compare and compare_baseline(
+        args.compare, results, args.tolerance
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Synthetic project generator for benchmarks."""
+
+from collections import OrderedDict
+import os
+
+from docknv.user import user_get_username
+from docknv.utils.serialization import yaml_ordered_dump
+
+# Benchmark sizes
+SIZES = OrderedDict(
+    [
+        (
+            "small",
+            dict(
+                services=20,
+                composefiles=2,
+                configurations=2,
+                env_depth=2,
+                static_files=20,
+                templates=5,
+            ),
+        ),
+        (
+            "large",
+            dict(
+                services=400,
+                composefiles=20,
+                configurations=20,
+                env_depth=20,
+                static_files=1000,
+                templates=100,
+            ),
+        ),
+    ]
+)
+
+ENV_VARIABLE_COUNT = 20
+FILES_PER_FOLDER = 10
+
+
+def generate_project(
+    path,
+    services=50,
+    composefiles=5,
+    configurations=5,
+    env_depth=5,
+    static_files=100,
+    templates=20,
+):
+    """
+    Generate a synthetic project.
+
+    Configurations are written in the database: composefiles and
+    environment files are not generated for them.
+
+    :param path:            Project path (str)
+    :param services:        Service count (int)
+    :param composefiles:    Composefile count (int)
+    :param configurations:  Configuration count (int)
+    :param env_depth:       Environment import chain length (int)
+    :param static_files:    Static files, in a single tree (int)
+    :param templates:       Template count (int)
+    :rtype: Deepest environment name (str)
+    """
+    for folder in ("composefiles", "envs", "images", ".docknv"):
+        os.makedirs(os.path.join(path, folder), exist_ok=True)
+
+    _write_yaml(
+        os.path.join(path, "config.yml"),
+        {"schemas": {"all": {"services": ["service0"]}}},
+    )
+    environment = _generate_environments(path, env_depth)
+    _generate_files(path, static_files, templates)
+    _generate_composefiles(path, services, composefiles, templates)
+    _generate_database(path, services, configurations, environment)
+
+    return environment
+
+
+def _write_yaml(path, content):
+    with open(path, mode="w") as handle:
+        handle.write(yaml_ordered_dump(content))
+
+
+def _generate_environments(path, depth):
+    for level in range(depth):
+        content = OrderedDict()
+        if level > 0:
+            content["imports"] = [f"env{level - 1}"]
+
+        variables = OrderedDict()
+        for i in range(ENV_VARIABLE_COUNT):
+            name = f"VAR_{level}_{i}"
+            if level > 0:
+                variables[name] = f"${{VAR_{level - 1}_{i}}}-{level}"
+            else:
+                variables[name] = f"value{i}"
+        variables["PORT_BASE"] = 8000
+        variables["TAG"] = f"level{level}"
+        content["environment"] = variables
+
+        _write_yaml(os.path.join(path, "envs", f"env{level}.env.yml"), content)
+
+    return f"env{depth - 1}"
+
+
+def _generate_files(path, static_files, templates):
+    files_path = os.path.join(path, "data", "files")
+
+    for i in range(static_files):
+        folder = os.path.join(
+            files_path, "static", f"folder{i // FILES_PER_FOLDER}"
+        )
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"file{i}.txt"), mode="w") as handle:
+            handle.write(f"static file {i}\n" * 10)
+
+    templates_path = os.path.join(files_path, "templates")
+    os.makedirs(templates_path, exist_ok=True)
+    for i in range(templates):
+        with open(
+            os.path.join(templates_path, f"template{i}.conf.j2"), mode="w"
+        ) as handle:
+            handle.write(
+                "".join(
+                    f"key{k} = {{{{ VAR_0_{k % ENV_VARIABLE_COUNT} }}}}\n"
+                    for k in range(20)
+                )
+            )
+
+
+def _generate_composefiles(path, services, composefiles, templates):
+    for file_index in range(composefiles):
+        content = OrderedDict(
+            [
+                ("version", "3"),
+                ("services", OrderedDict()),
+                ("volumes", OrderedDict()),
+                ("networks", OrderedDict([("net", None)])),
+            ]
+        )
+
+        for i in range(file_index, services, composefiles):
+            volumes = OrderedDict(
+                [
+                    ("standard", [f"volume{i}:/data"]),
+                    (
+                        "templates",
+                        [
+                            f"templates/template{i % templates}.conf.j2"
+                            f":/etc/service.conf"
+                        ],
+                    ),
+                ]
+            )
+            if i == 0:
+                volumes["static"] = ["static:/static"]
+
+            content["services"][f"service{i}"] = OrderedDict(
+                [
+                    ("image", f"registry/service{i}:{{{{ TAG }}}}"),
+                    ("restart", "on-failure"),
+                    ("ports", [f"{{{{ PORT_BASE + {i} }}}}:80"]),
+                    (
+                        "environment",
+                        OrderedDict(
+                            (f"KEY_{k}", f"{{{{ VAR_0_{k} }}}}")
+                            for k in range(10)
+                        ),
+                    ),
+                    ("volumes", volumes),
+                    (
+                        "networks",
+                        OrderedDict(
+                            [("net", {"aliases": [f"service{i}-alias"]})]
+                        ),
+                    ),
+                ]
+            )
+            content["volumes"][f"volume{i}"] = None
+
+        _write_yaml(
+            os.path.join(path, "composefiles", f"compose{file_index}.yml"),
+            content,
+        )
+
+
+def _generate_database(path, services, configurations, environment):
+    username = user_get_username()
+    selected = max(1, services // 4)
+
+    database = OrderedDict()
+    for k in range(configurations):
+        # Rotating windows, always including the static service
+        indices = sorted(
+            {0} | {(k * selected + i) % services for i in range(selected)}
+        )
+        database[f"config{k}"] = OrderedDict(
+            [
+                ("user", username),
+                ("environment", environment),
+                ("services", [f"service{i}" for i in indices]),
+                ("volumes", [f"volume{i}" for i in indices]),
+                ("networks", ["net"]),
+                ("namespace", f"ns{k}" if k % 2 else None),
+            ]
+        )
+
+    _write_yaml(os.path.join(path, ".docknv", ".docknv.yml"), database)
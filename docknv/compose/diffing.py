@@ -0,0 +1,146 @@
+"""Composefile diffing methods."""
+
+from collections import OrderedDict
+import hashlib
+import os
+
+from docknv.volume import Volume
+
+
+def composefile_snapshot_services(content, project_path, files_root):
+    """
+    Snapshot each service effective definition.
+
+    Besides the service definition, generated files referenced by the
+    service (environment file, rendered templates, static files) are
+    fingerprinted so that content-only changes are detected.
+
+    :param content:         Compose content (dict)
+    :param project_path:    Project path (str)
+    :param files_root:      Only fingerprint files in this folder (str)
+    :rtype: Snapshot per service (dict)
+    """
+    snapshot = OrderedDict()
+    services = (content or {}).get("services") or {}
+    files_root = os.path.join(os.path.abspath(files_root), "")
+
+    for service_name, service_data in services.items():
+        service_data = service_data or {}
+        files = OrderedDict()
+
+        for path in _get_service_file_paths(service_data):
+            full_path = os.path.abspath(os.path.join(project_path, path))
+            if not full_path.startswith(files_root):
+                continue
+
+            fingerprint = _fingerprint_path(full_path)
+            if fingerprint is not None:
+                files[path] = fingerprint
+
+        snapshot[service_name] = {"definition": service_data, "files": files}
+
+    return snapshot
+
+
+def composefile_diff_services(old_snapshot, new_snapshot):
+    """
+    Compute a per-service diff between two snapshots.
+
+    :param old_snapshot:    Old snapshot (dict)
+    :param new_snapshot:    New snapshot (dict)
+    :rtype: Changes per changed service (OrderedDict)
+    """
+    diff = OrderedDict()
+
+    for service_name, new_entry in new_snapshot.items():
+        if service_name not in old_snapshot:
+            diff[service_name] = ["added"]
+            continue
+
+        old_entry = old_snapshot[service_name]
+        changes = []
+
+        old_def = old_entry["definition"]
+        new_def = new_entry["definition"]
+        for key in _ordered_union(old_def, new_def):
+            if key not in old_def:
+                changes.append(f"+{key}")
+            elif key not in new_def:
+                changes.append(f"-{key}")
+            elif old_def[key] != new_def[key]:
+                changes.append(f"~{key}")
+
+        old_files = old_entry["files"]
+        new_files = new_entry["files"]
+        for path in _ordered_union(old_files, new_files):
+            if old_files.get(path) != new_files.get(path):
+                changes.append(f"~file:{path}")
+
+        if changes:
+            diff[service_name] = changes
+
+    for service_name in old_snapshot:
+        if service_name not in new_snapshot:
+            diff[service_name] = ["removed"]
+
+    return diff
+
+
+def _ordered_union(first, second):
+    keys = list(first)
+    keys += [key for key in second if key not in first]
+    return keys
+
+
+def _get_service_file_paths(service_data):
+    paths = []
+
+    env_files = service_data.get("env_file") or []
+    if isinstance(env_files, str):
+        env_files = [env_files]
+    paths += env_files
+
+    volumes = service_data.get("volumes") or []
+    if isinstance(volumes, list):
+        for entry in volumes:
+            if not isinstance(entry, str) or entry == "":
+                continue
+            try:
+                volume = Volume.load_from_entry(entry)
+            except Exception:
+                continue
+            if not volume.is_named:
+                paths.append(volume.host_path)
+
+    return paths
+
+
+def _fingerprint_path(path):
+    if os.path.isfile(path):
+        return _hash_file(path)
+
+    if os.path.isdir(path):
+        # Static folders are copied with metadata, no need to read them
+        entries = []
+        for root, _folders, filenames in os.walk(path):
+            for filename in sorted(filenames):
+                full_path = os.path.join(root, filename)
+                stat = os.stat(full_path)
+                entries.append(
+                    (
+                        os.path.relpath(full_path, path),
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                    )
+                )
+        return hashlib.sha1(repr(sorted(entries)).encode("utf-8")).hexdigest()
+
+    return None
+
+
+def _hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, mode="rb") as handle:
+        for chunk in iter(lambda: handle.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -1,6 +1,8 @@
 """Composefile filter methods."""
 
-import copy
+from collections import OrderedDict
+
+FILTERED_SECTIONS = ("services", "volumes", "networks")
 
 
 def composefile_filter(content, config):
@@ -8,54 +10,48 @@ def composefile_filter(content, config):
     Filter composefile content using a configuration.
 
     :param content:     Compose file content (dict)
-    :param config:      Configuration (dict)
+    :param config:      Config (Configuration)
     :rtype: Filtered content (dict)
     """
-    needed_volumes = config.volumes
-    needed_services = config.services
-    needed_networks = config.networks
-
-    new_merged = copy.deepcopy(content)
-    _composefile_filter_volumes(new_merged, needed_volumes)
-    _composefile_filter_networks(new_merged, needed_networks)
-    _composefile_filter_services(new_merged, needed_services)
-
-    return new_merged
-
-
-def _composefile_filter_volumes(content, needed):
-    to_remove = []
-    if "volumes" in content:
-        for volume_name in content["volumes"]:
-            if volume_name not in needed:
-                to_remove.append(volume_name)
-
-    for value in to_remove:
-        del content["volumes"][value]
-
-    return content
-
+    return composefile_filter_entries(
+        content,
+        services=config.services,
+        volumes=config.volumes,
+        networks=config.networks,
+    )
 
-def _composefile_filter_services(content, needed):
-    to_remove = []
-    for service_name in content["services"]:
-        if service_name not in needed:
-            to_remove.append(service_name)
 
-    for value in to_remove:
-        del content["services"][value]
-
-    return content
-
-
-def _composefile_filter_networks(content, needed):
-    to_remove = []
-    if "networks" in content:
-        for network_name in content["networks"]:
-            if network_name not in needed:
-                to_remove.append(network_name)
+def composefile_filter_entries(
+    content, services=None, volumes=None, networks=None
+):
+    """
+    Filter composefile content by entry names.
 
-    for value in to_remove:
-        del content["networks"][value]
+    A new document is built containing only the selected entries, in
+    document order. Entries are not copied: the result shares them with
+    `content`, so it must not be modified in-place.
 
-    return content
+    :param content:     Compose file content (dict)
+    :param services:    Services to keep (iterable?)
+    :param volumes:     Volumes to keep (iterable?)
+    :param networks:    Networks to keep (iterable?)
+    :rtype: Filtered content (dict)
+    """
+    needed = {
+        "services": set(services or []),
+        "volumes": set(volumes or []),
+        "networks": set(networks or []),
+    }
+
+    output = OrderedDict()
+    for key, value in content.items():
+        if key in FILTERED_SECTIONS and isinstance(value, dict):
+            output[key] = OrderedDict(
+                (name, entry)
+                for name, entry in value.items()
+                if name in needed[key]
+            )
+        else:
+            output[key] = value
+
+    return output
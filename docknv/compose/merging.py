@@ -0,0 +1,101 @@
+"""Composefile merge methods."""
+
+from collections import OrderedDict
+import copy
+import os
+import threading
+
+from docknv.utils.ioutils import io_open
+from docknv.utils.serialization import yaml_ordered_load
+from docknv.utils.tracing import traced
+
+INDEXED_SECTIONS = ("services", "volumes", "networks")
+
+_parse_cache = {}
+_parse_cache_lock = threading.Lock()
+
+
+def composefile_load_cached(path):
+    """
+    Parse a composefile, using a cache keyed by file fingerprint.
+
+    The returned content is shared and must not be modified.
+
+    :param path:    Composefile path (str)
+    :rtype: Content (dict)
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    fingerprint = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    with _parse_cache_lock:
+        cached = _parse_cache.get(path)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    with io_open(path, mode="r") as handle:
+        content = yaml_ordered_load(handle.read())
+
+    with _parse_cache_lock:
+        _parse_cache[path] = (fingerprint, content)
+
+    return content
+
+
+def composefile_clear_cache():
+    """Clear the composefile parse cache."""
+    with _parse_cache_lock:
+        _parse_cache.clear()
+
+
+@traced("compose.merge")
+def composefile_merge(paths):
+    """
+    Merge composefiles in a single pass.
+
+    Paths are merged in sorted order. Semantics are the same as
+    `yaml_merge`: dicts are merged recursively, list items are appended
+    if missing and scalar values from the first file win.
+
+    :param paths:   Composefile paths (iterable)
+    :rtype: (Merged content (dict), Sources (dict))
+
+    Sources map each section (services, volumes, networks) to the
+    composefiles defining each entry.
+    """
+    merged = OrderedDict()
+    sources = OrderedDict(
+        (section, OrderedDict()) for section in INDEXED_SECTIONS
+    )
+
+    for path in sorted(paths):
+        content = composefile_load_cached(path)
+        if not isinstance(content, dict):
+            continue
+
+        for section in INDEXED_SECTIONS:
+            entries = content.get(section)
+            if isinstance(entries, dict):
+                for name in entries:
+                    sources[section].setdefault(name, []).append(path)
+
+        _merge_into(merged, content)
+
+    return merged, sources
+
+
+def _merge_into(dst, src):
+    """Merge `src` into `dst` in-place, copying what is taken from `src`."""
+    for key, value in src.items():
+        if key not in dst:
+            dst[key] = copy.deepcopy(value)
+            continue
+
+        current = dst[key]
+        if isinstance(current, dict) and isinstance(value, dict):
+            _merge_into(current, value)
+        elif isinstance(current, list) and isinstance(value, list):
+            existing = list(current)
+            for item in value:
+                if item not in existing:
+                    current.append(copy.deepcopy(item))
@@ -8,7 +8,7 @@ def composefile_get_composefile_paths(project_path):
     Read composefiles from project.
 
     :param project_path:    Project path (str)
-    :rtype: Composefile path list
+    :rtype: Composefile path list, sorted
     """
     from docknv.project.exceptions import MalformedProject
 
@@ -18,5 +18,5 @@ def composefile_get_composefile_paths(project_path):
 
     return [
         os.path.join(project_path, "composefiles", d)
-        for d in os.listdir(composefiles_path)
+        for d in sorted(os.listdir(composefiles_path))
     ]
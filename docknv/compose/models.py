@@ -3,16 +3,14 @@
 import os
 
 from docknv.utils.ioutils import io_open
-from docknv.utils.serialization import (
-    yaml_merge,
-    yaml_ordered_load,
-    yaml_ordered_dump,
-)
+from docknv.utils.serialization import yaml_ordered_load, yaml_ordered_dump
 
 from docknv.template import renderer_render_compose_template
+from docknv.utils.timing import using_timer
 
 from .methods import composefile_get_composefile_paths
-from .filtering import composefile_filter
+from .filtering import composefile_filter, composefile_filter_entries
+from .merging import composefile_merge
 from .namespacing import composefile_apply_namespace
 from .resolution import (
     composefile_resolve_services,
@@ -25,9 +23,15 @@ from .exceptions import MissingComposefile
 class ComposeDefinition(object):
     """Compose definition."""
 
-    def __init__(self, data=None):
-        """Init."""
+    def __init__(self, data=None, sources=None):
+        """
+        Init.
+
+        :param data:    Content (dict?)
+        :param sources: Composefiles defining each entry, per section (dict?)
+        """
         self.content = data or {}
+        self.sources = sources or {}
 
     @classmethod
     def load_from_path(cls, path):
@@ -52,39 +56,78 @@ class ComposeDefinition(object):
         :param project_path:    Project path (str)
         """
         paths = composefile_get_composefile_paths(project_path)
-        composefile_content = {}
+        content, sources = composefile_merge(paths)
 
-        for path in paths:
-            with io_open(path, mode="r") as handle:
-                content = yaml_ordered_load(handle.read())
-                composefile_content = yaml_merge(
-                    [composefile_content, content]
-                )
+        return cls(content, sources)
+
+    def copy(self):
+        """
+        Shallow copy.
+
+        Pipeline stages never mutate their input, so copies can share
+        the same content.
+
+        :rtype: ComposeDefinition
+        """
+        return ComposeDefinition(self.content, self.sources)
+
+    def filter_entries(self, services=None, volumes=None, networks=None):
+        """
+        Filter services, volumes and networks by name.
+
+        :param services:    Services to keep (iterable?)
+        :param volumes:     Volumes to keep (iterable?)
+        :param networks:    Networks to keep (iterable?)
+        :rtype: Filtered ComposeDefinition
+        """
+        return ComposeDefinition(
+            composefile_filter_entries(
+                self.content, services, volumes, networks
+            ),
+            self.sources,
+        )
 
-        return cls(composefile_content)
+    def render(self, environment_data):
+        """
+        Render composefile template using environment data.
 
-    def apply_configuration(self, config):
+        :param environment_data:    Environment data (dict)
+        :rtype: Rendered ComposeDefinition
+        """
+        return ComposeDefinition(
+            renderer_render_compose_template(self.content, environment_data),
+            self.sources,
+        )
+
+    def apply_configuration(self, config, rendered=False, timings=None):
         """
         Apply configuration.
 
         - Filter services, volumes and networks.
-        - Render composefile template
+        - Render composefile template (unless already rendered)
         - Resolve volumes
         - Resolve services
         - Apply namespaces
 
-        :param config:  Configuration
+        :param config:      Configuration
+        :param rendered:    Content already rendered? (bool) (default: False)
+        :param timings:     Stage timings output (dict?) (default: None)
         """
         content = self.content
-        content = composefile_filter(content, config)
-        content = renderer_render_compose_template(
-            content, config.environment_data.data
-        )
-        content = composefile_resolve_services(content)
-        content = composefile_resolve_volumes(content, config)
-        content = composefile_apply_namespace(
-            content, config.namespace, config.environment
-        )
+        with using_timer(timings, "filter"):
+            content = composefile_filter(content, config)
+        if not rendered:
+            with using_timer(timings, "render"):
+                content = renderer_render_compose_template(
+                    content, config.environment_data.data
+                )
+        with using_timer(timings, "resolve"):
+            content = composefile_resolve_services(content)
+            content = composefile_resolve_volumes(content, config)
+        with using_timer(timings, "namespace"):
+            content = composefile_apply_namespace(
+                content, config.namespace, config.environment
+            )
 
         self.content = content
 
@@ -100,6 +143,16 @@ class ComposeDefinition(object):
         """Get networks."""
         return self.content.get("networks", [])
 
+    def get_sources(self, section, name):
+        """
+        Get composefiles defining an entry.
+
+        :param section: Section (services, volumes or networks) (str)
+        :param name:    Entry name (str)
+        :rtype: Composefile paths (list)
+        """
+        return self.sources.get(section, {}).get(name, [])
+
     def save_to_path(self, path):
         """
         Save content to path.
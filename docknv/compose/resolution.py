@@ -4,9 +4,8 @@ import copy
 import os
 import shutil
 
-from slugify import slugify
-
 from docknv.utils.paths import create_path_or_replace, create_path_tree
+from docknv.utils.tracing import using_span
 
 from docknv.template import renderer_render_template
 from docknv.volume import Volume, volume_generate_namespaced_root
@@ -137,16 +136,19 @@ def _composefile_resolve_static_volumes(volumes, config, output):
             files_to_copy = _get_files_to_copy(data_path, output_path)
 
             # Copy !
-            for file_to_copy, output_path_to_copy in files_to_copy:
-                create_path_tree(os.path.dirname(output_path_to_copy))
-
-                if os.path.isdir(file_to_copy):
-                    try:
-                        os.mkdir(file_to_copy)
-                    except Exception:
-                        pass
-                else:
-                    shutil.copy2(file_to_copy, output_path_to_copy)
+            with using_span(
+                "files.copy", path=data_path, count=len(files_to_copy)
+            ):
+                for file_to_copy, output_path_to_copy in files_to_copy:
+                    create_path_tree(os.path.dirname(output_path_to_copy))
+
+                    if os.path.isdir(file_to_copy):
+                        try:
+                            os.mkdir(file_to_copy)
+                        except Exception:
+                            pass
+                    else:
+                        shutil.copy2(file_to_copy, output_path_to_copy)
 
             volume_object.host_path = output_path
             output.append(str(volume_object))
@@ -216,6 +218,9 @@ def _composefile_resolve_standard_volumes(volumes, output):
 
 
 def _composefile_resolve_networks(services, namespace):
+    # Loaded on first use, slugify is slow to import
+    from slugify import slugify
+
     if "networks" in services:
         for network_name in services["networks"]:
             network = services["networks"][network_name]
@@ -1,5 +1,7 @@
 """Database handler models."""
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import copy
 import os
 import shutil
@@ -11,6 +13,7 @@ from docknv.logger import Logger, Fore
 from docknv.utils.ioutils import io_open
 from docknv.utils.prompt import prompt_yes_no
 from docknv.utils.serialization import yaml_ordered_load, yaml_ordered_dump
+from docknv.utils.timing import using_timer
 
 from docknv.user import (
     UserSession,
@@ -28,6 +31,19 @@ from .exceptions import MissingConfiguration, PermissionDenied
 class Configuration(object):
     """Configuration."""
 
+    __slots__ = (
+        "database",
+        "name",
+        "user",
+        "environment",
+        "services",
+        "volumes",
+        "networks",
+        "namespace",
+        "environment_data",
+        "session",
+    )
+
     def __init__(
         self,
         database,
@@ -259,11 +275,102 @@ class Database(object):
         if not config.has_permission():
             raise PermissionDenied(user_get_username())
 
+        # Environment may have been changed
+        if config.environment_data.name != config.environment:
+            config.environment_data = Environment.load_from_project(
+                self.project_path, config.environment
+            )
+
         # Generate composefile
         config.generate_composefile()
         # Generate environment file
         config.generate_environment_file()
 
+    def regenerate_configurations(
+        self, config_names=None, max_workers=None, compose_def=None
+    ):
+        """
+        Regenerate multiple configurations at once.
+
+        Composefiles are merged once and each environment is loaded and
+        rendered once for all the configurations using it. Remaining
+        per-configuration stages (filtering, resolution, namespacing and
+        writing) run concurrently.
+
+        :param config_names:    Config names (list?) (default: all)
+        :param max_workers:     Max concurrent configurations (int?)
+        :param compose_def:     Already merged compose definition (optional)
+        :rtype: (Shared timings (dict), Timings per configuration (dict))
+        """
+        if config_names is None:
+            config_names = sorted(self.configurations)
+        configs = [self.get_configuration(name) for name in config_names]
+
+        # Check for permission
+        username = user_get_username()
+        for config in configs:
+            if not config.has_permission(username):
+                raise PermissionDenied(username)
+
+        shared_timings = OrderedDict()
+        if compose_def is None:
+            with using_timer(shared_timings, "merge"):
+                compose_def = ComposeDefinition.load_from_project(
+                    self.project_path
+                )
+
+        # Group configurations by environment
+        groups = OrderedDict()
+        for config in configs:
+            groups.setdefault(config.environment, []).append(config)
+
+        # One environment load and one template render per environment,
+        # limited to the entries used by the configurations of the group
+        environments = {}
+        rendered_defs = {}
+        for env_name, group in groups.items():
+            with using_timer(shared_timings, "environment"):
+                environments[env_name] = Environment.load_from_project(
+                    self.project_path, env_name
+                )
+            with using_timer(shared_timings, "render"):
+                group_def = compose_def.filter_entries(
+                    services={s for c in group for s in c.services},
+                    volumes={v for c in group for v in c.volumes},
+                    networks={n for c in group for n in c.networks},
+                )
+                rendered_defs[env_name] = group_def.render(
+                    environments[env_name].data
+                )
+
+        def _regenerate(config):
+            timings = OrderedDict()
+            environment = environments[config.environment]
+            config.environment_data = environment
+
+            config_def = rendered_defs[config.environment].copy()
+            config_def.apply_configuration(
+                config, rendered=True, timings=timings
+            )
+            with using_timer(timings, "write"):
+                config_def.save_to_path(config.get_composefile_path())
+                environment.save_key_values_to_path(
+                    config.get_environment_path()
+                )
+
+            return timings
+
+        results = OrderedDict()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                (config.name, executor.submit(_regenerate, config))
+                for config in configs
+            ]
+            for name, future in futures:
+                results[name] = future.result()
+
+        return shared_timings, results
+
     def remove_configuration(self, config_name, force=False):
         """
         Remove configuration.
@@ -301,6 +408,26 @@ class Database(object):
             # Write database
             self.save()
 
+    def query_configurations(self, config_names=None):
+        """
+        Query configurations as plain data.
+
+        :param config_names:    Configuration names (list?) (default: all)
+        :rtype: Configuration data list (list)
+        """
+        current = self.project.session.get_current_configuration()
+        if config_names is None:
+            config_names = list(self.configurations)
+
+        entries = []
+        for name in config_names:
+            config = self.get_configuration(name)
+            entry = OrderedDict([("name", name), ("current", name == current)])
+            entry.update(config.serialize())
+            entries.append(entry)
+
+        return entries
+
     def show_configuration_list(self):
         """Show configuration list."""
         len_values = len(self.configurations)
@@ -310,9 +437,10 @@ class Database(object):
                 "use `docknv config create` to generate configurations."
             )
         else:
-            Logger.info("known configurations:")
-            for conf in self.configurations.values():
-                conf.show()
+            with Logger.batch():
+                Logger.info("known configurations:")
+                for conf in self.configurations.values():
+                    conf.show()
 
     @classmethod
     def load_from_project(cls, project):
@@ -267,6 +267,36 @@ def env_get_yaml_path(project_path, name):
     return os.path.join(project_path, "envs", "".join((name, ".env.yml")))
 
 
+def env_get_imported_environments(project_path, name):
+    """
+    Get every environment imported by an environment, recursively.
+
+    Missing environments are ignored.
+
+    :param project_path:    Project path (str)
+    :param name:            Environment name (str)
+    :rtype: Imported environment names (set)
+    """
+    imported = set()
+    to_visit = [name]
+
+    while to_visit:
+        current = to_visit.pop()
+        path = env_get_yaml_path(project_path, current)
+        if not os.path.isfile(path):
+            continue
+
+        with io_open(path, mode="r") as handle:
+            env_content = yaml_ordered_load(handle.read()) or {}
+
+        for entry in env_content.get("imports") or []:
+            if entry != name and entry not in imported:
+                imported.add(entry)
+                to_visit.append(entry)
+
+    return imported
+
+
 def env_set_env_value(env_path, key, value):
     """
     Set environment value from file at `env_path`.
@@ -8,6 +8,7 @@ from docknv.logger import Logger, Fore
 
 from docknv.utils.serialization import yaml_ordered_load
 from docknv.utils.ioutils import io_open
+from docknv.utils.tracing import traced
 
 from .methods import env_get_yaml_path, env_yaml_resolve_variables
 
@@ -122,8 +123,9 @@ class EnvironmentCollection(object):
         if len(self.environments) == 0:
             Logger.warn("no env file found")
         else:
-            for name in self.environments.keys():
-                Logger.raw(f"- Environment: {name}")
+            with Logger.batch():
+                for name in self.environments.keys():
+                    Logger.raw(f"- Environment: {name}")
 
 
 class Environment(object):
@@ -150,6 +152,7 @@ class Environment(object):
         return self.data.__getitem__(key)
 
     @classmethod
+    @traced("environment.load")
     def load_from_project(cls, project_path, name):
         """
         Load from project.
@@ -238,8 +241,9 @@ class Environment(object):
 
     def show(self):
         """Show."""
-        Logger.raw(f"- Environment: {self.name}")
-        for key, value in self.data.items():
-            Logger.raw(f"  {key}", color=Fore.YELLOW, linebreak=False)
-            Logger.raw(" = ", linebreak=False)
-            Logger.raw(value, color=Fore.BLUE)
+        with Logger.batch():
+            Logger.raw(f"- Environment: {self.name}")
+            for key, value in self.data.items():
+                Logger.raw(f"  {key}", color=Fore.YELLOW, linebreak=False)
+                Logger.raw(" = ", linebreak=False)
+                Logger.raw(value, color=Fore.BLUE)
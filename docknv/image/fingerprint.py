@@ -0,0 +1,156 @@
+"""Build context fingerprints, to skip unchanged image builds."""
+
+import hashlib
+import json
+import os
+import stat
+
+from docknv.utils.ioutils import io_open
+
+FINGERPRINT_LABEL = "io.docknv.fingerprint"
+FINGERPRINT_INDEX_NAME = "images.json"
+
+
+def fingerprint_get_context(
+    context_path,
+    dockerfile="Dockerfile",
+    build_args=None,
+    file_hashes=None,
+    base_images=None,
+    build_options=None,
+):
+    """
+    Get the fingerprint of a build context.
+
+    Files excluded by `.dockerignore` are skipped, as they are not sent
+    to the daemon. Build args, build options and local base images are
+    part of the fingerprint: rebuilding a base image changes its children,
+    and other target stages of a Dockerfile get other fingerprints.
+
+    :param context_path:    Context path (str)
+    :param dockerfile:      Dockerfile path, relative to the context
+        (str) (default: Dockerfile)
+    :param build_args:      Build args, as KEY=VALUE (list?)
+    :param file_hashes:     Content hashes by path, set for every file of
+        the context: unchanged files are not read again (dict?)
+    :param base_images:     Local base image IDs, by reference (dict?)
+    :param build_options:   Other `docker build` options (list?)
+    :rtype: Fingerprint (str)
+    """
+    # The Docker SDK is slow to import, load it on first use
+    from docker.utils.build import exclude_paths
+
+    file_hashes = {} if file_hashes is None else file_hashes
+    dockerfile = dockerfile or "Dockerfile"
+    context_path = os.path.abspath(context_path)
+
+    digest = hashlib.sha256()
+    digest.update(f"dockerfile {dockerfile}\n".encode("utf-8"))
+    for arg in sorted(build_args or []):
+        digest.update(f"arg {arg}\n".encode("utf-8"))
+    for option in build_options or []:
+        digest.update(f"option {option}\n".encode("utf-8"))
+    for reference, image_id in sorted((base_images or {}).items()):
+        digest.update(f"base {reference} {image_id}\n".encode("utf-8"))
+
+    patterns = fingerprint_load_dockerignore(context_path)
+    paths = sorted(exclude_paths(context_path, patterns, dockerfile))
+
+    # Dockerfiles may be out of the context
+    dockerfile_path = os.path.join(context_path, dockerfile)
+    if not os.path.abspath(dockerfile_path).startswith(context_path + os.sep):
+        paths.append(dockerfile_path)
+
+    for path in paths:
+        full_path = os.path.join(context_path, path)
+        entry = _get_entry_signature(full_path, file_hashes)
+        digest.update(f"{path}\0{entry}\n".encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def fingerprint_load_dockerignore(context_path):
+    """
+    Load `.dockerignore` patterns of a build context.
+
+    :param context_path:    Context path (str)
+    :rtype: Patterns (list)
+    """
+    path = os.path.join(context_path, ".dockerignore")
+    if not os.path.isfile(path):
+        return []
+
+    with io_open(path, encoding="utf-8", mode="r") as handle:
+        lines = [line.strip() for line in handle.read().splitlines()]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def fingerprint_get_index_path(project):
+    """
+    Get the fingerprint index path of a project.
+
+    :param project: Project
+    :rtype: Index path (str)
+    """
+    return project.session.get_paths().get_file_path(FINGERPRINT_INDEX_NAME)
+
+
+def fingerprint_load_index(path):
+    """
+    Load a fingerprint index.
+
+    :param path:    Index path (str)
+    :rtype: Index: `images` by tag and `files` by path (dict)
+    """
+    index = {}
+    if os.path.isfile(path):
+        with io_open(path, mode="r") as handle:
+            index = json.load(handle)
+
+    index.setdefault("images", {})
+    index.setdefault("files", {})
+    return index
+
+
+def fingerprint_save_index(path, index):
+    """
+    Save a fingerprint index.
+
+    :param path:    Index path (str)
+    :param index:   Index (dict)
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with io_open(path, mode="w") as handle:
+        json.dump(index, handle)
+
+
+# PRIVATE ##########
+
+
+def _get_entry_signature(path, file_hashes):
+    stats = os.lstat(path)
+    mode = stat.S_IMODE(stats.st_mode)
+
+    if stat.S_ISLNK(stats.st_mode):
+        return f"link {os.readlink(path)}"
+    if stat.S_ISDIR(stats.st_mode):
+        return f"dir {mode:o}"
+
+    # Hashes are reused while size and modification time are unchanged
+    signature = [stats.st_mtime_ns, stats.st_size]
+    known = file_hashes.get(path)
+    if known and known[:2] == signature:
+        content_hash = known[2]
+    else:
+        content_hash = _hash_file(path)
+    file_hashes[path] = [*signature, content_hash]
+
+    return f"file {mode:o} {content_hash}"
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, mode="rb") as handle:
+        for chunk in iter(lambda: handle.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -1,9 +1,26 @@
 """Image methods."""
 
+import fnmatch
+import json
 import os
+import re
 
 from docknv.utils.ioutils import io_open
 
+IMAGE_INDEX_VERSION = 1
+IMAGE_IGNORE_FILE_NAME = ".docknvignore"
+IMAGE_DEFAULT_IGNORE_PATTERNS = [".*", "node_modules", "__pycache__"]
+
+DOCKERFILE_ARG_PATTERN = re.compile(
+    r"^\s*ARG\s+([A-Za-z_][A-Za-z0-9_]*)(?:=(\S*))?", re.IGNORECASE
+)
+DOCKERFILE_FROM_PATTERN = re.compile(
+    r"^\s*FROM\s+(?:--\S+\s+)*(\S+)(?:\s+AS\s+(\S+))?", re.IGNORECASE
+)
+DOCKERFILE_VARIABLE_PATTERN = re.compile(
+    r"\$(?:\{([A-Za-z_][A-Za-z0-9_]*)\}|([A-Za-z_][A-Za-z0-9_]*))"
+)
+
 
 def image_check_dockerfile(project_path, image_name):
     """
@@ -42,3 +59,197 @@ def image_load_in_memory(project_path, image_name):
     filepath = image_get_dockerfile_path(project_path, image_name)
     with io_open(filepath, encoding="utf-8", mode="rt") as handle:
         return handle.read()
+
+
+def image_get_dockerfile_references(content, build_args=None):
+    """
+    Get base images referenced by a Dockerfile.
+
+    Build stages are ignored. Arguments declared before the first `FROM`
+    are substituted, from build args or their default values.
+
+    :param content:     Dockerfile content (str)
+    :param build_args:  Build args, as KEY=VALUE (list?)
+    :rtype: Image references, without tags nor digests (list)
+    """
+    variables = {}
+    overrides = dict(
+        arg.split("=", 1) for arg in build_args or [] if "=" in arg
+    )
+    stages = set()
+    references = []
+    global_scope = True
+
+    for line in content.splitlines():
+        match = DOCKERFILE_FROM_PATTERN.match(line)
+        if match:
+            global_scope = False
+            reference = DOCKERFILE_VARIABLE_PATTERN.sub(
+                lambda m: variables.get(m.group(1) or m.group(2), ""),
+                match.group(1),
+            )
+            reference = image_get_repository(reference)
+            if reference and reference.lower() not in stages:
+                if reference not in references:
+                    references.append(reference)
+            if match.group(2):
+                stages.add(match.group(2).lower())
+            continue
+
+        match = DOCKERFILE_ARG_PATTERN.match(line)
+        if match and global_scope:
+            name, default = match.groups()
+            variables[name] = overrides.get(name, default or "")
+
+    return references
+
+
+def image_get_repository(reference):
+    """
+    Get the repository of an image reference, without tag nor digest.
+
+    :param reference:   Image reference (str)
+    :rtype: Repository (str)
+    """
+    reference = reference.split("@", 1)[0]
+    # Registry ports come before the last slash
+    head, slash, tail = reference.rpartition("/")
+    return f"{head}{slash}{tail.split(':', 1)[0]}"
+
+
+def image_discover(images_path, ignore_patterns=None, index=None):
+    """
+    Discover images, as folders with a Dockerfile.
+
+    Image folders are not descended into. Folders matching an ignore
+    pattern, by name or path relative to `images_path`, are skipped.
+    Folders unchanged since the index was built (same modification
+    time) are not listed again.
+
+    :param images_path:     Images path (str)
+    :param ignore_patterns: Ignore patterns (list?) (default: defaults)
+    :param index:           Previous index (dict?)
+    :rtype: Image paths by name (dict), new index (dict)
+    """
+    if ignore_patterns is None:
+        ignore_patterns = IMAGE_DEFAULT_IGNORE_PATTERNS
+
+    known = {}
+    if (
+        index
+        and index.get("version") == IMAGE_INDEX_VERSION
+        and index.get("patterns") == ignore_patterns
+    ):
+        known = index.get("folders", {})
+
+    folders = {}
+    images = {}
+    pending = [""]
+    while pending:
+        rel_path = pending.pop()
+        path = os.path.join(images_path, rel_path)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+
+        entry = known.get(rel_path)
+        if entry is None or entry[0] != mtime:
+            entry = _list_folder(path, rel_path, mtime, ignore_patterns)
+        folders[rel_path] = entry
+
+        _, is_image, children = entry
+        if is_image:
+            images[os.path.basename(os.path.normpath(path))] = path
+        else:
+            pending.extend(reversed(children))
+
+    new_index = {
+        "version": IMAGE_INDEX_VERSION,
+        "patterns": list(ignore_patterns),
+        "folders": folders,
+    }
+    return images, new_index
+
+
+def image_load_ignore_patterns(images_path):
+    """
+    Load image discovery ignore patterns.
+
+    Patterns are read from `.docknvignore` in the images folder, one
+    per line, in addition to default patterns.
+
+    :param images_path: Images path (str)
+    :rtype: Ignore patterns (list)
+    """
+    patterns = list(IMAGE_DEFAULT_IGNORE_PATTERNS)
+    path = os.path.join(images_path, IMAGE_IGNORE_FILE_NAME)
+    if os.path.isfile(path):
+        with io_open(path, encoding="utf-8", mode="r") as handle:
+            for line in handle.read().splitlines():
+                line = line.strip().strip("/")
+                if line and not line.startswith("#"):
+                    patterns.append(line)
+
+    return patterns
+
+
+def image_load_index(path):
+    """
+    Load an image discovery index.
+
+    :param path:    Index path (str)
+    :rtype: Index (dict?)
+    """
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        with io_open(path, encoding="utf-8", mode="r") as handle:
+            return json.load(handle)
+    except ValueError:
+        return None
+
+
+def image_save_index(path, index):
+    """
+    Save an image discovery index.
+
+    The index is only a cache: it is not saved when its folder does not
+    exist, and write errors are ignored.
+
+    :param path:    Index path (str)
+    :param index:   Index (dict)
+    """
+    if not os.path.isdir(os.path.dirname(path)):
+        return
+
+    try:
+        with io_open(path, encoding="utf-8", mode="w") as handle:
+            json.dump(index, handle)
+    except OSError:
+        pass
+
+
+# PRIVATE ##########
+
+
+def _list_folder(path, rel_path, mtime, ignore_patterns):
+    children = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name == "Dockerfile" and entry.is_file():
+                return [mtime, True, []]
+            if entry.is_dir(follow_symlinks=False):
+                child_path = f"{rel_path}/{entry.name}".lstrip("/")
+                if not _is_ignored(entry.name, child_path, ignore_patterns):
+                    children.append(child_path)
+
+    return [mtime, False, sorted(children)]
+
+
+def _is_ignored(name, rel_path, ignore_patterns):
+    return any(
+        fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern)
+        for pattern in ignore_patterns
+    )
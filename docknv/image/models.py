@@ -1,8 +1,19 @@
 from collections import OrderedDict
 import os
-from typing import Optional
+from typing import Dict, List, Optional
 
 from docknv.logger import Logger, Fore
+from docknv.utils.ioutils import io_open
+
+from .methods import (
+    image_discover,
+    image_get_dockerfile_references,
+    image_load_ignore_patterns,
+    image_load_index,
+    image_save_index,
+)
+
+IMAGE_INDEX_NAME = ".images.json"
 
 
 class MissingImage(Exception):
@@ -53,27 +64,77 @@ class ImageCollection(object):
     def load_from_project(cls, project: "Project") -> "ImageCollection":
         """Load images from project.
 
+        Discovery is incremental: unchanged folders are read from an
+        index in the project `.docknv` folder.
+
         Args:
             project (Project): Project instance
 
         Returns:
             ImageCollection: Collection
         """
-        image_path = os.path.join(project.project_path, "images")
-        images = {}
+        project_path = project.project_path
+        images_path = os.path.join(project_path, "images")
         ordered_images = OrderedDict()
-        if os.path.exists(image_path):
-            for root, _folders, files in os.walk(image_path):
-                if "Dockerfile" in files:
-                    image_name = os.path.basename(root)
-                    image_path = root.replace(project.project_path + "/", "./")
-                    images[image_name] = Image(image_name, image_path)
+        if not os.path.isdir(images_path):
+            return cls(ordered_images)
+
+        index_path = os.path.join(project_path, ".docknv", IMAGE_INDEX_NAME)
+        index = image_load_index(index_path)
+        images, new_index = image_discover(
+            images_path, image_load_ignore_patterns(images_path), index
+        )
+        if new_index != index:
+            image_save_index(index_path, new_index)
 
         for key in sorted(images):
-            ordered_images[key] = images[key]
+            image_path = images[key].replace(project_path + "/", "./")
+            ordered_images[key] = Image(key, image_path)
 
         return cls(ordered_images)
 
+    def get_dependencies(
+        self,
+        project_path: str,
+        tag_prefix: str = "",
+        build_args: Optional[List[str]] = None,
+    ) -> Dict[str, List[str]]:
+        """Get local images each image is built `FROM`.
+
+        Local images are referenced by name, with or without tag prefix.
+
+        Args:
+            project_path (str): Project path
+            tag_prefix (str): Image tag prefix
+            build_args (Optional[List[str]]): Build args, as KEY=VALUE
+
+        Returns:
+            Dict[str, List[str]]: Local image names, by image name
+        """
+        repositories = {}
+        for name in self.images:
+            repositories[name] = name
+            repositories[f"{tag_prefix}{name}"] = name
+
+        dependencies = OrderedDict()
+        for name, image in self.images.items():
+            dockerfile_path = os.path.join(
+                project_path, image.path, "Dockerfile"
+            )
+            with io_open(dockerfile_path, encoding="utf-8", mode="rt") as f:
+                references = image_get_dockerfile_references(
+                    f.read(), build_args
+                )
+
+            dependencies[name] = [
+                repositories[reference]
+                for reference in references
+                if reference in repositories
+                and repositories[reference] != name
+            ]
+
+        return dependencies
+
     def show(self):
         """Show collection."""
         for image in self.images.values():
@@ -1,3 +1,4 @@
 """Lifecycle handler."""
 
 from .models import *  # noqa
+from .exceptions import *  # noqa
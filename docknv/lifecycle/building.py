@@ -0,0 +1,163 @@
+"""Concurrent builds, in dependency order."""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from docknv.logger import Logger
+from docknv.wrapper import FailedCommandExecution, exec_process
+
+# Max concurrent builds, Docker builds being CPU and IO heavy
+BUILD_MAX_WORKERS = 4
+
+
+def building_get_levels(dependencies):
+    """
+    Group nodes by build order.
+
+    Nodes of a level only depend on nodes of previous levels.
+
+    :param dependencies:    Dependencies by node (dict)
+    :rtype: Nodes by level (list)
+    """
+    levels = []
+    remaining = {node: set(deps) for node, deps in dependencies.items()}
+    done = set()
+    while remaining:
+        level = [node for node, deps in remaining.items() if deps <= done]
+        if not level:
+            raise FailedCommandExecution(
+                f"dependency cycle between {sorted(remaining)}"
+            )
+
+        for node in level:
+            del remaining[node]
+        done.update(level)
+        levels.append(level)
+
+    return levels
+
+
+def building_run_graph(
+    dependencies, fn, max_workers=BUILD_MAX_WORKERS, on_error=None
+):
+    """
+    Run a function on each node, once its dependencies are done.
+
+    Independent nodes run concurrently. On the first error, no other
+    node starts and `on_error` is called, e.g. to stop running nodes;
+    the error is raised once running nodes end.
+
+    :param dependencies:    Dependencies by node (dict)
+    :param fn:              Function: fn(node) (fn)
+    :param max_workers:     Max concurrent nodes (int)
+    :param on_error:        Error handler: fn(node, exception) (fn?)
+    :rtype: Results by node, in completion order (dict)
+    """
+    # Fail on cycles before running anything
+    building_get_levels(dependencies)
+
+    remaining = {node: set(deps) for node, deps in dependencies.items()}
+    results = {}
+    errors = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+
+        def _submit_ready():
+            for node, deps in list(remaining.items()):
+                if deps <= results.keys():
+                    del remaining[node]
+                    running[executor.submit(fn, node)] = node
+
+        _submit_ready()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                node = running.pop(future)
+                try:
+                    results[node] = future.result()
+                except BaseException as exc:
+                    if not errors and on_error:
+                        on_error(node, exc)
+                    errors.append(exc)
+
+            if not errors:
+                _submit_ready()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+def building_run_commands(
+    dependencies,
+    fn,
+    prefixes,
+    cwd=None,
+    env=None,
+    max_workers=BUILD_MAX_WORKERS,
+    dry_run=False,
+):
+    """
+    Run the build of each node, once its dependencies are done.
+
+    Builds are run by `fn(node, execute, log)`: `execute(args)` runs a
+    build command, with its output prefixed by the node prefix, and
+    `log(message)` logs a prefixed message. On the first failure,
+    running commands are stopped and no other build starts.
+
+    :param dependencies:    Dependencies by node (dict)
+    :param fn:              Build function: fn(node, execute, log) (fn)
+    :param prefixes:        Output prefixes by node (dict)
+    :param cwd:             Working directory (str?)
+    :param env:             Extra environment variables (dict?)
+    :param max_workers:     Max concurrent builds (int)
+    :param dry_run:         Dry run? (bool) (default: False)
+    :rtype: Results by node, in completion order (dict)
+    """
+    processes = {}
+    failed = []
+    lock = threading.Lock()
+
+    def _build(node):
+        prefix = prefixes[node]
+
+        def _log(message):
+            with lock:
+                Logger.raw(f"{prefix} {message}")
+
+        def _on_start(process):
+            with lock:
+                processes[node] = process
+                if failed:
+                    process.terminate()
+
+        def _execute(args):
+            started = time.monotonic()
+            try:
+                exec_process(
+                    args,
+                    cwd=cwd,
+                    env=env,
+                    on_line=_log,
+                    on_start=_on_start,
+                    dry_run=dry_run,
+                )
+            finally:
+                with lock:
+                    processes.pop(node, None)
+            _log(f"built in {time.monotonic() - started:.1f}s")
+
+        return fn(node, _execute, _log)
+
+    def _on_error(node, exc):
+        with lock:
+            failed.append(node)
+            Logger.raw(f"{prefixes[node]} {exc}")
+            for process in processes.values():
+                process.terminate()
+
+    return building_run_graph(
+        dependencies, _build, max_workers=max_workers, on_error=_on_error
+    )
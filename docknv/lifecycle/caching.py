@@ -0,0 +1,338 @@
+"""Image build cache, from build context fingerprints."""
+
+import os
+import threading
+from collections import ChainMap
+
+from docknv.compose import ComposeDefinition
+from docknv.image.fingerprint import (
+    FINGERPRINT_LABEL,
+    fingerprint_get_context,
+    fingerprint_get_index_path,
+    fingerprint_load_index,
+    fingerprint_save_index,
+)
+from docknv.logger import Logger
+from docknv.wrapper import (
+    docker_find_images,
+    docker_inspect_image,
+    docker_tag_image,
+    using_docker_client,
+)
+
+from .methods import lifecycle_compose_command_on_configs
+
+CACHE_HIT = "hit"
+CACHE_RETAG = "retag"
+CACHE_MISS = "miss"
+
+
+class BuildCache(object):
+    """Image build cache.
+
+    Built images are recorded in a local index, by tag, with their
+    context fingerprint and image ID. Images built by docknv also carry
+    their fingerprint as a label, to be found under any tag.
+
+    The index is shared by concurrent builds: it is only changed with
+    the cache lock held.
+    """
+
+    def __init__(self, project):
+        """
+        Init.
+
+        :param project: Project
+        """
+        self.index_path = fingerprint_get_index_path(project)
+        self.index = fingerprint_load_index(self.index_path)
+        self.lock = threading.Lock()
+        self.contexts = set()
+        self.files = set()
+
+    def get_fingerprint(
+        self,
+        context_path,
+        dockerfile=None,
+        build_args=None,
+        base_images=None,
+        build_options=None,
+    ):
+        """
+        Get the fingerprint of a build context.
+
+        :param context_path:    Context path (str)
+        :param dockerfile:      Dockerfile path, relative to the context
+            (str?)
+        :param build_args:      Build args, as KEY=VALUE (list?)
+        :param base_images:     Local base image IDs, by reference (dict?)
+        :param build_options:   Other `docker build` options (list?)
+        :rtype: Fingerprint (str)
+        """
+        # Hashes of this context are merged once computed
+        file_hashes = ChainMap({}, self.index["files"])
+        fingerprint = fingerprint_get_context(
+            context_path,
+            dockerfile,
+            build_args,
+            file_hashes=file_hashes,
+            base_images=base_images,
+            build_options=build_options,
+        )
+
+        with self.lock:
+            self.contexts.add(os.path.abspath(context_path))
+            self.files.update(file_hashes.maps[0])
+            self.index["files"].update(file_hashes.maps[0])
+        return fingerprint
+
+    def get_image_id(self, tag, fingerprint, dry_run=False):
+        """
+        Get the ID of a built image, for fingerprints of its children.
+
+        In dry runs, or when the image is missing, its fingerprint is
+        used instead.
+
+        :param tag:         Image tag (str)
+        :param fingerprint: Fingerprint (str)
+        :param dry_run:     Dry run? (bool) (default: False)
+        :rtype: Image ID or fingerprint (str)
+        """
+        if dry_run:
+            return fingerprint
+
+        with using_docker_client() as client:
+            image = docker_inspect_image(client, tag)
+        return image["Id"] if image is not None else fingerprint
+
+    def lookup(self, client, tag, fingerprint):
+        """
+        Look for an image built from the same context.
+
+        An image with the same fingerprint but another tag is tagged.
+
+        :param client:      Client (Client)
+        :param tag:         Image tag (str)
+        :param fingerprint: Fingerprint (str)
+        :rtype: hit, retag or miss (str)
+        """
+        image = docker_inspect_image(client, tag)
+        if image is not None:
+            labels = (image.get("Config") or {}).get("Labels") or {}
+            entry = self.index["images"].get(tag) or {}
+            if labels.get(FINGERPRINT_LABEL) == fingerprint or (
+                entry.get("fingerprint") == fingerprint
+                and entry.get("id") == image["Id"]
+            ):
+                return CACHE_HIT
+
+        image_ids = docker_find_images(
+            client, f"{FINGERPRINT_LABEL}={fingerprint}"
+        )
+        if image_ids:
+            docker_tag_image(client, image_ids[0], tag)
+            self.record(client, tag, fingerprint)
+            return CACHE_RETAG
+
+        return CACHE_MISS
+
+    def record(self, client, tag, fingerprint):
+        """
+        Record a built image.
+
+        :param client:      Client (Client)
+        :param tag:         Image tag (str)
+        :param fingerprint: Fingerprint (str)
+        """
+        image = docker_inspect_image(client, tag)
+        if image is None:
+            return
+
+        with self.lock:
+            self.index["images"][tag] = {
+                "fingerprint": fingerprint,
+                "id": image["Id"],
+            }
+
+    def save(self):
+        """
+        Save the index.
+
+        File hashes of fingerprinted contexts are pruned to the files
+        they still contain; other hashes are pruned when their file is
+        missing.
+        """
+        with self.lock:
+            files = self.index["files"]
+            for path in list(files):
+                if path in self.files:
+                    continue
+                if not os.path.lexists(path) or any(
+                    path.startswith(context + os.sep)
+                    for context in self.contexts
+                ):
+                    del files[path]
+
+            fingerprint_save_index(self.index_path, self.index)
+
+
+def caching_get_compose_builds(project, config, build_args=None):
+    """
+    Get build parameters of configuration services with a build section.
+
+    Other build fields (target, cache_from, network, labels, extra_hosts
+    and shm_size) are converted to `docker build` options.
+
+    :param project:     Project
+    :param config:      Configuration
+    :param build_args:  Extra build args, as KEY=VALUE (list?)
+    :rtype: Tag, context, dockerfile, build_args and build_options, by
+        service (dict)
+    """
+    compose_def = ComposeDefinition.load_from_path(
+        config.get_composefile_path()
+    )
+
+    builds = {}
+    for name, service in compose_def.get_services().items():
+        build = (service or {}).get("build")
+        if not build:
+            continue
+        if isinstance(build, str):
+            build = {"context": build}
+
+        args = build.get("args") or []
+        if isinstance(args, dict):
+            args = [f"{key}={value}" for key, value in args.items()]
+
+        builds[name] = {
+            "tag": service.get("image") or f"{project.project_name}_{name}",
+            "context": os.path.join(
+                project.project_path, build.get("context") or "."
+            ),
+            "dockerfile": build.get("dockerfile"),
+            "build_args": [*args, *(build_args or [])],
+            "build_options": _get_build_options(build),
+        }
+
+    return builds
+
+
+def caching_build_compose_services(
+    project,
+    config,
+    service_names=None,
+    build_args=None,
+    no_cache=False,
+    dry_run=False,
+):
+    """
+    Build configuration services, skipping unchanged build contexts.
+
+    Only changed services are built, with one compose command.
+
+    :param project:         Project
+    :param config:          Configuration
+    :param service_names:   Service names, namespaced (list?) (default: all)
+    :param build_args:      Build args, as KEY=VALUE (list?)
+    :param no_cache:        No cache? (bool) (default: False)
+    :param dry_run:         Dry run? (bool) (default: False)
+    :rtype: Cache status by service name (dict)
+    """
+    args = []
+    for x in build_args or []:
+        args.append("--build-arg")
+        args.append(x)
+    if no_cache:
+        args.append("--no-cache")
+
+    if not os.path.isfile(config.get_composefile_path()):
+        # Nothing to fingerprint: let compose report it
+        lifecycle_compose_command_on_configs(
+            project,
+            [config.name],
+            ["build", *args, *(service_names or [])],
+            dry_run=dry_run,
+        )
+        return {}
+
+    builds = caching_get_compose_builds(project, config, build_args)
+    for name in service_names or []:
+        if name not in builds:
+            Logger.warn(f"service `{name}` has no build section")
+    if service_names is not None:
+        builds = {
+            name: build
+            for name, build in builds.items()
+            if name in service_names
+        }
+
+    cache = BuildCache(project)
+    fingerprints = {
+        name: cache.get_fingerprint(
+            build["context"],
+            build["dockerfile"],
+            build["build_args"],
+            build_options=build["build_options"],
+        )
+        for name, build in builds.items()
+    }
+    if dry_run or no_cache:
+        statuses = {name: CACHE_MISS for name in builds}
+    else:
+        statuses = {}
+        with using_docker_client() as client:
+            for name, build in builds.items():
+                statuses[name] = cache.lookup(
+                    client, build["tag"], fingerprints[name]
+                )
+                if statuses[name] != CACHE_MISS:
+                    Logger.info(
+                        f"service `{name}`: cache {statuses[name]}, "
+                        "build skipped"
+                    )
+
+    misses = [
+        name for name, status in statuses.items() if status == CACHE_MISS
+    ]
+    if misses:
+        lifecycle_compose_command_on_configs(
+            project, [config.name], ["build", *args, *misses], dry_run=dry_run
+        )
+
+    if not dry_run:
+        with using_docker_client() as client:
+            for name in misses:
+                cache.record(client, builds[name]["tag"], fingerprints[name])
+        cache.save()
+
+    return statuses
+
+
+# PRIVATE ##########
+
+
+def _get_build_options(build):
+    options = []
+    if build.get("target"):
+        options += ["--target", build["target"]]
+    for image in build.get("cache_from") or []:
+        options += ["--cache-from", image]
+    if build.get("network"):
+        options += ["--network", build["network"]]
+
+    labels = build.get("labels") or []
+    if isinstance(labels, dict):
+        labels = [f"{key}={value}" for key, value in labels.items()]
+    for label in sorted(labels):
+        options += ["--label", label]
+
+    hosts = build.get("extra_hosts") or []
+    if isinstance(hosts, dict):
+        hosts = [f"{host}:{address}" for host, address in hosts.items()]
+    for host in sorted(hosts):
+        options += ["--add-host", host]
+
+    if build.get("shm_size"):
+        options += ["--shm-size", str(build["shm_size"])]
+    return options
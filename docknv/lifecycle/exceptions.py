@@ -0,0 +1,23 @@
+"""Lifecycle exceptions."""
+
+from docknv.wrapper import FailedCommandExecution
+
+
+class MissingContainer(Exception):
+    """Missing container."""
+
+    def __init__(self, service, replica=None):
+        """Init."""
+        message = f"no running container for service {service}"
+        if replica is not None:
+            message += f" (replica {replica})"
+        super(MissingContainer, self).__init__(message)
+
+
+class UnhealthyServices(FailedCommandExecution):
+    """Services not healthy in time, or stopped."""
+
+    def __init__(self, services, reason):
+        """Init."""
+        names = ", ".join(services)
+        super(UnhealthyServices, self).__init__(f"{names}: {reason}")
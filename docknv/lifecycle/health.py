@@ -0,0 +1,200 @@
+"""Wait for services to be healthy."""
+
+import time
+
+from docknv.wrapper import (
+    COMPOSE_ONEOFF_LABEL,
+    COMPOSE_SERVICE_LABEL,
+    docker_events,
+    docker_inspect_state,
+    docker_ps,
+    docker_ps_clear_cache,
+)
+
+from .exceptions import UnhealthyServices
+
+HEALTH_TIMEOUT = 120.0
+# Polling delays, when events are not available
+HEALTH_POLL_DELAY = 0.5
+HEALTH_POLL_MAX_DELAY = 5.0
+
+HEALTH_READY = "ready"
+HEALTH_WAITING = "waiting"
+HEALTH_STOPPED = "stopped"
+
+
+def health_get_start_levels(services, namespace=None):
+    """
+    Group services by start order, from `depends_on`.
+
+    Services of a level only depend on services of previous levels.
+    Dependencies are not namespaced in composefiles: they are resolved
+    against namespaced names first.
+
+    :param services:    Services, from a composefile (dict)
+    :param namespace:   Namespace name (str?)
+    :rtype: Service names by level (list)
+    """
+    dependencies = {}
+    for name, service in services.items():
+        depends_on = (service or {}).get("depends_on") or []
+        dependencies[name] = {
+            _resolve_dependency(services, namespace, dependency)
+            for dependency in depends_on
+        } - {None, name}
+
+    levels = []
+    remaining = dict(dependencies)
+    started = set()
+    while remaining:
+        level = [name for name, deps in remaining.items() if deps <= started]
+        if not level:
+            # Cycle: compose refuses it, start the rest at once
+            level = list(remaining)
+
+        for name in level:
+            del remaining[name]
+        started.update(level)
+        levels.append(level)
+
+    return levels
+
+
+def health_get_state(status, health):
+    """
+    Get the readiness of a container.
+
+    Containers without health check are ready once running.
+
+    :param status:  Container status (str)
+    :param health:  Health status (str?)
+    :rtype: Readiness: ready, waiting or stopped (str)
+    """
+    if status in ("exited", "dead", "removing"):
+        return HEALTH_STOPPED
+    if status == "running" and health in (None, "healthy"):
+        return HEALTH_READY
+    return HEALTH_WAITING
+
+
+def health_wait(
+    client, project_name, service_names, timeout=HEALTH_TIMEOUT, started=None
+):
+    """
+    Wait for services to be healthy.
+
+    Container states are listed once, then updated from the Docker
+    events stream: each event of a waited service triggers one
+    inspection. If events are not available, states are listed again
+    with an exponential backoff. Exited or dead containers fail at once.
+
+    :param client:          Client (Client)
+    :param project_name:    Compose project name (str)
+    :param service_names:   Service names, namespaced (list)
+    :param timeout:         Timeout, in seconds (float)
+    :param started:         Start time, from `time.monotonic` (float?)
+        (default: now)
+    :rtype: Time to healthy, in seconds, by service name (dict)
+    """
+    started = time.monotonic() if started is None else started
+    deadline = time.monotonic() + timeout
+    # Events are replayed from before the listing: no change is lost
+    since = int(time.time())
+    waiter = _HealthWaiter(service_names, started)
+
+    waiter.update_from_infos(_list_containers(client, project_name, waiter))
+    if waiter.is_done():
+        return waiter.durations
+
+    try:
+        events = docker_events(
+            client, project_name, since=since, until=since + timeout + 1
+        )
+        for event in events:
+            attributes = event.get("Actor", {}).get("Attributes", {})
+            service = attributes.get(COMPOSE_SERVICE_LABEL)
+            if service not in waiter.states:
+                continue
+            if attributes.get(COMPOSE_ONEOFF_LABEL) == "True":
+                # `run` containers
+                continue
+
+            container = event.get("id") or event["Actor"]["ID"]
+            state = docker_inspect_state(client, container)
+            waiter.update(service, container, **state)
+            if waiter.is_done():
+                return waiter.durations
+    except UnhealthyServices:
+        raise
+    except Exception:
+        # No events (remote daemon, proxy): poll instead
+        pass
+
+    delay = HEALTH_POLL_DELAY
+    while time.monotonic() < deadline:
+        time.sleep(min(delay, max(0, deadline - time.monotonic())))
+        delay = min(delay * 2, HEALTH_POLL_MAX_DELAY)
+
+        waiter.update_from_infos(
+            _list_containers(client, project_name, waiter)
+        )
+        if waiter.is_done():
+            return waiter.durations
+
+    raise UnhealthyServices(
+        waiter.get_waiting_services(), f"not healthy after {timeout:g}s"
+    )
+
+
+# PRIVATE ##########
+
+
+class _HealthWaiter(object):
+    def __init__(self, service_names, started):
+        self.started = started
+        self.states = {name: {} for name in service_names}
+        self.durations = {}
+
+    def update_from_infos(self, infos):
+        for info in infos:
+            self.update(
+                info["service"], info["id"], info["status"], info["health"]
+            )
+
+    def update(self, service, container, status, health):
+        self.states[service][container] = health_get_state(status, health)
+
+        states = self.states[service].values()
+        if HEALTH_STOPPED in states:
+            raise UnhealthyServices([service], "container stopped")
+        if service not in self.durations and all(
+            state == HEALTH_READY for state in states
+        ):
+            self.durations[service] = time.monotonic() - self.started
+
+    def is_done(self):
+        return len(self.durations) == len(self.states)
+
+    def get_waiting_services(self):
+        return [name for name in self.states if name not in self.durations]
+
+
+def _list_containers(client, project_name, waiter):
+    docker_ps_clear_cache()
+    # Stopped containers too, to fail on exited ones
+    infos = docker_ps(
+        client,
+        project_name,
+        service_names=waiter.get_waiting_services(),
+        include_stopped=True,
+    )
+    # `run` containers
+    return [info for info in infos if not info["oneoff"]]
+
+
+def _resolve_dependency(services, namespace, dependency):
+    if namespace and f"{namespace}_{dependency}" in services:
+        return f"{namespace}_{dependency}"
+    if dependency in services:
+        return dependency
+    return None
@@ -0,0 +1,301 @@
+"""Container logs, merged from many containers."""
+
+import collections
+import datetime
+import queue
+import re
+import threading
+import time
+
+from docknv.logger import Fore, Style
+from docknv.wrapper import FailedCommandExecution, docker_logs
+
+# Max lines held in memory, all containers included
+LOGS_BUFFER_SIZE = 1000
+# When following, delay before printing a line while other containers
+# may still send older lines
+LOGS_MERGE_DELAY = 0.2
+LOGS_COLORS = (
+    Fore.CYAN,
+    Fore.YELLOW,
+    Fore.GREEN,
+    Fore.MAGENTA,
+    Fore.BLUE,
+    Fore.LIGHTCYAN_EX,
+    Fore.LIGHTYELLOW_EX,
+    Fore.LIGHTGREEN_EX,
+    Fore.LIGHTMAGENTA_EX,
+    Fore.LIGHTBLUE_EX,
+)
+LOGS_RELATIVE_TIME_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+LOGS_TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+# RFC 3339 dates, as written by Docker (nanoseconds), or shorter
+LOGS_DATE_PATTERN = re.compile(
+    r"^(\d{4}-\d{2}-\d{2})"
+    r"(?:[T ](\d{2}:\d{2})(:\d{2})?(?:\.(\d+))?)?"
+    r"(Z|[+-]\d{2}:?\d{2})?$"
+)
+
+
+class LogLine(object):
+    """Log line."""
+
+    __slots__ = ("source", "timestamp", "text", "key")
+
+    def __init__(self, source, timestamp, text):
+        """
+        Init.
+
+        :param source:      Source name (str)
+        :param timestamp:   RFC 3339 timestamp (str)
+        :param text:        Text, without timestamp (str)
+        """
+        self.source = source
+        self.timestamp = timestamp
+        self.text = text
+        self.key = logs_get_sort_key(timestamp)
+
+
+def logs_get_sort_key(timestamp):
+    """
+    Get a sort key from a Docker log timestamp.
+
+    Docker trims trailing zeros from nanoseconds: fractions are padded
+    for the keys to compare as strings.
+
+    :param timestamp:   RFC 3339 timestamp (str)
+    :rtype: Sort key (str)
+    """
+    seconds, _, fraction = timestamp.rstrip("Z").partition(".")
+    return f"{seconds}.{fraction:0<9}"
+
+
+def logs_parse_line(source, line):
+    """
+    Parse a timestamped log line.
+
+    :param source:  Source name (str)
+    :param line:    Log line (str)
+    :rtype: Log line (LogLine)
+    """
+    timestamp, _, text = line.partition(" ")
+    return LogLine(source, timestamp, text)
+
+
+def logs_parse_time(value, now=None):
+    """
+    Parse a time, as accepted by `docker logs --since`.
+
+    Values are either relative durations (`30s`, `10m`, `2h`, `1d`),
+    UNIX timestamps or ISO 8601 dates.
+
+    :param value:   Time (str)
+    :param now:     Current UNIX timestamp (float?) (default: now)
+    :rtype: UNIX timestamp (float)
+    """
+    now = time.time() if now is None else now
+
+    match = LOGS_RELATIVE_TIME_PATTERN.match(value)
+    if match:
+        amount, unit = match.groups()
+        return now - float(amount) * LOGS_TIME_UNITS[unit]
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    # No fromisoformat before Python 3.7, nor nanoseconds before 3.11
+    match = LOGS_DATE_PATTERN.match(value)
+    if not match:
+        raise FailedCommandExecution(f"malformed time: {value}")
+
+    day, minutes, seconds, fraction, zone = match.groups()
+    text = f"{day}T{minutes or '00:00'}{seconds or ':00'}"
+    text += "." + (fraction or "")[:6].ljust(6, "0")
+    fmt = "%Y-%m-%dT%H:%M:%S.%f"
+    if zone:
+        text += "+0000" if zone == "Z" else zone.replace(":", "")
+        fmt += "%z"
+
+    try:
+        date = datetime.datetime.strptime(text, fmt)
+    except ValueError:
+        raise FailedCommandExecution(f"malformed time: {value}")
+
+    if date.tzinfo is None:
+        date = date.astimezone()
+    return date.timestamp()
+
+
+def logs_stream(
+    client,
+    sources,
+    follow=False,
+    tail=None,
+    since=None,
+    until=None,
+    pattern=None,
+    buffer_size=LOGS_BUFFER_SIZE,
+    merge_delay=LOGS_MERGE_DELAY,
+):
+    """
+    Stream logs of many containers, merged by timestamp.
+
+    Each container is read from its own thread. Time ranges and tails
+    are applied by the daemon; patterns are applied while reading, as
+    the Engine API cannot filter lines.
+
+    At most `buffer_size` lines are read ahead: slow consumers block
+    readers instead of growing memory. When following, lines are
+    printed `merge_delay` seconds after their arrival if a container is
+    silent, and may then come before older lines.
+
+    :param client:      Client (Client)
+    :param sources:     Containers: (source name, container name) (list)
+    :param follow:      Follow logs? (bool) (default: False)
+    :param tail:        Last lines count per container (int?)
+    :param since:       Start time, as UNIX timestamp (float?)
+    :param until:       End time, as UNIX timestamp (float?)
+    :param pattern:     Regular expression filter (str?)
+    :param buffer_size: Max lines read ahead (int)
+    :param merge_delay: Max merge delay, in seconds (float)
+    :rtype: Log lines (iterable)
+    """
+    regex = re.compile(pattern) if pattern else None
+    events = queue.Queue(maxsize=buffer_size)
+    stopped = threading.Event()
+
+    def _put(event):
+        # Give up when the consumer stopped, instead of blocking forever
+        while not stopped.is_set():
+            try:
+                events.put(event, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _read(source, container):
+        try:
+            chunks = docker_logs(
+                client,
+                container,
+                follow=follow,
+                tail=tail,
+                since=since,
+                until=until,
+            )
+            for line in _split_lines(chunks):
+                if stopped.is_set():
+                    break
+                if regex is None or regex.search(line.partition(" ")[2]):
+                    _put((source, logs_parse_line(source, line)))
+        except BaseException as exc:
+            _put((source, exc))
+        finally:
+            _put((source, None))
+
+    for source, container in sources:
+        thread = threading.Thread(
+            target=_read, args=(source, container), daemon=True
+        )
+        thread.start()
+
+    try:
+        yield from _merge_events(
+            events,
+            [source for source, _ in sources],
+            buffer_size,
+            merge_delay if follow else None,
+        )
+    finally:
+        stopped.set()
+
+
+def logs_get_prefixes(source_names):
+    """
+    Get colored, aligned prefixes for log sources.
+
+    :param source_names:    Source names (list)
+    :rtype: Prefix by source name (dict)
+    """
+    width = max((len(name) for name in source_names), default=0)
+    return {
+        name: f"{LOGS_COLORS[i % len(LOGS_COLORS)]}{name:<{width}} |"
+        f"{Style.RESET_ALL}"
+        for i, name in enumerate(source_names)
+    }
+
+
+def logs_format_line(line, prefixes, timestamps=False):
+    """
+    Format a log line for output.
+
+    :param line:        Log line (LogLine)
+    :param prefixes:    Prefix by source name (dict)
+    :param timestamps:  Show timestamps? (bool) (default: False)
+    :rtype: Formatted line (str)
+    """
+    if timestamps:
+        return f"{prefixes[line.source]} {line.timestamp} {line.text}"
+    return f"{prefixes[line.source]} {line.text}"
+
+
+# PRIVATE ##########
+
+
+def _split_lines(chunks):
+    # Frames may hold several lines, or part of a line
+    remaining = b""
+    for chunk in chunks:
+        lines = (remaining + chunk).split(b"\n")
+        remaining = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+
+    if remaining:
+        yield remaining.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def _merge_events(events, source_names, buffer_size, merge_delay):
+    pending = {name: collections.deque() for name in source_names}
+    active = set(source_names)
+    count = 0
+
+    while active or count:
+        while count:
+            heads = [lines[0] for lines in pending.values() if lines]
+            complete = all(pending[name] for name in active)
+            expired = merge_delay is not None and (
+                time.monotonic() - min(arrival for _, arrival in heads)
+                >= merge_delay
+            )
+            if not (complete or expired or count >= buffer_size):
+                break
+
+            line, _ = min(heads, key=lambda head: head[0].key)
+            pending[line.source].popleft()
+            count -= 1
+            yield line
+
+        if not active:
+            break
+
+        timeout = None
+        if merge_delay is not None and count:
+            # Lines of a container arrive in order: heads are the oldest
+            oldest = min(lines[0][1] for lines in pending.values() if lines)
+            timeout = max(0, oldest + merge_delay - time.monotonic())
+
+        try:
+            source, item = events.get(timeout=timeout)
+        except queue.Empty:
+            continue
+
+        if item is None:
+            active.discard(source)
+        elif isinstance(item, BaseException):
+            raise item
+        else:
+            pending[source].append((item, time.monotonic()))
+            count += 1
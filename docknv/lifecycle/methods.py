@@ -1,7 +1,19 @@
 """Lifecycle methods."""
 
+from concurrent.futures import ThreadPoolExecutor
+
 from docknv.database import MissingActiveConfiguration
-from docknv.wrapper import exec_compose, exec_docker
+from docknv.wrapper import (
+    docker_ps,
+    exec_compose,
+    exec_docker,
+    using_docker_client,
+)
+
+from .exceptions import MissingContainer
+
+# Max concurrent commands when targeting all replicas
+REPLICA_MAX_WORKERS = 8
 
 
 def lifecycle_get_configs(project, config_list=None):
@@ -48,9 +60,37 @@ def lifecycle_get_service_name(project, service_name, config_name=None):
     :param config_name:     Configuration name (str)
     """
     config = lifecycle_get_config(project, config_name)
-    if config.namespace:
-        return f"{config.namespace}_{service_name}"
-    return service_name
+    return _get_namespaced_service_name(config, service_name)
+
+
+def lifecycle_get_containers_by_config(project, configs, dry_run=False):
+    """
+    Get running containers of configurations.
+
+    Containers are fetched once for all configurations.
+
+    :param project: Project
+    :param configs: Configurations (list)
+    :param dry_run: Dry run? (bool) (default: False)
+    :rtype: Container infos by configuration name (dict)
+    """
+    containers_by_config = {config.name: [] for config in configs}
+    if dry_run or not configs:
+        return containers_by_config
+
+    # Results are cached: one API call for all configurations
+    with using_docker_client() as client:
+        for config in configs:
+            containers_by_config[config.name] = docker_ps(
+                client,
+                project.project_name,
+                service_names=[
+                    _get_namespaced_service_name(config, service_name)
+                    for service_name in config.services
+                ],
+            )
+
+    return containers_by_config
 
 
 def lifecycle_compose_command_on_configs(
@@ -87,15 +127,88 @@ def lifecycle_compose_command_on_current_config(project, args, dry_run=False):
     exec_compose(project_path, composefile, args, dry_run=dry_run)
 
 
-def lifecycle_get_container_from_service(project, service):
+def lifecycle_get_containers_from_service(
+    project, service, replica=None, dry_run=False
+):
+    """
+    Get running containers from service, ordered by replica number.
+
+    Containers are resolved from compose labels (results are cached for
+    the command). In dry run mode, the container name is guessed.
+
+    :param project: Project
+    :param service: Service name, namespaced (str)
+    :param replica: Replica number (int?) (default: all)
+    :param dry_run: Dry run? (bool) (default: False)
+    :rtype: Container names (list)
+    """
+    if dry_run:
+        return [f"{project.project_name}_{service}_{replica or 1}"]
+
+    return [
+        container["name"]
+        for container in lifecycle_get_container_infos_from_service(
+            project, service, replica
+        )
+    ]
+
+
+def lifecycle_get_container_infos_from_service(project, service, replica=None):
+    """
+    Get running container infos from service, ordered by replica number.
+
+    :param project: Project
+    :param service: Service name, namespaced (str)
+    :param replica: Replica number (int?) (default: all)
+    :rtype: Container infos (list)
+    """
+    with using_docker_client() as client:
+        containers = docker_ps(
+            client, project.project_name, service_names=[service]
+        )
+
+    if replica is not None:
+        containers = [c for c in containers if c["number"] == replica]
+    if not containers:
+        raise MissingContainer(service, replica)
+
+    return sorted(containers, key=lambda c: c["number"] or 0)
+
+
+def lifecycle_get_container_from_service(
+    project, service, replica=None, dry_run=False
+):
     """
     Get container from service.
 
+    Without replica number, the first replica is used.
+
     :param project: Project
-    :param service: Service name (str)
+    :param service: Service name, namespaced (str)
+    :param replica: Replica number (int?)
+    :param dry_run: Dry run? (bool) (default: False)
+    :rtype: Container name (str)
     """
-    name = project.project_name
-    return f"{name}_{service}_1"
+    return lifecycle_get_containers_from_service(
+        project, service, replica, dry_run=dry_run
+    )[0]
+
+
+def lifecycle_run_on_containers(containers, fn):
+    """
+    Run a function on containers, concurrently.
+
+    :param containers:  Container infos (list)
+    :param fn:          Function, from container info (fn)
+    :rtype: Results by container name (dict)
+    """
+    max_workers = min(len(containers), REPLICA_MAX_WORKERS) or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            (container["name"], executor.submit(fn, container))
+            for container in containers
+        ]
+        return {name: future.result() for name, future in futures}
 
 
 def lifecycle_docker_command_on_service(
@@ -111,10 +224,21 @@ def lifecycle_docker_command_on_service(
     :param dry_run: Dry run? (bool) (default: False)
     """
     # Get container from service
-    container = lifecycle_get_container_from_service(project, service)
+    container = lifecycle_get_container_from_service(
+        project, service, dry_run=dry_run
+    )
 
     args = [x for x in args]
     if add_name:
         args += [container]
 
     exec_docker(project.project_path, args, dry_run=dry_run)
+
+
+# PRIVATE ##########
+
+
+def _get_namespaced_service_name(config, service_name):
+    if config.namespace:
+        return f"{config.namespace}_{service_name}"
+    return service_name
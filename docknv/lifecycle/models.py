@@ -1,20 +1,57 @@
 """Lifecycle models."""
 
+from collections import OrderedDict
 import copy
+import os
 import shlex
+import time
 
+from docknv.compose import ComposeDefinition
+from docknv.compose.diffing import (
+    composefile_diff_services,
+    composefile_snapshot_services,
+)
 from docknv.database import Configuration
+from docknv.image.fingerprint import FINGERPRINT_LABEL
+from docknv.logger import Logger
+from docknv.template import renderer_render_template
 from docknv.user import user_get_username
-from docknv.wrapper import exec_docker, StoppedCommandExecution
+from docknv.utils.events import evented
+from docknv.utils.timing import format_timings
+from docknv.watcher import (
+    watcher_create,
+    watcher_get_affected_configurations,
+    watcher_wait_for_changes,
+)
+from docknv.wrapper import (
+    docker_inspect_image,
+    exec_docker,
+    StoppedCommandExecution,
+    using_docker_client,
+)
 
 from .methods import (
     lifecycle_compose_command_on_configs,
     lifecycle_compose_command_on_current_config,
-    lifecycle_docker_command_on_service,
     lifecycle_get_container_from_service,
+    lifecycle_get_container_infos_from_service,
+    lifecycle_get_containers_by_config,
     lifecycle_get_config,
+    lifecycle_get_configs,
     lifecycle_get_service_name,
+    lifecycle_run_on_containers,
 )
+from .building import BUILD_MAX_WORKERS, building_run_commands
+from .caching import BuildCache, CACHE_MISS, caching_build_compose_services
+from .health import HEALTH_TIMEOUT, health_get_start_levels, health_wait
+from .logs import (
+    logs_format_line,
+    logs_get_prefixes,
+    logs_parse_time,
+    logs_stream,
+)
+from .planning import planning_build_targets, planning_get_targets
+from .transfer import transfer_pull, transfer_push
 
 
 class ServiceLifecycle(object):
@@ -34,6 +71,7 @@ class ServiceLifecycle(object):
                 self.project, args, **kwargs
             )
 
+    @evented("service.start")
     def start(self, service_name, *, config_name=None, dry_run=False):
         """
         Start service.
@@ -49,6 +87,7 @@ class ServiceLifecycle(object):
             config_name, ["up", "-d", service_name], dry_run=dry_run
         )
 
+    @evented("service.stop")
     def stop(self, service_name, *, config_name=None, dry_run=False):
         """
         Stop service.
@@ -64,6 +103,7 @@ class ServiceLifecycle(object):
             config_name, ["stop", service_name], dry_run=dry_run
         )
 
+    @evented("service.restart")
     def restart(
         self, service_name, *, config_name=None, force=False, dry_run=False
     ):
@@ -93,6 +133,7 @@ class ServiceLifecycle(object):
                 config_name, ["restart", service_name], dry_run=dry_run
             )
 
+    @evented("service.run")
     def run(
         self,
         service_name,
@@ -130,6 +171,7 @@ class ServiceLifecycle(object):
             dry_run=dry_run,
         )
 
+    @evented("service.execute")
     def execute(
         self,
         service_name,
@@ -234,6 +276,7 @@ class ServiceLifecycle(object):
             config_name, ["attach", service_name], dry_run=dry_run
         )
 
+    @evented("service.build")
     def build(
         self,
         service_name,
@@ -246,28 +289,31 @@ class ServiceLifecycle(object):
         """
         Build a service.
 
+        The build is skipped when the build context and build args did
+        not change since the last build.
+
         :param service_name:    Service name (str)
         :param config_name:     Configuration name (str)
         :param build_args:      Build args (list?)
         :param no_cache:        No cache? (bool) (default: False)
         :param dry_run:         Dry run? (bool) (default: False)
+        :rtype: Cache status: hit, retag or miss (str?)
         """
+        config = lifecycle_get_config(self.project, config_name)
         service_name = lifecycle_get_service_name(
-            self.project, service_name, config_name
+            self.project, service_name, config.name
         )
-        args = []
-        build_args = build_args or []
-        for x in build_args:
-            args.append("--build-arg")
-            args.append(x)
-
-        if no_cache:
-            args.append("--no-cache")
-
-        self._execute_compose_command(
-            config_name, ["build", *args, service_name], dry_run=dry_run
+        statuses = caching_build_compose_services(
+            self.project,
+            config,
+            [service_name],
+            build_args=build_args,
+            no_cache=no_cache,
+            dry_run=dry_run,
         )
+        return statuses.get(service_name)
 
+    @evented("service.push")
     def push(
         self,
         service_name,
@@ -275,34 +321,63 @@ class ServiceLifecycle(object):
         container_path,
         *,
         config_name=None,
+        replica=None,
+        all_replicas=False,
+        compression=None,
+        incremental=False,
         dry_run=False,
     ):
         """
-        Push a file from host to container.
+        Push files from host to container.
+
+        Files are sent as one streamed tar archive per container.
 
         :param service_name:    Service name (str)
-        :param host_path:       Host path (str)
+        :param host_path:       Host path, or paths (str or list)
         :param container_path:  Container path (str)
         :param config_name:     Configuration name (str)
+        :param replica:         Replica number (int?) (default: first)
+        :param all_replicas:    Push to all replicas? (bool)
+            (default: False)
+        :param compression:     Compression: gz, bz2 or xz (str?)
+        :param incremental:     Only send files changed since last push?
+            (bool) (default: False)
         :param dry_run:         Dry run? (bool) (default: False)
+        :rtype: Sent file count by container name (dict)
         """
+        host_paths = host_path
+        if isinstance(host_paths, str):
+            host_paths = [host_paths]
         service_name = lifecycle_get_service_name(
             self.project, service_name, config_name
         )
 
-        # Get container from service
-        container = lifecycle_get_container_from_service(
-            self.project, service_name
-        )
+        if dry_run:
+            container = lifecycle_get_container_from_service(
+                self.project, service_name, replica, dry_run=True
+            )
+            Logger.debug(f"pushing {host_paths} to {container}")
+            return {}
 
-        lifecycle_docker_command_on_service(
-            self.project,
-            service_name,
-            ["cp", host_path, f"{container}:{container_path}"],
-            add_name=False,
-            dry_run=dry_run,
+        containers = lifecycle_get_container_infos_from_service(
+            self.project, service_name, replica
+        )
+        if not all_replicas:
+            containers = containers[:1]
+
+        return lifecycle_run_on_containers(
+            containers,
+            lambda container: transfer_push(
+                self.project,
+                container,
+                host_paths,
+                container_path,
+                compression=compression,
+                incremental=incremental,
+            ),
         )
 
+    @evented("service.pull")
     def pull(
         self,
         service_name,
@@ -310,32 +385,38 @@ class ServiceLifecycle(object):
         host_path,
         *,
         config_name=None,
+        replica=None,
+        compression=False,
         dry_run=False,
     ):
         """
-        Pull a file from host to container.
+        Pull files from container to host.
 
         :param service_name:    Service name (str)
-        :param container_path:  Container path (str)
+        :param container_path:  Container path, or paths (str or list)
         :param host_path:       Host path (str)
         :param config_name:     Configuration name (str)
+        :param replica:         Replica number (int?) (default: first)
+        :param compression:     Compress the transfer? (bool)
+            (default: False)
         :param dry_run:         Dry run? (bool) (default: False)
         """
+        container_paths = container_path
+        if isinstance(container_paths, str):
+            container_paths = [container_paths]
         service_name = lifecycle_get_service_name(
             self.project, service_name, config_name
         )
 
-        # Get container from service
         container = lifecycle_get_container_from_service(
-            self.project, service_name
+            self.project, service_name, replica, dry_run=dry_run
         )
+        if dry_run:
+            Logger.debug(f"pulling {container_paths} from {container}")
+            return
 
-        lifecycle_docker_command_on_service(
-            self.project,
-            service_name,
-            ["cp", f"{container}:{container_path}", host_path],
-            add_name=False,
-            dry_run=dry_run,
+        transfer_pull(
+            container, container_paths, host_path, compression=compression
         )
 
 
@@ -346,17 +427,72 @@ class ConfigLifecycle(object):
         """Init."""
         self.project = project
 
-    def start(self, config_names=None, dry_run=False):
+    @evented("config.start")
+    def start(
+        self,
+        config_names=None,
+        dry_run=False,
+        *,
+        wait=False,
+        timeout=HEALTH_TIMEOUT,
+    ):
         """
         Start configurations.
 
+        When waiting, services are started by `depends_on` level, and
+        each level is started once the previous one is healthy.
+
         :param config_names:    Config names (list)
         :param dry_run:         Dry run? (bool) (default: False)
+        :param wait:            Wait for healthy services? (bool)
+            (default: False)
+        :param timeout:         Wait timeout, in seconds (float)
+        :rtype: Time to healthy, in seconds, by service name (dict)
         """
-        lifecycle_compose_command_on_configs(
-            self.project, config_names, ["up", "-d"], dry_run=dry_run
-        )
+        if not wait:
+            lifecycle_compose_command_on_configs(
+                self.project, config_names, ["up", "-d"], dry_run=dry_run
+            )
+            return {}
 
+        deadline = time.monotonic() + timeout
+        durations = OrderedDict()
+        for config in lifecycle_get_configs(self.project, config_names):
+            compose_def = ComposeDefinition.load_from_path(
+                config.get_composefile_path()
+            )
+            levels = health_get_start_levels(
+                compose_def.get_services(), config.namespace
+            )
+            for level in levels:
+                started = time.monotonic()
+                lifecycle_compose_command_on_configs(
+                    self.project,
+                    [config.name],
+                    ["up", "-d", *level],
+                    dry_run=dry_run,
+                )
+                if dry_run:
+                    continue
+
+                with using_docker_client() as client:
+                    level_durations = health_wait(
+                        client,
+                        self.project.project_name,
+                        level,
+                        timeout=max(0, deadline - time.monotonic()),
+                        started=started,
+                    )
+                for service in level:
+                    durations[service] = level_durations[service]
+                    Logger.info(
+                        f"service `{service}` healthy in "
+                        f"{level_durations[service]:.1f}s"
+                    )
+
+        return durations
+
+    @evented("config.stop")
     def stop(self, config_names=None, dry_run=False):
         """
         Stop configurations.
@@ -371,6 +507,7 @@ class ConfigLifecycle(object):
             self.project, config_names, ["rm", "-f"], dry_run=dry_run
         )
 
+    @evented("config.restart")
     def restart(self, config_names=None, force=False, dry_run=False):
         """
         Restart configurations.
@@ -394,6 +531,7 @@ class ConfigLifecycle(object):
                 self.project, config_names, ["restart"], dry_run=dry_run
             )
 
+    @evented("config.create", config="name")
     def create(
         self,
         name,
@@ -440,6 +578,7 @@ class ConfigLifecycle(object):
         self.project.session.set_current_configuration(name)
         self.project.session.save()
 
+    @evented("config.update")
     def update(
         self,
         name=None,
@@ -462,8 +601,9 @@ class ConfigLifecycle(object):
         :param volumes:     Volumes (list)
         :param networks:    Networks (list)
         :param namespace:   Namespace (str?)
-        :param restart:     Restart? (bool) (default: False)
+        :param restart:     Restart changed services? (bool) (default: False)
         :param dry_run:     Dry run? (bool) (default: False)
+        :rtype: Changes per changed service, if restart (dict?)
         """
         database = self.project.database
         config = lifecycle_get_config(self.project, name)
@@ -474,7 +614,7 @@ class ConfigLifecycle(object):
         new_networks = None
 
         if restart:
-            self.stop(name, dry_run=dry_run)
+            old_snapshot = self._snapshot_services(config)
 
         if environment is not None:
             config.environment = environment
@@ -506,32 +646,294 @@ class ConfigLifecycle(object):
         database.save()
 
         if restart:
-            self.start(name, dry_run=dry_run)
+            diff = composefile_diff_services(
+                old_snapshot, self._snapshot_services(config)
+            )
+            self._recreate_changed_services(config, diff, dry_run=dry_run)
+            return diff
+
+    @evented("config.regenerate")
+    def regenerate(self, config_names=None, all_configs=False, workers=None):
+        """
+        Regenerate configurations, sharing work between them.
 
-    def build(self, name=None, build_args=None, no_cache=False, dry_run=False):
+        :param config_names:    Config names (list?)
+        :param all_configs:     Regenerate all user configurations? (bool)
+        :param workers:         Max concurrent configurations (int?)
+        :rtype: Timings per configuration (dict)
+        """
+        database = self.project.database
+        config_names = self._get_config_names(config_names, all_configs)
+
+        if len(config_names) == 0:
+            Logger.warn("no configuration to regenerate")
+            return {}
+
+        start_time = time.perf_counter()
+        shared_timings, results = database.regenerate_configurations(
+            config_names, max_workers=workers
+        )
+        elapsed = time.perf_counter() - start_time
+
+        Logger.info(f"shared stages: {format_timings(shared_timings)}")
+        for name, timings in results.items():
+            total = sum(timings.values())
+            Logger.info(f"- {name} ({total:.3f}s): {format_timings(timings)}")
+        Logger.info(
+            f"regenerated {len(results)} configuration(s) in {elapsed:.3f}s"
+        )
+
+        return results
+
+    def watch(
+        self,
+        config_names=None,
+        all_configs=False,
+        restart=False,
+        debounce=0.5,
+        polling=False,
+        dry_run=False,
+    ):
+        """
+        Watch project sources and regenerate affected configurations.
+
+        Runs until interrupted. The configuration database is reloaded
+        on each change, to follow configurations edited meanwhile.
+
+        :param config_names:    Config names (list?)
+        :param all_configs:     Watch all user configurations? (bool)
+        :param restart:         Restart affected services? (bool)
+        :param debounce:        Debounce delay in seconds (float)
+        :param polling:         Force polling instead of inotify? (bool)
+        :param dry_run:         Dry run? (bool) (default: False)
+        """
+        requested_names = config_names
+        config_names = self._get_config_names(config_names, all_configs)
+        if len(config_names) == 0:
+            Logger.warn("no configuration to watch")
+            return
+
+        watcher = watcher_create(self.project.project_path, polling=polling)
+        Logger.info(
+            f"watching {len(config_names)} configuration(s) "
+            f"({watcher.__class__.__name__}), press CTRL+C to stop"
+        )
+
+        try:
+            while True:
+                paths = watcher_wait_for_changes(watcher, debounce)
+                if not paths:
+                    continue
+
+                # Only lock during regeneration, other commands can run
+                lock = self.project.session.get_lock()
+                with lock.try_lock(timeout=-1):
+                    try:
+                        self.project.reload_database()
+                        config_names = self._get_config_names(
+                            requested_names, all_configs
+                        )
+                        self.apply_source_changes(
+                            paths,
+                            config_names,
+                            restart=restart,
+                            dry_run=dry_run,
+                        )
+                    except Exception as exc:
+                        Logger.warn(f"regeneration failed: {exc}")
+        except KeyboardInterrupt:
+            Logger.info("stopped watching")
+        finally:
+            watcher.close()
+
+    def apply_source_changes(
+        self, paths, config_names, restart=False, dry_run=False
+    ):
+        """
+        Regenerate what is needed after project source changes.
+
+        Configurations depending on a changed composefile, environment or
+        static file are fully regenerated, while template changes only
+        render the changed templates.
+
+        :param paths:           Changed paths (iterable)
+        :param config_names:    Config names (list)
+        :param restart:         Restart affected services? (bool)
+        :param dry_run:         Dry run? (bool) (default: False)
+        :rtype: Changes per configuration (dict)
+        """
+        database = self.project.database
+        configs = [database.get_configuration(name) for name in config_names]
+
+        compose_def = ComposeDefinition.load_from_project(
+            self.project.project_path
+        )
+        changes = watcher_get_affected_configurations(
+            compose_def, configs, paths
+        )
+        if len(changes) == 0:
+            return changes
+
+        compose_names = [
+            name for name, change in changes.items() if change.compose
+        ]
+        if len(compose_names) > 0:
+            database.regenerate_configurations(
+                compose_names, compose_def=compose_def
+            )
+
+        for name, change in changes.items():
+            config = database.get_configuration(name)
+            if change.compose:
+                Logger.info(f"configuration `{name}` regenerated")
+            else:
+                for template_path in sorted(change.templates):
+                    renderer_render_template(template_path, config)
+                Logger.info(
+                    f"configuration `{name}`: templates "
+                    f"{sorted(change.templates)} rendered"
+                )
+
+            if restart:
+                services = [
+                    lifecycle_get_service_name(self.project, service, name)
+                    for service in sorted(change.services)
+                ]
+                action = ["up", "-d"] if change.compose else ["restart"]
+                lifecycle_compose_command_on_configs(
+                    self.project, [name], [*action, *services], dry_run=dry_run
+                )
+
+        return changes
+
+    def _snapshot_services(self, config):
+        composefile_path = config.get_composefile_path()
+        if not os.path.isfile(composefile_path):
+            return {}
+
+        compose_def = ComposeDefinition.load_from_path(composefile_path)
+        return composefile_snapshot_services(
+            compose_def.content, self.project.project_path, config.get_path()
+        )
+
+    def _recreate_changed_services(self, config, diff, dry_run=False):
+        if len(diff) == 0:
+            Logger.info(f"configuration `{config.name}`: no service changed")
+            return
+
+        Logger.info(f"configuration `{config.name}`: changed services")
+        for service_name, changes in diff.items():
+            Logger.raw(f"  - {service_name}: {', '.join(changes)}")
+
+        to_recreate = [
+            service_name
+            for service_name, changes in diff.items()
+            if changes != ["removed"]
+        ]
+        if len(to_recreate) == 0:
+            # Only removed services: drop their containers without
+            # (re)starting the rest of the configuration.
+            args = ["up", "--no-start", "--no-recreate", "--remove-orphans"]
+            lifecycle_compose_command_on_configs(
+                self.project, [config.name], args, dry_run=dry_run
+            )
+            return
+
+        args = ["up", "-d"]
+        if len(to_recreate) < len(diff):
+            args += ["--remove-orphans"]
+        args += ["--no-deps", "--force-recreate", *to_recreate]
+
+        lifecycle_compose_command_on_configs(
+            self.project, [config.name], args, dry_run=dry_run
+        )
+
+    def _get_config_names(self, config_names=None, all_configs=False):
+        database = self.project.database
+
+        if not all_configs:
+            configs = lifecycle_get_configs(self.project, config_names)
+            return [config.name for config in configs]
+
+        username = user_get_username()
+        config_names = []
+        for name in sorted(database.configurations):
+            if database.configurations[name].has_permission(username):
+                config_names.append(name)
+            else:
+                Logger.warn(
+                    f"ignoring configuration `{name}`: owned by another user"
+                )
+
+        return config_names
+
+    @evented("config.build", config="name")
+    def build(
+        self,
+        name=None,
+        build_args=None,
+        no_cache=False,
+        dry_run=False,
+        *,
+        all_configs=False,
+        workers=BUILD_MAX_WORKERS,
+    ):
         """
         Build configurations.
 
-        :param name:            Config name (str?)
+        Builds of all configurations are planned together: services
+        sharing a context, Dockerfile and build args are built once, and
+        the image is tagged for each of them. Independent builds run
+        concurrently, in `FROM` dependency order. Builds whose context
+        and build args did not change since the last build are skipped.
+
+        :param name:            Config name, or names (str or list?)
+            (default: current)
         :param build_args:      Build args (list)
         :param no_cache:        No cache? (bool) (default: False)
         :param dry_run:         Dry run? (bool) (default: False)
+        :param all_configs:     All configurations? (bool) (default: False)
+        :param workers:         Max concurrent builds (int)
+        :rtype: Cache status by service name (dict)
         """
-        args = []
-        name = [name] if name else None
-        build_args = build_args or []
+        config_names = [name] if isinstance(name, str) else name
 
-        for x in build_args:
-            args.append("--build-arg")
-            args.append(x)
-
-        if no_cache:
-            args.append("--no-cache")
+        configs = []
+        for config_name in self._get_config_names(config_names, all_configs):
+            config = self.project.database.get_configuration(config_name)
+            if os.path.isfile(config.get_composefile_path()):
+                configs.append(config)
+            else:
+                # Nothing to plan: let compose report it
+                caching_build_compose_services(
+                    self.project,
+                    config,
+                    build_args=build_args,
+                    no_cache=no_cache,
+                    dry_run=dry_run,
+                )
+
+        targets = planning_get_targets(self.project, configs, build_args)
+        services = sum(len(target.services) for target in targets)
+        if services > len(targets):
+            Logger.info(
+                f"{services} services share {len(targets)} unique builds"
+            )
 
-        lifecycle_compose_command_on_configs(
-            self.project, name, ["build", *args], dry_run=dry_run
+        target_statuses = planning_build_targets(
+            self.project,
+            targets,
+            no_cache=no_cache,
+            workers=workers,
+            dry_run=dry_run,
         )
 
+        statuses = {}
+        for i, target in enumerate(targets):
+            for _, service_name in target.services:
+                statuses[service_name] = target_statuses[i]
+        return statuses
+
     def ps(self, config_names=None, dry_run=False):
         """
         Show running containers from configurations.
@@ -543,6 +945,136 @@ class ConfigLifecycle(object):
             self.project, config_names, ["ps"], dry_run=dry_run
         )
 
+    def logs(
+        self,
+        config_names=None,
+        all_configs=False,
+        *,
+        service_names=None,
+        tail=None,
+        follow=False,
+        since=None,
+        until=None,
+        pattern=None,
+        timestamps=False,
+        dry_run=False,
+    ):
+        """
+        Show logs of configuration containers, merged by timestamp.
+
+        Containers are read through the Docker API, concurrently, and
+        each line is prefixed with its service name and replica number.
+
+        :param config_names:    Config names (list?) (default: current)
+        :param all_configs:     All configurations? (bool) (default: False)
+        :param service_names:   Service names (list?) (default: all)
+        :param tail:            Last lines count per container (int?)
+        :param follow:          Follow logs? (bool) (default: False)
+        :param since:           Start time, absolute or relative (str?)
+        :param until:           End time, absolute or relative (str?)
+        :param pattern:         Regular expression filter (str?)
+        :param timestamps:      Show timestamps? (bool) (default: False)
+        :param dry_run:         Dry run? (bool) (default: False)
+        """
+        since = logs_parse_time(since) if since else None
+        until = logs_parse_time(until) if until else None
+
+        database = self.project.database
+        configs = [
+            database.get_configuration(name)
+            for name in self._get_config_names(config_names, all_configs)
+        ]
+        containers_by_config = lifecycle_get_containers_by_config(
+            self.project, configs, dry_run=dry_run
+        )
+
+        # Source names by container name, shared containers shown once
+        sources = OrderedDict()
+        for config in configs:
+            wanted = None
+            if service_names:
+                wanted = {
+                    lifecycle_get_service_name(self.project, name, config.name)
+                    for name in service_names
+                }
+
+            for info in containers_by_config[config.name]:
+                if wanted is None or info["service"] in wanted:
+                    sources.setdefault(
+                        info["name"], f"{info['service']}_{info['number']}"
+                    )
+
+        if dry_run:
+            Logger.debug(f"reading logs of {[c.name for c in configs]}")
+            return
+        if not sources:
+            Logger.warn("no running container")
+            return
+
+        prefixes = logs_get_prefixes(list(sources.values()))
+        with using_docker_client() as client:
+            lines = logs_stream(
+                client,
+                [(source, name) for name, source in sources.items()],
+                follow=follow,
+                tail=tail,
+                since=since,
+                until=until,
+                pattern=pattern,
+            )
+            try:
+                for line in lines:
+                    Logger.raw(logs_format_line(line, prefixes, timestamps))
+            except KeyboardInterrupt:
+                pass
+
+    def query(
+        self,
+        config_names=None,
+        all_configs=False,
+        containers=True,
+        dry_run=False,
+    ):
+        """
+        Query configurations and container states as plain data.
+
+        Container states are fetched with one Docker API call, instead of
+        one `docker-compose ps` per configuration.
+
+        :param config_names:    Config names (list?) (default: current)
+        :param all_configs:     All configurations? (bool) (default: False)
+        :param containers:      Include containers? (bool) (default: True)
+        :param dry_run:         Dry run? (bool) (default: False)
+        :rtype: State (dict)
+        """
+        database = self.project.database
+        current = self.project.get_current_configuration()
+        if all_configs:
+            configs = list(database.configurations.values())
+        elif config_names or current:
+            configs = lifecycle_get_configs(self.project, config_names)
+        else:
+            # Nothing selected
+            configs = []
+
+        entries = database.query_configurations(
+            [config.name for config in configs]
+        )
+        if containers:
+            containers_by_config = lifecycle_get_containers_by_config(
+                self.project, configs, dry_run=dry_run
+            )
+            for entry in entries:
+                entry["containers"] = containers_by_config[entry["name"]]
+
+        return OrderedDict(
+            [
+                ("project", self.project.project_name),
+                ("current", current),
+                ("configurations", entries),
+            ]
+        )
+
 
 class ImageLifecycle(object):
     """Image lifecycle."""
@@ -550,6 +1082,7 @@ class ImageLifecycle(object):
     def __init__(self, project):
         self.project = project
 
+    @evented("image.build", image="image_name")
     def build(
         self,
         image_name,
@@ -562,31 +1095,210 @@ class ImageLifecycle(object):
         """
         Build image.
 
+        The build is skipped when an image was built from the same
+        context, build args and local base images; an image with another
+        tag is tagged. Local base images are tagged as with `build_all`,
+        with the tag prefix of this image.
+
         :param image_name:      Image name (str)
         :param image_tag:       Image tag (str)
         :param image_version:   Image version (str)
         :param build_args:      Build args (list)
         :param no_cache:        No cache? (bool) (default: False)
         :param dry_run:         Dry run? (bool) (default: False)
+        :rtype: Cache status: hit, retag or miss (str)
         """
-        args = []
-        build_args = build_args or []
+        tag = f"{image_tag}:{image_version}"
+        cache = BuildCache(self.project)
+        base_images = {}
+        if not dry_run:
+            base_images = self._get_base_images(
+                image_name, image_tag, image_version, build_args
+            )
+        fingerprint, status = self._lookup_cache(
+            cache,
+            image_name,
+            tag,
+            build_args,
+            no_cache,
+            dry_run,
+            base_images,
+        )
+        if status != CACHE_MISS:
+            Logger.info(f"image `{tag}`: cache {status}, build skipped")
+            cache.save()
+            return status
+
+        exec_docker(
+            self.project.project_path,
+            self._get_build_args(
+                image_name, tag, build_args, no_cache, fingerprint
+            ),
+            dry_run=dry_run,
+        )
+        self._record_cache(cache, tag, fingerprint, dry_run)
+        if not dry_run:
+            cache.save()
+        return status
+
+    @evented("image.build_all")
+    def build_all(
+        self,
+        tag_prefix="",
+        image_version="latest",
+        build_args=None,
+        no_cache=False,
+        workers=BUILD_MAX_WORKERS,
+        dry_run=False,
+    ):
+        """
+        Build all images, in `FROM` dependency order.
+
+        Images are tagged `<tag_prefix><image name>:<image_version>`.
+        Independent images are built concurrently, with their output
+        prefixed by image name. On the first failure, running builds are
+        stopped and no other build starts. Unchanged images are skipped,
+        as with `build`; images built `FROM` a rebuilt image are rebuilt.
+
+        :param tag_prefix:      Image tag prefix (str) (default: "")
+        :param image_version:   Image version (str) (default: latest)
+        :param build_args:      Build args (list)
+        :param no_cache:        No cache? (bool) (default: False)
+        :param workers:         Max concurrent builds (int)
+        :param dry_run:         Dry run? (bool) (default: False)
+        :rtype: Cache status by image name (dict)
+        """
+        project_path = self.project.project_path
+        images = self.project.images
+        dependencies = images.get_dependencies(
+            project_path, tag_prefix, build_args
+        )
+        cache = BuildCache(self.project)
+        image_ids = {}
+
+        def _build(image_name, execute, log):
+            tag = f"{tag_prefix}{image_name}:{image_version}"
+            # Dependencies are built first
+            base_images = {
+                f"{tag_prefix}{name}": image_ids[name]
+                for name in dependencies[image_name]
+            }
+            fingerprint, status = self._lookup_cache(
+                cache,
+                image_name,
+                tag,
+                build_args,
+                no_cache,
+                dry_run,
+                base_images,
+            )
+            if status != CACHE_MISS:
+                log(f"cache {status}, build skipped")
+                image_ids[image_name] = cache.get_image_id(
+                    tag, fingerprint, dry_run
+                )
+                return status
+
+            execute(
+                [
+                    "docker",
+                    *self._get_build_args(
+                        image_name, tag, build_args, no_cache, fingerprint
+                    ),
+                ]
+            )
+            self._record_cache(cache, tag, fingerprint, dry_run)
+            image_ids[image_name] = cache.get_image_id(
+                tag, fingerprint, dry_run
+            )
+            return status
+
+        try:
+            statuses = building_run_commands(
+                dependencies,
+                _build,
+                logs_get_prefixes(list(dependencies)),
+                cwd=project_path,
+                max_workers=workers,
+                dry_run=dry_run,
+            )
+        finally:
+            # Keep successful builds on failure
+            if not dry_run:
+                cache.save()
+
+        hits = [
+            name for name, status in statuses.items() if status != CACHE_MISS
+        ]
+        Logger.info(f"{len(hits)}/{len(statuses)} images from cache: {hits}")
+        return statuses
+
+    def _lookup_cache(
+        self,
+        cache,
+        image_name,
+        tag,
+        build_args,
+        no_cache,
+        dry_run,
+        base_images=None,
+    ):
         image_data = self.project.images.get_image(image_name)
+        fingerprint = cache.get_fingerprint(
+            os.path.join(self.project.project_path, image_data.path),
+            build_args=build_args,
+            base_images=base_images,
+        )
+        if no_cache or dry_run:
+            return fingerprint, CACHE_MISS
+
+        with using_docker_client() as client:
+            return fingerprint, cache.lookup(client, tag, fingerprint)
 
-        for x in build_args:
+    def _get_base_images(
+        self, image_name, image_tag, image_version, build_args
+    ):
+        # Same references as `build_all`, from the prefix of this image
+        tag_prefix = ""
+        if image_tag.endswith(image_name):
+            tag_prefix = image_tag[: -len(image_name)]
+        dependencies = self.project.images.get_dependencies(
+            self.project.project_path, tag_prefix, build_args
+        )
+
+        base_images = {}
+        with using_docker_client() as client:
+            for name in dependencies[image_name]:
+                image = docker_inspect_image(
+                    client, f"{tag_prefix}{name}:{image_version}"
+                )
+                # Missing images are built by the daemon, or pulled
+                if image is not None:
+                    base_images[f"{tag_prefix}{name}"] = image["Id"]
+        return base_images
+
+    def _record_cache(self, cache, tag, fingerprint, dry_run):
+        if dry_run:
+            return
+
+        with using_docker_client() as client:
+            cache.record(client, tag, fingerprint)
+
+    def _get_build_args(
+        self, image_name, tag, build_args, no_cache, fingerprint=None
+    ):
+        image_data = self.project.images.get_image(image_name)
+        args = ["build", image_data.path, "-t", tag]
+        for x in build_args or []:
             args.append("--build-arg")
             args.append(x)
 
         if no_cache:
             args.append("--no-cache")
+        if fingerprint:
+            args += ["--label", f"{FINGERPRINT_LABEL}={fingerprint}"]
 
-        tag = f"{image_tag}:{image_version}"
-
-        exec_docker(
-            self.project.project_path,
-            ["build", image_data.path, "-t", tag, *args],
-            dry_run=dry_run,
-        )
+        return args
 
 
 class ProjectLifecycle(object):
@@ -0,0 +1,293 @@
+"""Build plans, deduplicating builds across configurations."""
+
+import os
+
+from docknv.image.fingerprint import FINGERPRINT_LABEL
+from docknv.image.methods import (
+    image_get_dockerfile_references,
+    image_get_repository,
+)
+from docknv.utils.ioutils import io_open
+from docknv.wrapper import docker_tag_image, using_docker_client
+
+from .building import BUILD_MAX_WORKERS, building_run_commands
+from .caching import (
+    BuildCache,
+    CACHE_HIT,
+    CACHE_MISS,
+    CACHE_RETAG,
+    caching_get_compose_builds,
+)
+from .logs import logs_get_prefixes
+
+# BuildKit runs independent build stages concurrently
+PLANNING_BUILD_ENV = {"DOCKER_BUILDKIT": "1"}
+
+
+class BuildTarget(object):
+    """
+    Unique build, shared by services of one or more configurations.
+
+    Targets are identified by their context, Dockerfile, build args and
+    other build options, such as the target stage; the result is tagged
+    for every consuming service.
+    """
+
+    def __init__(
+        self, key, context, dockerfile, build_args, build_options=None
+    ):
+        """
+        Init.
+
+        :param key:             Key (tuple)
+        :param context:         Context path (str)
+        :param dockerfile:      Dockerfile path, relative to the context
+            (str)
+        :param build_args:      Build args, as KEY=VALUE (list)
+        :param build_options:   Other `docker build` options (list?)
+        """
+        self.key = key
+        self.context = context
+        self.dockerfile = dockerfile
+        self.build_args = build_args
+        self.build_options = build_options or []
+        self.tags = []
+        self.services = []
+
+    def __repr__(self):
+        """Repr."""
+        return f"<BuildTarget {self.tags}>"
+
+    def add_service(self, config_name, service_name, tag):
+        """
+        Add a consuming service.
+
+        :param config_name:     Configuration name (str)
+        :param service_name:    Service name, namespaced (str)
+        :param tag:             Image tag (str)
+        """
+        self.services.append((config_name, service_name))
+        if tag not in self.tags:
+            self.tags.append(tag)
+
+
+def planning_get_key(
+    context, dockerfile=None, build_args=None, build_options=None
+):
+    """
+    Get the key of a build.
+
+    Later build args override earlier ones, as with `docker build`.
+    Build args without value are taken from the environment.
+
+    :param context:         Context path (str)
+    :param dockerfile:      Dockerfile path, relative to the context (str?)
+    :param build_args:      Build args, as KEY=VALUE (list?)
+    :param build_options:   Other `docker build` options (list?)
+    :rtype: Key (tuple)
+    """
+    args = {}
+    for arg in build_args or []:
+        name, sep, value = arg.partition("=")
+        args[name] = value if sep else None
+
+    return (
+        os.path.normpath(os.path.abspath(context)),
+        os.path.normpath(dockerfile or "Dockerfile"),
+        tuple(sorted(args.items())),
+        tuple(build_options or []),
+    )
+
+
+def planning_get_targets(project, configs, build_args=None):
+    """
+    Collect unique builds of configuration services.
+
+    :param project:     Project
+    :param configs:     Configurations (list)
+    :param build_args:  Extra build args, as KEY=VALUE (list?)
+    :rtype: Targets, in discovery order (list)
+    """
+    targets = {}
+    for config in configs:
+        builds = caching_get_compose_builds(project, config, build_args)
+        for service_name, build in builds.items():
+            key = planning_get_key(
+                build["context"],
+                build["dockerfile"],
+                build["build_args"],
+                build["build_options"],
+            )
+            target = targets.get(key)
+            if target is None:
+                target = targets[key] = BuildTarget(
+                    key,
+                    build["context"],
+                    build["dockerfile"] or "Dockerfile",
+                    [
+                        name if value is None else f"{name}={value}"
+                        for name, value in key[2]
+                    ],
+                    build["build_options"],
+                )
+            target.add_service(config.name, service_name, build["tag"])
+
+    return list(targets.values())
+
+
+def planning_get_dependencies(targets):
+    """
+    Get dependencies between targets, from their `FROM` instructions.
+
+    :param targets: Targets (list)
+    :rtype: Dependency indices, by target index (dict)
+    """
+    by_repository = {}
+    for i, target in enumerate(targets):
+        for tag in target.tags:
+            by_repository[image_get_repository(tag)] = i
+
+    dependencies = {}
+    for i, target in enumerate(targets):
+        path = os.path.join(target.context, target.dockerfile)
+        references = []
+        if os.path.isfile(path):
+            with io_open(path, encoding="utf-8", mode="r") as handle:
+                references = image_get_dockerfile_references(
+                    handle.read(), target.build_args
+                )
+
+        dependencies[i] = sorted(
+            {
+                by_repository[reference]
+                for reference in references
+                if by_repository.get(reference, i) != i
+            }
+        )
+
+    return dependencies
+
+
+def planning_build_targets(
+    project,
+    targets,
+    no_cache=False,
+    workers=BUILD_MAX_WORKERS,
+    dry_run=False,
+):
+    """
+    Build targets concurrently, in dependency order.
+
+    Each target is built once, with every tag of its services. Targets
+    whose context and local base images did not change are skipped;
+    missing tags are added from an existing image. On the first failure,
+    running builds are stopped and no other build starts.
+
+    :param project:     Project
+    :param targets:     Targets (list)
+    :param no_cache:    No cache? (bool) (default: False)
+    :param workers:     Max concurrent builds (int)
+    :param dry_run:     Dry run? (bool) (default: False)
+    :rtype: Cache status by target index (dict)
+    """
+    cache = BuildCache(project)
+    dependencies = planning_get_dependencies(targets)
+    image_ids = {}
+
+    def _build(i, execute, log):
+        target = targets[i]
+        # Dependencies are built first
+        base_images = {
+            image_get_repository(targets[j].tags[0]): image_ids[j]
+            for j in dependencies[i]
+        }
+        fingerprint = cache.get_fingerprint(
+            target.context,
+            target.dockerfile,
+            target.build_args,
+            base_images,
+            target.build_options,
+        )
+        status = CACHE_MISS
+        if not (dry_run or no_cache):
+            status = _lookup_target(cache, target, fingerprint)
+        if status != CACHE_MISS:
+            log(f"cache {status}, build skipped")
+            image_ids[i] = cache.get_image_id(
+                target.tags[0], fingerprint, dry_run
+            )
+            return status
+
+        execute(_get_build_command(target, no_cache, fingerprint))
+        if not dry_run:
+            with using_docker_client() as client:
+                for tag in target.tags:
+                    cache.record(client, tag, fingerprint)
+        image_ids[i] = cache.get_image_id(target.tags[0], fingerprint, dry_run)
+        return status
+
+    try:
+        return building_run_commands(
+            dependencies,
+            _build,
+            _get_prefixes(targets),
+            cwd=project.project_path,
+            env=PLANNING_BUILD_ENV,
+            max_workers=workers,
+            dry_run=dry_run,
+        )
+    finally:
+        # Keep successful builds on failure
+        if not dry_run:
+            cache.save()
+
+
+# PRIVATE ##########
+
+
+def _get_prefixes(targets):
+    names = [target.tags[0] for target in targets]
+    prefixes = logs_get_prefixes(names)
+    return {i: prefixes[name] for i, name in enumerate(names)}
+
+
+def _lookup_target(cache, target, fingerprint):
+    with using_docker_client() as client:
+        statuses = {
+            tag: cache.lookup(client, tag, fingerprint) for tag in target.tags
+        }
+        found = [
+            tag for tag, status in statuses.items() if status != CACHE_MISS
+        ]
+        if not found:
+            return CACHE_MISS
+
+        # Tags of new consumers, from the image of another tag
+        for tag, status in statuses.items():
+            if status == CACHE_MISS:
+                docker_tag_image(client, found[0], tag)
+                cache.record(client, tag, fingerprint)
+                statuses[tag] = CACHE_RETAG
+
+    if all(status == CACHE_HIT for status in statuses.values()):
+        return CACHE_HIT
+    return CACHE_RETAG
+
+
+def _get_build_command(target, no_cache, fingerprint):
+    args = [
+        "docker",
+        "build",
+        target.context,
+        "-f",
+        os.path.join(target.context, target.dockerfile),
+    ]
+    for tag in target.tags:
+        args += ["-t", tag]
+    for arg in target.build_args:
+        args += ["--build-arg", arg]
+    args += target.build_options
+    if no_cache:
+        args.append("--no-cache")
+    args += ["--label", f"{FINGERPRINT_LABEL}={fingerprint}"]
+    return args
@@ -0,0 +1,177 @@
+"""File transfers between host and containers, as streamed tar archives."""
+
+import json
+import os
+import posixpath
+
+from docknv.utils.archive import (
+    archive_extract_stream,
+    archive_get_signature,
+    archive_list_entries,
+    archive_stream,
+)
+from docknv.utils.ioutils import io_open
+from docknv.wrapper import (
+    FailedCommandExecution,
+    docker_get_archive,
+    docker_put_archive,
+    docker_stat_is_dir,
+    docker_stat_path,
+    using_docker_client,
+)
+
+MANIFESTS_FOLDER = "manifests"
+
+
+def transfer_push(
+    project,
+    container,
+    host_paths,
+    container_path,
+    compression=None,
+    incremental=False,
+):
+    """
+    Push host paths to a container, in one archive.
+
+    As with `docker cp`, paths are copied in `container_path` if it is a
+    directory, else the only path is copied as `container_path`.
+
+    Each push records file signatures in a manifest per container: in
+    incremental mode, unchanged files are skipped. Files removed on the
+    host are not removed from the container.
+
+    :param project:         Project
+    :param container:       Container info (dict)
+    :param host_paths:      Host paths (list)
+    :param container_path:  Container path (str)
+    :param compression:     Compression: gz, bz2 or xz (str?)
+    :param incremental:     Only send changed files? (bool) (default: False)
+    :rtype: Sent file count (int)
+    """
+    for host_path in host_paths:
+        if not os.path.lexists(host_path):
+            raise FailedCommandExecution(f"missing host path: {host_path}")
+
+    name = container["name"]
+    with using_docker_client() as client:
+        stat = docker_stat_path(client, name, container_path)
+        if docker_stat_is_dir(stat):
+            destination = container_path
+            roots = [
+                (path, os.path.basename(os.path.normpath(path)))
+                for path in host_paths
+            ]
+        elif len(host_paths) == 1:
+            destination = posixpath.dirname(container_path) or "/"
+            roots = [(host_paths[0], posixpath.basename(container_path))]
+        else:
+            raise FailedCommandExecution(
+                f"{container_path} is not a directory in {name}"
+            )
+
+        manifest_path = transfer_get_manifest_path(project, container["id"])
+        manifest = transfer_load_manifest(manifest_path)
+        known = manifest.get(destination, {}) if incremental else {}
+
+        entries = []
+        signatures = {}
+        sent = 0
+        for root_path, root_name in roots:
+            for path, arcname in archive_list_entries(root_path, root_name):
+                if os.path.isdir(path) and not os.path.islink(path):
+                    # Directory entries are small, and keep permissions
+                    entries.append((path, arcname))
+                    continue
+
+                signature = archive_get_signature(path)
+                signatures[arcname] = signature
+                if known.get(arcname) != signature:
+                    entries.append((path, arcname))
+                    sent += 1
+
+        if incremental and sent == 0:
+            return 0
+
+        docker_put_archive(
+            client, name, destination, archive_stream(entries, compression)
+        )
+
+    manifest.setdefault(destination, {}).update(signatures)
+    transfer_save_manifest(manifest_path, manifest)
+    return sent
+
+
+def transfer_pull(container, container_paths, host_path, compression=False):
+    """
+    Pull container paths to the host.
+
+    As with `docker cp`, paths are copied in `host_path` if it is a
+    directory, else the only path is copied as `host_path`.
+
+    :param container:       Container name or ID (str)
+    :param container_paths: Container paths (list)
+    :param host_path:       Host path (str)
+    :param compression:     Compress the transfer? (bool) (default: False)
+    :rtype: Extracted entry count (int)
+    """
+    if not os.path.isdir(host_path) and len(container_paths) > 1:
+        os.makedirs(host_path)
+
+    count = 0
+    with using_docker_client() as client:
+        for container_path in container_paths:
+            chunks, stat = docker_get_archive(
+                client, container, container_path, compression=compression
+            )
+            if os.path.isdir(host_path):
+                destination = host_path
+                rename = None
+            else:
+                destination = os.path.dirname(os.path.abspath(host_path))
+                rename = (stat["name"], os.path.basename(host_path))
+
+            count += archive_extract_stream(chunks, destination, rename)
+
+    return count
+
+
+def transfer_get_manifest_path(project, container_id):
+    """
+    Get the push manifest path of a container.
+
+    Manifests are per container ID: recreated containers start empty.
+
+    :param project:         Project
+    :param container_id:    Container ID (str)
+    :rtype: Manifest path (str)
+    """
+    return project.session.get_paths().get_file_path(
+        os.path.join(MANIFESTS_FOLDER, f"{container_id}.json")
+    )
+
+
+def transfer_load_manifest(path):
+    """
+    Load a push manifest.
+
+    :param path:    Manifest path (str)
+    :rtype: Signatures by destination and name in archive (dict)
+    """
+    if not os.path.isfile(path):
+        return {}
+
+    with io_open(path, mode="r") as handle:
+        return json.load(handle)
+
+
+def transfer_save_manifest(path, manifest):
+    """
+    Save a push manifest.
+
+    :param path:        Manifest path (str)
+    :param manifest:    Manifest (dict)
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with io_open(path, mode="w") as handle:
+        json.dump(manifest, handle)
@@ -2,3 +2,4 @@
 
 from .models import *  # noqa
 from .exception import *  # noqa
+from .handlers import *  # noqa
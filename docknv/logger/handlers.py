@@ -0,0 +1,333 @@
+"""Logger handlers."""
+
+import json
+import os
+import re
+import sys
+import threading
+
+from colorama import Style
+
+from docknv.utils.events import events_emit, events_get_operation
+
+ANSI_PATTERN = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+# Max buffered characters in batches, before writing
+HANDLER_BUFFER_SIZE = 64 * 1024
+
+
+class LogRecord(object):
+    """Log record."""
+
+    __slots__ = ("level", "message", "color", "linebreak", "time", "elapsed")
+
+    def __init__(self, level, message, color, linebreak, time, elapsed):
+        """
+        Init.
+
+        :param level:       Level, None for raw output (str?)
+        :param message:     Message (str)
+        :param color:       Color (color?)
+        :param linebreak:   Line break? (bool)
+        :param time:        Time, as UNIX timestamp (float)
+        :param elapsed:     Time since start, in seconds (float)
+        """
+        self.level = level
+        self.message = message
+        self.color = color
+        self.linebreak = linebreak
+        self.time = time
+        self.elapsed = elapsed
+
+    def get_text(self):
+        """
+        Get the record text, without color.
+
+        :rtype: Text (str)
+        """
+        text = str(self.message)
+        if self.level is not None:
+            text = f"[{self.elapsed:.4f}] [{self.level}] {text}"
+        return text
+
+
+class LogHandler(object):
+    """
+    Log handler.
+
+    Formatted records are buffered: outside of batches, they are written
+    at once; in batches, when the buffer is full or the batch ends.
+    """
+
+    def __init__(self, logs=True, raw=True, buffer_size=HANDLER_BUFFER_SIZE):
+        """
+        Init.
+
+        :param logs:        Handle log records? (bool) (default: True)
+        :param raw:         Handle raw output? (bool) (default: True)
+        :param buffer_size: Max buffered characters in batches (int)
+        """
+        self.logs = logs
+        self.raw = raw
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.buffer_length = 0
+        self.lock = threading.Lock()
+
+    def accepts(self, record):
+        """
+        Check if a record is handled.
+
+        :param record:  Record (LogRecord)
+        :rtype: True/False
+        """
+        return self.raw if record.level is None else self.logs
+
+    def handle(self, record, batched=False):
+        """
+        Handle a record.
+
+        :param record:  Record (LogRecord)
+        :param batched: In a batch? (bool) (default: False)
+        """
+        text = self.format(record)
+        with self.lock:
+            self.buffer.append(text)
+            self.buffer_length += len(text)
+            if not batched or self.buffer_length >= self.buffer_size:
+                self._flush()
+
+    def flush(self):
+        """Write buffered records."""
+        with self.lock:
+            self._flush()
+
+    def reset(self):
+        """Reset state depending on output streams."""
+
+    def close(self):
+        """Close."""
+        self.flush()
+
+    def format(self, record):
+        """
+        Format a record.
+
+        :param record:  Record (LogRecord)
+        :rtype: Text (str)
+        """
+        raise NotImplementedError()
+
+    def write(self, data):
+        """
+        Write formatted records.
+
+        :param data:    Data (str)
+        """
+        raise NotImplementedError()
+
+    def _flush(self):
+        if self.buffer:
+            data = "".join(self.buffer)
+            self.buffer.clear()
+            self.buffer_length = 0
+            self.write(data)
+
+
+class StreamHandler(LogHandler):
+    """
+    Standard stream handler.
+
+    Colors are only written to terminals, unless `NO_COLOR` or
+    `FORCE_COLOR` are set.
+    """
+
+    def __init__(self, stream_name="stdout", color=None, **kwargs):
+        """
+        Init.
+
+        :param stream_name: Stream name: stdout or stderr (str)
+        :param color:       Use colors? (bool?) (default: detected)
+        :param kwargs:      `LogHandler` arguments
+        """
+        super(StreamHandler, self).__init__(**kwargs)
+        self.stream_name = stream_name
+        self.color = color
+        self._color_stream = None
+        self._color_enabled = False
+
+    def get_stream(self):
+        """
+        Get the stream, resolved on each use (it may be replaced).
+
+        :rtype: Stream
+        """
+        return getattr(sys, self.stream_name)
+
+    def format(self, record):
+        """
+        Format a record.
+
+        :param record:  Record (LogRecord)
+        :rtype: Text (str)
+        """
+        text = record.get_text()
+        if self._is_color_enabled():
+            if record.color:
+                text = f"{record.color}{text}{Style.RESET_ALL}"
+        elif "\x1b" in text:
+            text = ANSI_PATTERN.sub("", text)
+
+        return text + "\n" if record.linebreak else text
+
+    def write(self, data):
+        """
+        Write formatted records.
+
+        :param data:    Data (str)
+        """
+        stream = self.get_stream()
+        stream.write(data)
+        stream.flush()
+
+    def reset(self):
+        """Reset state depending on output streams."""
+        self._color_stream = None
+
+    def _is_color_enabled(self):
+        stream = self.get_stream()
+        if stream is not self._color_stream:
+            self._color_stream = stream
+            self._color_enabled = (
+                handler_get_color_support(stream)
+                if self.color is None
+                else self.color
+            )
+        return self._color_enabled
+
+
+class FileHandler(LogHandler):
+    """File handler, appending plain text."""
+
+    def __init__(self, path, **kwargs):
+        """
+        Init.
+
+        :param path:    File path (str)
+        :param kwargs:  `LogHandler` arguments
+        """
+        super(FileHandler, self).__init__(**kwargs)
+        self.path = path
+        self.handle_file = None
+
+    def format(self, record):
+        """
+        Format a record.
+
+        :param record:  Record (LogRecord)
+        :rtype: Text (str)
+        """
+        text = record.get_text()
+        if "\x1b" in text:
+            text = ANSI_PATTERN.sub("", text)
+        return text + "\n" if record.linebreak else text
+
+    def write(self, data):
+        """
+        Write formatted records.
+
+        :param data:    Data (str)
+        """
+        if self.handle_file is None:
+            self.handle_file = open(self.path, mode="a", encoding="utf-8")
+        self.handle_file.write(data)
+        self.handle_file.flush()
+
+    def close(self):
+        """Close."""
+        self.flush()
+        if self.handle_file is not None:
+            self.handle_file.close()
+            self.handle_file = None
+
+
+class JSONLinesHandler(FileHandler):
+    """File handler, appending one JSON object per log record."""
+
+    def __init__(self, path, **kwargs):
+        """
+        Init.
+
+        :param path:    File path (str)
+        :param kwargs:  `LogHandler` arguments (default: no raw output)
+        """
+        kwargs.setdefault("raw", False)
+        super(JSONLinesHandler, self).__init__(path, **kwargs)
+
+    def format(self, record):
+        """
+        Format a record.
+
+        :param record:  Record (LogRecord)
+        :rtype: Text (str)
+        """
+        message = str(record.message)
+        if "\x1b" in message:
+            message = ANSI_PATTERN.sub("", message)
+
+        data = {
+            "time": record.time,
+            "elapsed": round(record.elapsed, 4),
+            "level": record.level,
+            "message": message,
+        }
+        return json.dumps(data) + "\n"
+
+
+class EventHandler(LogHandler):
+    """Event log handler, writing log records as events."""
+
+    def __init__(self, **kwargs):
+        """
+        Init.
+
+        :param kwargs:  `LogHandler` arguments (default: no raw output)
+        """
+        kwargs.setdefault("raw", False)
+        super(EventHandler, self).__init__(**kwargs)
+
+    def handle(self, record, batched=False):
+        """
+        Handle a record.
+
+        The event log is already asynchronous: records are not buffered.
+
+        :param record:  Record (LogRecord)
+        :param batched: In a batch? (bool) (default: False)
+        """
+        message = str(record.message)
+        if "\x1b" in message:
+            message = ANSI_PATTERN.sub("", message)
+
+        operation = events_get_operation()
+        events_emit(
+            "log",
+            level=record.level,
+            message=message,
+            operation=operation.name if operation else None,
+        )
+
+
+def handler_get_color_support(stream):
+    """
+    Check if a stream supports colors.
+
+    :param stream:  Stream
+    :rtype: True/False
+    """
+    if "NO_COLOR" in os.environ:
+        return False
+    if os.environ.get("FORCE_COLOR"):
+        return True
+
+    isatty = getattr(stream, "isatty", None)
+    return bool(isatty and isatty())
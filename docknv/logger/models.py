@@ -1,25 +1,39 @@
 """Simple logger."""
 
-import time
+import atexit
+from contextlib import contextmanager
 import sys
+import time
 
 import colorama
-from colorama import Fore, Style
-import six
+from colorama import Fore, Style  # noqa
 
 from .exception import LoggerError
+from .handlers import LogRecord, StreamHandler
 
 INIT_TIME = time.time()
 VERBOSE = True
 
-colorama.init()
+# Colors are only written to terminals: ANSI sequences only need a
+# conversion on Windows
+if sys.platform == "win32":
+    colorama.init()
 
 
 class Logger(object):
-    """Simple logger."""
+    """
+    Simple logger.
+
+    Records are written by handlers, to stdout by default. In batches,
+    writes are grouped, e.g. when showing many lines.
+    """
 
     LOGGER_LEVELS = ["DEBUG", "INFO", "WARN", "ERROR", "NONE"]
+    LEVEL_INDICES = {level: i for i, level in enumerate(LOGGER_LEVELS)}
     current_level = "DEBUG"
+    current_level_index = 0
+    handlers = [StreamHandler()]
+    batch_depth = 0
 
     @staticmethod
     def set_log_level(value):
@@ -28,7 +42,11 @@ class Logger(object):
 
         :param value:   Value (str)
         """
+        if value not in Logger.LEVEL_INDICES:
+            raise RuntimeError(f"Bad log level value: {value}")
+
         Logger.current_level = value
+        Logger.current_level_index = Logger.LEVEL_INDICES[value]
 
     @staticmethod
     def get_log_level():
@@ -39,6 +57,70 @@ class Logger(object):
         """
         return Logger.current_level
 
+    @staticmethod
+    def is_enabled(level):
+        """
+        Check if a log level is enabled, e.g. before costly formatting.
+
+        :param level:   Level (str)
+        :rtype: True/False
+        """
+        return Logger.LEVEL_INDICES[level] >= Logger.current_level_index
+
+    @staticmethod
+    def set_handlers(handlers):
+        """
+        Set the log handlers.
+
+        Previous handlers are closed.
+
+        :param handlers:    Handlers (list)
+        """
+        for handler in Logger.handlers:
+            if handler not in handlers:
+                handler.close()
+        Logger.handlers = list(handlers)
+
+    @staticmethod
+    def add_handler(handler):
+        """
+        Add a log handler.
+
+        :param handler: Handler (LogHandler)
+        """
+        Logger.handlers = [*Logger.handlers, handler]
+
+    @staticmethod
+    def flush():
+        """Write buffered records."""
+        for handler in Logger.handlers:
+            handler.flush()
+
+    @staticmethod
+    def reset():
+        """Reset handlers, once output streams changed."""
+        Logger.flush()
+        for handler in Logger.handlers:
+            handler.reset()
+
+    @staticmethod
+    @contextmanager
+    def batch():
+        """
+        Group writes until the end of the batch.
+
+        Buffers are still written when full.
+
+        **Context manager**
+        """
+        Logger.batch_depth += 1
+        try:
+            yield
+        finally:
+            Logger.batch_depth -= 1
+            if Logger.batch_depth == 0:
+                Logger.flush()
+
     @staticmethod
     def log(msg_type, message, color):
         """
@@ -48,19 +130,16 @@ class Logger(object):
         :param message:      Message content (str)
         :param color:        Message color (color)
         """
-        if Logger._is_active(msg_type):
-            current_time = time.time() - INIT_TIME
-            logged_str = "{0}[{1}] [{2}] {3}{4}".format(
-                color,
-                Logger._round_time(current_time),
-                msg_type,
-                message,
-                Style.RESET_ALL,
-            )
+        level_index = Logger.LEVEL_INDICES.get(msg_type)
+        if level_index is None:
+            raise RuntimeError(f"Bad log level value: {msg_type}")
+        if level_index < Logger.current_level_index:
+            return
 
-            if six.PY2:
-                logged_str = logged_str.decode("utf-8", errors="replace")
-            print(logged_str)
+        now = time.time()
+        Logger._emit(
+            LogRecord(msg_type, message, color, True, now, now - INIT_TIME)
+        )
 
     @staticmethod
     def info(message, color=Fore.GREEN):
@@ -128,35 +207,17 @@ class Logger(object):
         :param color:        Message color (color?) (default: None)
         :param linebreak:    Insert linebreak (bool) (default: True)
         """
-        if color:
-            message = "{0}{1}{2}".format(color, message, Style.RESET_ALL)
-
-        if six.PY2:
-            message = unicode(message)  # noqa
-
-        if linebreak:
-            print(message)
-        else:
-            sys.stdout.write(message)
+        now = time.time()
+        Logger._emit(
+            LogRecord(None, message, color, linebreak, now, now - INIT_TIME)
+        )
 
     @staticmethod
-    def _round_time(seconds):
-        string_seconds = str(float(seconds))
-        length = 4
+    def _emit(record):
+        batched = Logger.batch_depth > 0
+        for handler in Logger.handlers:
+            if handler.accepts(record):
+                handler.handle(record, batched)
 
-        prev_part, next_part = string_seconds.split(".")
-        next_part_length = len(next_part)
-
-        if next_part_length > length:
-            next_part = next_part[:length]
-
-        return ".".join([prev_part, next_part])
-
-    @staticmethod
-    def _is_active(level):
-        if level not in Logger.LOGGER_LEVELS:
-            raise RuntimeError("Bad log level value: {0}".format(level))
 
-        idx = Logger.LOGGER_LEVELS.index(level)
-        curr_idx = Logger.LOGGER_LEVELS.index(Logger.current_level)
-        return idx >= curr_idx
+atexit.register(Logger.flush)
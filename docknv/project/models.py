@@ -11,6 +11,7 @@ from docknv.lifecycle import ProjectLifecycle
 
 from docknv.utils.ioutils import io_open
 from docknv.utils.serialization import yaml_ordered_load
+from docknv.utils.tracing import traced
 
 from .methods import (
     project_get_name_from_path,
@@ -43,7 +44,18 @@ class Project(object):
         )
         self.database = Database.load_from_project(self)
         self.lifecycle = ProjectLifecycle(self)
-        self.images = ImageCollection.load_from_project(self)
+        self._images = None
+
+    def reload_database(self):
+        """Reload the configuration database, e.g. after external edits."""
+        self.database = Database.load_from_project(self)
+
+    @property
+    def images(self):
+        """Get images, discovered on first access."""
+        if self._images is None:
+            self._images = ImageCollection.load_from_project(self)
+        return self._images
 
     def __repr__(self):
         """Repr."""
@@ -131,6 +143,7 @@ class Project(object):
         return project_is_valid(project_path)
 
     @classmethod
+    @traced("project.load")
     def load_from_path(cls, project_path):
         """
         Load from project path.
@@ -0,0 +1,5 @@
+"""Command server."""
+
+from .models import *  # noqa
+from .methods import *  # noqa
+from .exceptions import *  # noqa
@@ -0,0 +1,22 @@
+"""Server exceptions."""
+
+
+class ServerAlreadyRunning(Exception):
+    """Server is already running."""
+
+    def __init__(self, socket_path):
+        """Init."""
+        message = f"a server is already listening on {socket_path}"
+        super(ServerAlreadyRunning, self).__init__(message)
+
+
+class InsecureSocketDirectory(Exception):
+    """Socket directory is not private."""
+
+    def __init__(self, socket_dir):
+        """Init."""
+        message = (
+            f"socket directory {socket_dir} must be owned by the current "
+            "user, with mode 0700"
+        )
+        super(InsecureSocketDirectory, self).__init__(message)
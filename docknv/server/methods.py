@@ -0,0 +1,207 @@
+"""Server methods.
+
+Only standard modules are imported here: the client side runs before
+anything else in `docknv_entry_point`.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import stat
+import struct
+
+SERVER_SOCKET_ENV = "DOCKNV_SOCKET"
+SERVER_DISABLE_ENV = "DOCKNV_NO_SERVER"
+SERVER_COMMAND = "serve"
+
+HEADER = struct.Struct(">I")
+STATUS = struct.Struct(">i")
+# struct ucred: pid, uid, gid
+PEER_CREDENTIALS = struct.Struct("3i")
+
+# Global options taking a value, before the command name
+VALUE_OPTIONS = ("-p", "--project")
+
+
+def server_get_socket_path(project_path):
+    """
+    Get the server socket path of a project.
+
+    Sockets are stored in a private runtime directory, named after the
+    project real path (Unix socket paths are limited in length).
+    `DOCKNV_SOCKET` overrides the path.
+
+    :param project_path:    Project path (str)
+    :rtype: Socket path (str)
+    """
+    socket_path = os.environ.get(SERVER_SOCKET_ENV)
+    if socket_path:
+        return socket_path
+
+    runtime_path = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    project_hash = hashlib.sha1(
+        os.path.realpath(project_path).encode("utf-8")
+    ).hexdigest()[:16]
+
+    return os.path.join(
+        runtime_path, f"docknv-{os.getuid()}", f"{project_hash}.sock"
+    )
+
+
+def server_check_socket_dir(socket_dir):
+    """
+    Check that a socket directory is private.
+
+    The directory must be a real directory, owned by the current user,
+    with mode 0700: otherwise another user could serve or intercept
+    commands, with their environment and terminal.
+
+    :param socket_dir:  Socket directory (str)
+    :rtype: True/False
+    """
+    try:
+        stats = os.lstat(socket_dir)
+    except OSError:
+        return False
+
+    return (
+        stat.S_ISDIR(stats.st_mode)
+        and stats.st_uid == os.getuid()
+        and stat.S_IMODE(stats.st_mode) == 0o700
+    )
+
+
+def server_get_peer_uid(sock):
+    """
+    Get the user ID of the process on the other end of a Unix socket.
+
+    :param sock:    Connected socket
+    :rtype: User ID (int?) (None if unavailable)
+    """
+    option = getattr(socket, "SO_PEERCRED", None)
+    if option is None:
+        return None
+
+    try:
+        data = sock.getsockopt(
+            socket.SOL_SOCKET, option, PEER_CREDENTIALS.size
+        )
+    except OSError:
+        return None
+
+    return PEER_CREDENTIALS.unpack(data)[1]
+
+
+def server_parse_command_line(args):
+    """
+    Extract the project path and command name from arguments.
+
+    Only global options are inspected, without building the parser.
+
+    :param args:    Arguments (list)
+    :rtype: Project path and command name (tuple)
+    """
+    project_path = "."
+    command = None
+
+    args_iter = iter(args)
+    for arg in args_iter:
+        if arg in VALUE_OPTIONS:
+            project_path = next(args_iter, project_path)
+        elif arg.startswith("--project="):
+            project_path = arg.split("=", 1)[1]
+        elif arg.startswith("-p") and not arg.startswith("--"):
+            project_path = arg[2:]
+        elif not arg.startswith("-"):
+            command = arg
+            break
+
+    return project_path, command
+
+
+def server_get_project_fingerprint(project_path, username):
+    """
+    Get a fingerprint of files read when loading a project.
+
+    :param project_path:    Project path (str)
+    :param username:        Username (str)
+    :rtype: Fingerprint (tuple)
+    """
+    paths = [
+        os.path.join(project_path, "config.yml"),
+        os.path.join(project_path, ".docknv", ".docknv.yml"),
+        os.path.join(project_path, ".docknv", username, "docknv.yml"),
+    ]
+
+    environments_path = os.path.join(project_path, "envs")
+    if os.path.isdir(environments_path):
+        paths.append(environments_path)
+        paths.extend(
+            entry.path
+            for entry in os.scandir(environments_path)
+            if entry.is_file()
+        )
+
+    images_path = os.path.join(project_path, "images")
+    for root, _folders, _files in os.walk(images_path):
+        paths.append(root)
+
+    fingerprint = []
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            fingerprint.append((path, None))
+            continue
+        fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+
+    return tuple(fingerprint)
+
+
+def server_encode_request(argv, cwd, environ):
+    """
+    Encode a command request.
+
+    :param argv:    Command line (list)
+    :param cwd:     Working directory (str)
+    :param environ: Environment variables (dict)
+    :rtype: Request (bytes)
+    """
+    payload = json.dumps(
+        {"argv": argv, "cwd": cwd, "env": dict(environ)}
+    ).encode("utf-8")
+
+    return HEADER.pack(len(payload)) + payload
+
+
+def server_recv_exact(sock, length):
+    """
+    Receive exactly `length` bytes.
+
+    :param sock:    Socket
+    :param length:  Length (int)
+    :rtype: Data (bytes?) (None if the connection was closed)
+    """
+    data = b""
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            return None
+        data += chunk
+
+    return data
+
+
+def server_recv_status(sock):
+    """
+    Receive a status value (process ID or exit code).
+
+    :param sock:    Socket
+    :rtype: Value (int?) (None if the connection was closed)
+    """
+    data = server_recv_exact(sock, STATUS.size)
+    if data is None:
+        return None
+
+    return STATUS.unpack(data)[0]
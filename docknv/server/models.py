@@ -0,0 +1,367 @@
+"""Server models.
+
+Heavy modules are imported by the server itself, keeping the client cheap.
+"""
+
+import array
+import io
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+
+from .exceptions import InsecureSocketDirectory, ServerAlreadyRunning
+from .methods import (
+    HEADER,
+    STATUS,
+    server_check_socket_dir,
+    server_encode_request,
+    server_get_peer_uid,
+    server_get_project_fingerprint,
+    server_get_socket_path,
+    server_recv_exact,
+    server_recv_status,
+)
+
+# Forwarded file descriptors: stdin, stdout, stderr
+FORWARDED_FDS = (0, 1, 2)
+
+
+class ServerClient(object):
+    """Forward commands to a running server."""
+
+    def __init__(self, socket_path):
+        """
+        Init.
+
+        :param socket_path: Socket path (str)
+        """
+        self.socket_path = socket_path
+
+    def forward(self, argv, cwd, environ):
+        """
+        Run a command on the server.
+
+        Standard streams are passed to the server, so output is written
+        directly to them. CTRL+C is forwarded to the command.
+
+        Nothing is sent unless the socket directory is private and the
+        server runs as the current user.
+
+        :param argv:    Command line (list)
+        :param cwd:     Working directory (str)
+        :param environ: Environment variables (dict)
+        :rtype: Exit code (int?) (None if no server is available)
+        """
+        if not os.path.exists(self.socket_path):
+            return None
+        socket_dir = os.path.dirname(self.socket_path) or "."
+        if not server_check_socket_dir(socket_dir):
+            sys.stderr.write(
+                f"docknv: ignoring server socket {self.socket_path}, "
+                "its directory is not private\n"
+            )
+            return None
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+            if server_get_peer_uid(sock) != os.getuid():
+                sys.stderr.write(
+                    f"docknv: ignoring server socket {self.socket_path}, "
+                    "owned by another user\n"
+                )
+                sock.close()
+                return None
+
+            request = server_encode_request(argv, cwd, environ)
+            header_size = HEADER.size
+            sock.sendmsg(
+                [request[:header_size]],
+                [
+                    (
+                        socket.SOL_SOCKET,
+                        socket.SCM_RIGHTS,
+                        array.array("i", FORWARDED_FDS),
+                    )
+                ],
+            )
+            sock.sendall(request[header_size:])
+        except OSError:
+            # Stale socket or unusable streams, run locally
+            sock.close()
+            return None
+
+        with sock:
+            pid = server_recv_status(sock)
+            if pid is None:
+                return 1
+
+            while True:
+                try:
+                    exit_code = server_recv_status(sock)
+                    break
+                except KeyboardInterrupt:
+                    try:
+                        os.killpg(pid, signal.SIGINT)
+                    except OSError:
+                        pass
+
+        return 1 if exit_code is None else exit_code
+
+
+class Server(object):
+    """Keep a project loaded and run commands in forked processes."""
+
+    def __init__(self, project_path, socket_path=None):
+        """
+        Init.
+
+        :param project_path:    Project path (str)
+        :param socket_path:     Socket path (str?) (default: per project)
+        """
+        self.project_path = os.path.realpath(project_path)
+        self.socket_path = socket_path or server_get_socket_path(
+            self.project_path
+        )
+        self.socket = None
+        self.project = None
+        self.fingerprint = None
+        self.children = set()
+
+    def preload(self):
+        """Import every module a command may need."""
+        import importlib
+
+        import docker  # noqa
+        import jinja2  # noqa
+        import slugify  # noqa
+
+        from docknv.shell.registry import COMMAND_SPECS
+
+        for spec in COMMAND_SPECS:
+            importlib.import_module("docknv.shell.handlers." + spec.name)
+
+    def get_project(self):
+        """
+        Get the loaded project, reloaded when its files changed.
+
+        :rtype: Project (Project?) (None if the project cannot be loaded)
+        """
+        from docknv.logger import Logger
+        from docknv.project import Project
+        from docknv.user import user_get_username
+
+        fingerprint = server_get_project_fingerprint(
+            self.project_path, user_get_username()
+        )
+        if fingerprint != self.fingerprint:
+            Logger.debug(f"loading project {self.project_path}")
+            self.fingerprint = fingerprint
+            try:
+                self.project = Project.load_from_path(self.project_path)
+            except BaseException as exc:
+                # Commands will load the project themselves and report it
+                Logger.debug(f"project not loaded: {exc}")
+                self.project = None
+
+        return self.project
+
+    def serve_forever(self, poll_interval=1.0):
+        """
+        Accept commands until interrupted.
+
+        :param poll_interval:   Child reaping interval (float)
+        """
+        self._bind()
+        previous_handler = signal.signal(
+            signal.SIGTERM, lambda *args: sys.exit(0)
+        )
+
+        try:
+            while True:
+                readable, _, _ = select.select(
+                    [self.socket], [], [], poll_interval
+                )
+                self._reap_children()
+
+                if readable:
+                    connection, _ = self.socket.accept()
+                    self._handle_connection(connection)
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+            self.close()
+
+    def close(self):
+        """Stop listening."""
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def _bind(self):
+        socket_dir = os.path.dirname(self.socket_path) or "."
+        if not os.path.exists(socket_dir):
+            os.makedirs(socket_dir, mode=0o700)
+        if not server_check_socket_dir(socket_dir):
+            raise InsecureSocketDirectory(socket_dir)
+
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                # Stale socket
+                os.unlink(self.socket_path)
+            else:
+                raise ServerAlreadyRunning(self.socket_path)
+            finally:
+                probe.close()
+
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self.socket.listen(64)
+
+    def _reap_children(self):
+        for pid in list(self.children):
+            try:
+                finished, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                finished = pid
+            if finished:
+                self.children.discard(pid)
+
+    def _handle_connection(self, connection):
+        if server_get_peer_uid(connection) != os.getuid():
+            connection.close()
+            return
+
+        try:
+            fds, request = self._read_request(connection)
+        except (OSError, ValueError):
+            connection.close()
+            return
+
+        if request is None or len(fds) != len(FORWARDED_FDS):
+            for fd in fds:
+                os.close(fd)
+            connection.close()
+            return
+
+        project = self.get_project()
+
+        # Pending output would be written again by the child
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            self._run_child(connection, fds, request, project)
+
+        for fd in fds:
+            os.close(fd)
+        connection.close()
+        self.children.add(pid)
+
+    def _read_request(self, connection):
+        fds = array.array("i")
+        header, ancdata, _flags, _addr = connection.recvmsg(
+            HEADER.size, socket.CMSG_LEN(len(FORWARDED_FDS) * fds.itemsize)
+        )
+        for level, kind, data in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                fds.frombytes(data[: len(data) - len(data) % fds.itemsize])
+
+        if len(header) < HEADER.size:
+            rest = server_recv_exact(connection, HEADER.size - len(header))
+            if rest is None:
+                return list(fds), None
+            header += rest
+
+        payload = server_recv_exact(connection, HEADER.unpack(header)[0])
+        if payload is None:
+            return list(fds), None
+
+        return list(fds), json.loads(payload.decode("utf-8"))
+
+    def _run_child(self, connection, fds, request, project):
+        exit_code = 1
+        try:
+            self.socket.close()
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+
+            # Own process group, to receive the client CTRL+C
+            os.setpgid(0, 0)
+            connection.sendall(STATUS.pack(os.getpid()))
+
+            for target_fd, fd in zip(FORWARDED_FDS, fds):
+                os.dup2(fd, target_fd)
+                os.close(fd)
+
+            os.chdir(request["cwd"])
+            os.environ.clear()
+            os.environ.update(request["env"])
+            sys.argv = request["argv"]
+            _reset_output()
+
+            from docknv.shell.common import PRELOADED_PROJECTS
+            from docknv.shell.main import docknv_run
+
+            if project is not None:
+                PRELOADED_PROJECTS[self.project_path] = project
+
+            exit_code = _get_exit_code(docknv_run(sys.argv[1:]))
+        except SystemExit as exc:
+            exit_code = _get_exit_code(exc.code)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                connection.sendall(STATUS.pack(exit_code))
+            except BaseException:
+                pass
+            os._exit(exit_code)
+
+
+def _reset_output():
+    from docknv.logger import Logger
+    import docknv.logger.models as logger_models
+
+    # Streams changed: detect terminal support again
+    for name in ("stdout", "stderr"):
+        stream = getattr(sys, name)
+        line_buffering = stream.isatty()
+        if hasattr(stream, "reconfigure"):
+            stream.reconfigure(line_buffering=line_buffering)
+        else:
+            # No reconfigure before Python 3.7
+            stream.flush()
+            setattr(
+                sys,
+                name,
+                io.TextIOWrapper(
+                    os.fdopen(stream.fileno(), "wb", 0, closefd=False),
+                    encoding=stream.encoding,
+                    errors=stream.errors,
+                    line_buffering=line_buffering,
+                    write_through=True,
+                ),
+            )
+    Logger.reset()
+    logger_models.INIT_TIME = time.time()
+
+
+def _get_exit_code(value):
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value
+    return 1
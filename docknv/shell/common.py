@@ -1,7 +1,12 @@
 """Common handler code."""
 
+import os
+
 from docknv.project import Project
 
+# Projects kept loaded by `docknv serve`, by real path
+PRELOADED_PROJECTS = {}
+
 
 def exec_handler(cmd_name, args, handlers):
     """
@@ -24,5 +29,7 @@ def load_project(project_path):
 
     :param project_path:    Project path (str)
     """
-    project = Project.load_from_path(project_path)
+    project = PRELOADED_PROJECTS.get(os.path.realpath(project_path))
+    if project is None:
+        project = Project.load_from_path(project_path)
     return project
@@ -1,10 +1,16 @@
 """Custom shell."""
 
 import argparse
+import importlib.util
+import json
 import os
+import re
 import sys
 
 from docknv.project import Project
+from docknv.utils.ioutils import io_open
+
+COMMANDS_MANIFEST_NAME = "commands.json"
 
 
 class MalformedCommand(Exception):
@@ -50,6 +56,40 @@ class CustomShell(object):
         """
         self.post_parsers.append(fct)
 
+    def register_command_placeholder(self, name, help):
+        """
+        Register a command without loading its module.
+
+        Arguments are accepted as-is, to detect the selected command.
+
+        :param name:    Command name (str)
+        :param help:    Help text (str?)
+        """
+        if help is None:
+            parser = self.subparsers.add_parser(name)
+        else:
+            parser = self.subparsers.add_parser(name, help=help)
+        parser.add_argument("args", nargs=argparse.REMAINDER)
+
+    def register_command_module(self, module, name):
+        """
+        Register commands from a command module.
+
+        :param module:  Command module (module)
+        :param name:    Command file name, for errors (str)
+        """
+        if not hasattr(module, "pre_parse") or not hasattr(
+            module, "post_parse"
+        ):
+            return
+
+        try:
+            module.pre_parse(self)
+        except BaseException as exc:
+            raise MalformedCommand(f"{name} - {str(exc)}")
+
+        self.register_post_parser(module.post_parse)
+
     def run(self, args):
         """
         Start and read command-line arguments.
@@ -111,3 +151,137 @@ def handle_parsers(shell, args):
 
     for parser in shell.post_parsers:
         parser(shell, args, project, config)
+
+
+def custom_get_commands_path(project_path):
+    """
+    Get custom commands path.
+
+    :param project_path:    Project path (str)
+    :rtype: Commands path (str)
+    """
+    return os.path.join(project_path, "commands")
+
+
+def custom_get_manifest_path(project_path):
+    """
+    Get custom commands manifest path.
+
+    :param project_path:    Project path (str)
+    :rtype: Manifest path (str)
+    """
+    return os.path.join(project_path, ".docknv", COMMANDS_MANIFEST_NAME)
+
+
+def custom_list_command_files(project_path):
+    """
+    List custom command files.
+
+    :param project_path:    Project path (str)
+    :rtype: Relative paths (list)
+    """
+    commands_path = custom_get_commands_path(project_path)
+    command_files = []
+
+    for root, folders, files in os.walk(commands_path):
+        # Ignore __pycache__
+        folders[:] = sorted(f for f in folders if f != "__pycache__")
+        for filename in sorted(files):
+            # Ignore __init__.py
+            if filename.endswith(".py") and filename != "__init__.py":
+                command_files.append(
+                    os.path.relpath(
+                        os.path.join(root, filename), commands_path
+                    )
+                )
+
+    return command_files
+
+
+def custom_load_command_module(project_path, command_file):
+    """
+    Import a custom command file under its own module name.
+
+    :param project_path:    Project path (str)
+    :param command_file:    Command file, relative to commands (str)
+    :rtype: Module (module)
+    """
+    module_name = "docknv_custom_" + re.sub(
+        r"\W", "_", os.path.splitext(command_file)[0]
+    )
+    path = os.path.join(custom_get_commands_path(project_path), command_file)
+
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+
+    return module
+
+
+def custom_load_manifest(project_path):
+    """
+    Load the custom commands manifest, updating changed entries.
+
+    Only new or modified command files are imported, to discover their
+    command names and help texts.
+
+    :param project_path:    Project path (str)
+    :rtype: Manifest: command file -> entry (dict)
+    """
+    manifest_path = custom_get_manifest_path(project_path)
+    commands_path = custom_get_commands_path(project_path)
+
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with io_open(manifest_path, mode="r") as handle:
+            try:
+                manifest = json.load(handle)
+            except ValueError:
+                manifest = {}
+
+    updated_manifest = {}
+    for command_file in custom_list_command_files(project_path):
+        stat = os.stat(os.path.join(commands_path, command_file))
+        fingerprint = [stat.st_mtime_ns, stat.st_size]
+
+        entry = manifest.get(command_file)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            entry = {
+                "fingerprint": fingerprint,
+                "commands": _discover_commands(project_path, command_file),
+            }
+
+        updated_manifest[command_file] = entry
+
+    # Loading does not create the project `.docknv` folder
+    manifest_dir = os.path.dirname(manifest_path)
+    if updated_manifest != manifest and os.path.isdir(manifest_dir):
+        try:
+            with io_open(manifest_path, mode="w") as handle:
+                json.dump(updated_manifest, handle, indent=2)
+        except OSError:
+            # Read-only project, discover again next time
+            pass
+
+    return updated_manifest
+
+
+def _discover_commands(project_path, command_file):
+    module = custom_load_command_module(project_path, command_file)
+    shell = CustomShell()
+    shell.register_command_module(module, os.path.splitext(command_file)[0])
+
+    helps = {
+        action.dest: action.help
+        for action in shell.subparsers._choices_actions
+    }
+
+    return [
+        {"name": name, "help": helps.get(name)}
+        for name in shell.subparsers.choices
+    ]
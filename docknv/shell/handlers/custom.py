@@ -1,21 +1,18 @@
 """Custom commands."""
 
-import argparse
-import imp
 import os
 
-from docknv.shell.custom import CustomShell, MalformedCommand
+from docknv.shell.custom import (
+    CustomShell,
+    custom_get_commands_path,
+    custom_load_command_module,
+    custom_load_manifest,
+)
 from docknv.logger import Logger
 
 from docknv.project import project_is_valid
 
 
-def _init(subparsers):
-    cmd = subparsers.add_parser("custom", help="custom commands")
-    cmd.add_argument("-c", "--config", help="configuration name", default=None)
-    cmd.add_argument("args", nargs=argparse.REMAINDER)
-
-
 def _handle(args):
     project_path = args.project
 
@@ -23,44 +20,11 @@ def _handle(args):
         Logger.warn("no custom commands found")
         return
 
-    commands_dir = os.path.join(project_path, "commands")
-    if not os.path.exists(commands_dir):
+    if not os.path.exists(custom_get_commands_path(project_path)):
         Logger.warn("no custom commands found")
         return
 
-    shell = CustomShell()
-
-    for root, _, files in os.walk(commands_dir):
-        for filename in files:
-            if filename.endswith(".py"):
-                # Ignore __init__.py
-                if filename == "__init__.py":
-                    continue
-
-                base_filename, ext = os.path.splitext(filename)
-                abs_f = os.path.join(root, filename)
-
-                # Ignore __pycache__
-                if "__pycache__" in abs_f:
-                    continue
-
-                src = imp.load_source("commands", abs_f)
-                if hasattr(src, "pre_parse") and hasattr(src, "post_parse"):
-                    pre_parse = src.pre_parse
-                    post_parse = src.post_parse
-                    error = None
-
-                    try:
-                        pre_parse(shell)
-                    except BaseException as exc:
-                        error = exc
-
-                    if error:
-                        raise MalformedCommand(
-                            f"{base_filename} - {str(error)}"
-                        )
-
-                    shell.register_post_parser(post_parse)
+    manifest = custom_load_manifest(project_path)
 
     # Pass arguments to custom shell
     cmd_args = ["--project", project_path]
@@ -72,4 +36,28 @@ def _handle(args):
         cmd_args += ["-c", args.config]
     cmd_args += args.args
 
+    # Find the selected command without loading any module
+    shell = CustomShell()
+    for entry in manifest.values():
+        for command in entry["commands"]:
+            shell.register_command_placeholder(
+                command["name"], command["help"]
+            )
+    selected_args, _ = shell.parser.parse_known_args(cmd_args)
+
+    # Only load the selected command module
+    shell = CustomShell()
+    for command_file, entry in manifest.items():
+        names = [command["name"] for command in entry["commands"]]
+        if selected_args.command in names:
+            module = custom_load_command_module(project_path, command_file)
+            shell.register_command_module(
+                module, os.path.splitext(command_file)[0]
+            )
+        else:
+            for command in entry["commands"]:
+                shell.register_command_placeholder(
+                    command["name"], command["help"]
+                )
+
     shell.run(cmd_args)
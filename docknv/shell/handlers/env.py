@@ -1,5 +1,7 @@
 """Env sub commands."""
 
+import shlex
+
 from docknv.environment import EnvironmentCollection
 
 from docknv.shell.common import exec_handler
@@ -7,26 +9,6 @@ from docknv.utils.ioutils import get_editor_executable
 from docknv.wrapper import exec_process
 
 
-def _init(subparsers):
-    cmd = subparsers.add_parser("env", help="manage environments")
-    subs = cmd.add_subparsers(dest="env_cmd", metavar="")
-
-    subs.add_parser("ls", help="list envs")
-
-    show_cmd = subs.add_parser("show", help="show an environment file")
-    show_cmd.add_argument("env_name", help="environment file name")
-
-    edit_cmd = subs.add_parser("edit", help="edit an environment file")
-    edit_cmd.add_argument("env_name", help="environment file name")
-    edit_cmd.add_argument(
-        "-e",
-        "--editor",
-        nargs="?",
-        default=None,
-        help="editor to use (default: auto-detect)",
-    )
-
-
 def _handle(args):
     return exec_handler("env", args, globals())
 
@@ -47,4 +29,4 @@ def _handle_edit(args):
     editor = get_editor_executable(args.editor)
     path = collection.get_environment_path(args.env_name)
 
-    return exec_process([editor, path], shell=True, dry_run=args.dry_run)
+    return exec_process([*shlex.split(editor), path], dry_run=args.dry_run)
@@ -1,18 +1,10 @@
 """Removed machine sub command."""
 
-import argparse
 import sys
 
 from docknv.logger import Logger, Fore
 
 
-def _init(subparsers):
-    cmd = subparsers.add_parser(
-        "machine", help="removed machine command, use `service` instead"
-    )
-    cmd.add_argument("args", nargs=argparse.REMAINDER)
-
-
 def _handle(args):
     str_args = " ".join(args.args)
     Logger.raw(
@@ -0,0 +1,21 @@
+"""Serve command."""
+
+from docknv.logger import Logger
+from docknv.server import (
+    InsecureSocketDirectory,
+    Server,
+    ServerAlreadyRunning,
+)
+
+
+def _handle(args):
+    server = Server(args.project, args.socket)
+    server.preload()
+
+    try:
+        Logger.info(f"listening on {server.socket_path}")
+        server.serve_forever()
+    except (InsecureSocketDirectory, ServerAlreadyRunning) as exc:
+        Logger.error(str(exc))
+    except KeyboardInterrupt:
+        Logger.info("server stopped")
@@ -0,0 +1,47 @@
+"""Stats command."""
+
+import os
+import re
+
+from docknv.logger import Logger
+from docknv.utils.events import (
+    EVENTS_ENV,
+    EVENTS_SOCKET_PREFIX,
+    events_get_stats,
+    events_load,
+)
+from docknv.utils.serialization import structured_dump
+
+
+def _handle(args):
+    path = args.path or os.environ.get(EVENTS_ENV)
+    if not path or path.startswith(EVENTS_SOCKET_PREFIX):
+        Logger.error(f"no event log file: pass a path or set ${EVENTS_ENV}")
+    if not os.path.isfile(path):
+        Logger.error(f"missing event log file: {path}")
+
+    pattern = re.compile(args.operation) if args.operation else None
+    rows = events_get_stats(events_load(path), args.calls, pattern)
+    if args.format:
+        Logger.raw(structured_dump(rows, args.format))
+        return
+
+    if not rows:
+        Logger.warn("no operation found")
+        return
+
+    label = "call" if args.calls else "operation"
+    name_width = max(32, *(len(row["name"]) for row in rows))
+    with Logger.batch():
+        Logger.raw(
+            f"{label:<{name_width}} {'count':>7} {'errors':>7}"
+            f" {'p50 (ms)':>10} {'p90 (ms)':>10} {'p99 (ms)':>10}"
+            f" {'max (ms)':>10}"
+        )
+        for row in rows:
+            Logger.raw(
+                f"{row['name']:<{name_width}} {row['count']:>7}"
+                f" {row['errors']:>7} {row['p50'] * 1000:>10.2f}"
+                f" {row['p90'] * 1000:>10.2f} {row['p99'] * 1000:>10.2f}"
+                f" {row['max'] * 1000:>10.2f}"
+            )
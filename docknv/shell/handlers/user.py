@@ -1,35 +1,13 @@
 """User sub commands."""
 
+import shlex
+
 from docknv.shell.common import exec_handler, load_project
 from docknv.utils.ioutils import get_editor_executable
 
 from docknv.wrapper import exec_process
 
 
-def _init(subparsers):
-    cmd = subparsers.add_parser("user", help="manage user config files")
-    subs = cmd.add_subparsers(dest="user_cmd", metavar="")
-
-    clean_cmd = subs.add_parser(
-        "clean", help="clean user config files for this project"
-    )
-    clean_cmd.add_argument("config", nargs="?", default=None)
-
-    edit_cmd = subs.add_parser(
-        "edit", help="edit user config for this project"
-    )
-    edit_cmd.add_argument("config", nargs="?", default=None)
-    edit_cmd.add_argument(
-        "-e",
-        "--editor",
-        nargs="?",
-        default=None,
-        help="editor to use (default: auto-detect)",
-    )
-
-    subs.add_parser("rm-lock", help="remove the user lockfile")
-
-
 def _handle(args):
     return exec_handler("user", args, globals())
 
@@ -51,7 +29,7 @@ def _handle_edit(args):
     else:
         path = session.get_paths().get_user_root()
 
-    return exec_process([editor, path], shell=True, dry_run=args.dry_run)
+    return exec_process([*shlex.split(editor), path], dry_run=args.dry_run)
 
 
 def _handle_rm_lock(args):
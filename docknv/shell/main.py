@@ -1,23 +1,71 @@
 """Entry point."""
 
+import os
 import sys
 import traceback
 
-from docknv.logger import Logger, LoggerError
-from docknv.wrapper import FailedCommandExecution, StoppedCommandExecution
-
-from .custom import MalformedCommand
-from .shell import Shell
+from docknv.server import (
+    SERVER_COMMAND,
+    SERVER_DISABLE_ENV,
+    ServerClient,
+    server_get_socket_path,
+    server_parse_command_line,
+)
 
 
 def docknv_entry_point():
     """Entry point for docknv."""
+    exit_code = docknv_forward(sys.argv)
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+    return docknv_run(sys.argv[1:])
+
+
+def docknv_forward(argv):
+    """
+    Forward a command to the project server, if running.
+
+    :param argv:    Command line (list)
+    :rtype: Exit code (int?) (None if not forwarded)
+    """
+    if os.environ.get(SERVER_DISABLE_ENV):
+        return None
+
+    project_path, command = server_parse_command_line(argv[1:])
+    if command is None or command == SERVER_COMMAND:
+        return None
+
+    client = ServerClient(server_get_socket_path(project_path))
+    return client.forward(argv, os.getcwd(), os.environ)
+
+
+def docknv_run(args):
+    """
+    Run a command.
+
+    :param args:    Arguments (list)
+    :rtype: Exit code
+    """
+    from .shell import Shell
+
     shell = Shell()
 
     try:
-        return shell.run(sys.argv[1:])
+        return shell.run(args)
+    except SystemExit:
+        sys.exit(1)
     except BaseException as e:
-        if isinstance(e, (LoggerError, SystemExit)):
+        # Imported here to keep startup fast
+        from docknv.logger import Logger, LoggerError
+        from docknv.wrapper.exceptions import (
+            FailedCommandExecution,
+            StoppedCommandExecution,
+        )
+
+        from .custom import MalformedCommand
+
+        if isinstance(e, LoggerError):
             sys.exit(1)
         elif isinstance(
             e,
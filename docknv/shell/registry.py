@@ -0,0 +1,654 @@
+"""Declarative command specifications.
+
+Parsers are built from these specifications, so that handler modules (and
+their dependencies) are only imported when their command is executed.
+"""
+
+import argparse
+
+
+class ArgumentSpec(object):
+    """Argument specification."""
+
+    def __init__(self, *flags, **kwargs):
+        """
+        Init.
+
+        :param flags:   Argument flags or name (str...)
+        :param kwargs:  `add_argument` keyword arguments
+        """
+        self.flags = flags
+        self.kwargs = kwargs
+
+    def add_to_parser(self, parser):
+        """
+        Add argument to a parser.
+
+        :param parser:  Parser (ArgumentParser)
+        """
+        parser.add_argument(*self.flags, **self.kwargs)
+
+
+class CommandSpec(object):
+    """Command specification."""
+
+    def __init__(self, name, help, arguments=None, subcommands=None):
+        """
+        Init.
+
+        :param name:        Command name (str)
+        :param help:        Help text (str)
+        :param arguments:   Arguments (list?)
+        :param subcommands: Subcommands (list?)
+        """
+        self.name = name
+        self.help = help
+        self.arguments = arguments or []
+        self.subcommands = subcommands or []
+
+    def add_to_subparsers(self, subparsers):
+        """
+        Add command to subparsers.
+
+        Subcommand choice is stored in a `<name>_cmd` attribute.
+
+        :param subparsers:  Subparsers
+        :rtype: Parser (ArgumentParser)
+        """
+        parser = subparsers.add_parser(self.name, help=self.help)
+        for argument in self.arguments:
+            argument.add_to_parser(parser)
+
+        if self.subcommands:
+            subs = parser.add_subparsers(dest=f"{self.name}_cmd", metavar="")
+            for subcommand in self.subcommands:
+                subcommand.add_to_subparsers(subs)
+
+        return parser
+
+
+def _configs_argument():
+    return ArgumentSpec("configs", nargs="*", help="configurations")
+
+
+def _service_argument():
+    return ArgumentSpec("service", help="service name")
+
+
+def _replica_argument():
+    return ArgumentSpec(
+        "-r",
+        "--replica",
+        type=int,
+        default=None,
+        help="replica number (default: first)",
+    )
+
+
+def _build_arguments(build_args_help="build args"):
+    return [
+        ArgumentSpec("-b", "--build-args", nargs="+", help=build_args_help),
+        ArgumentSpec(
+            "--no-cache", help="build without cache", action="store_true"
+        ),
+    ]
+
+
+def _editor_argument():
+    return ArgumentSpec(
+        "-e",
+        "--editor",
+        nargs="?",
+        default=None,
+        help="editor to use (default: auto-detect)",
+    )
+
+
+def _format_argument():
+    return ArgumentSpec(
+        "--format",
+        choices=("json", "yaml"),
+        default=None,
+        help="machine-readable output format",
+    )
+
+
+def _selection_arguments():
+    return [
+        ArgumentSpec("-s", "--schemas", nargs="*", help="schemas to use"),
+        ArgumentSpec("-S", "--services", nargs="*", help="services to use"),
+        ArgumentSpec("-V", "--volumes", nargs="*", help="volumes to use"),
+        ArgumentSpec("-N", "--networks", nargs="*", help="networks to use"),
+        ArgumentSpec(
+            "-n", "--namespace", help="namespace name", nargs="?", default=None
+        ),
+    ]
+
+
+CONFIG_COMMAND = CommandSpec(
+    "config",
+    "manage groups of machines at once (config mode)",
+    subcommands=[
+        CommandSpec(
+            "status", "show current configuration", [_format_argument()]
+        ),
+        CommandSpec("ls", "list known configurations", [_format_argument()]),
+        CommandSpec(
+            "set",
+            "set configuration",
+            [ArgumentSpec("name", help="configuration name")],
+        ),
+        CommandSpec(
+            "start",
+            "boot machines from schema",
+            [
+                _configs_argument(),
+                ArgumentSpec(
+                    "--wait",
+                    action="store_true",
+                    help="wait for healthy services, by depends_on order",
+                ),
+                ArgumentSpec(
+                    "--timeout",
+                    type=float,
+                    default=120.0,
+                    help="wait timeout, in seconds (default: 120)",
+                ),
+            ],
+        ),
+        CommandSpec(
+            "restart",
+            "restart machines from schema",
+            [
+                _configs_argument(),
+                ArgumentSpec(
+                    "-f", "--force", action="store_true", help="force restart"
+                ),
+            ],
+        ),
+        CommandSpec(
+            "stop", "shutdown machines from schema", [_configs_argument()]
+        ),
+        CommandSpec(
+            "ps",
+            "list schema processes",
+            [_configs_argument(), _format_argument()],
+        ),
+        CommandSpec(
+            "logs",
+            "show container logs, merged by timestamp",
+            [
+                _configs_argument(),
+                ArgumentSpec(
+                    "-a",
+                    "--all",
+                    action="store_true",
+                    help="show logs of all your configurations",
+                ),
+                ArgumentSpec(
+                    "-S", "--services", nargs="+", help="services to show"
+                ),
+                ArgumentSpec(
+                    "-t", "--tail", type=int, help="last lines per container"
+                ),
+                ArgumentSpec(
+                    "-f", "--follow", action="store_true", help="follow logs"
+                ),
+                ArgumentSpec(
+                    "--since",
+                    help="start time (timestamp, date or relative: 10m)",
+                ),
+                ArgumentSpec(
+                    "--until",
+                    help="end time (timestamp, date or relative: 10m)",
+                ),
+                ArgumentSpec(
+                    "-g", "--grep", help="only show lines matching a regex"
+                ),
+                ArgumentSpec(
+                    "--timestamps", action="store_true", help="show timestamps"
+                ),
+            ],
+        ),
+        CommandSpec("unset", "unset configuration"),
+        CommandSpec(
+            "build",
+            "build machines from schema",
+            [
+                _configs_argument(),
+                ArgumentSpec(
+                    "-a",
+                    "--all",
+                    action="store_true",
+                    help="build all your configurations",
+                ),
+                ArgumentSpec(
+                    "-b", "--build-args", nargs="+", help="build arguments"
+                ),
+                ArgumentSpec(
+                    "--no-cache", help="no cache", action="store_true"
+                ),
+                ArgumentSpec(
+                    "-w",
+                    "--workers",
+                    type=int,
+                    default=4,
+                    help="max concurrent builds (default: 4)",
+                ),
+            ],
+        ),
+        CommandSpec(
+            "create",
+            "create a docknv configuration",
+            [
+                ArgumentSpec("name", help="configuration name"),
+                ArgumentSpec(
+                    "-e",
+                    "--environment",
+                    required=True,
+                    help="environment name",
+                ),
+                *_selection_arguments(),
+            ],
+        ),
+        CommandSpec(
+            "update",
+            "update a known configuration",
+            [
+                ArgumentSpec(
+                    "name", help="configuration name", nargs="?", default=None
+                ),
+                ArgumentSpec("-e", "--environment", help="environment name"),
+                *_selection_arguments(),
+                ArgumentSpec(
+                    "--no-namespace",
+                    help="remove namespace",
+                    action="store_true",
+                ),
+                ArgumentSpec(
+                    "-r",
+                    "--restart",
+                    action="store_true",
+                    help="recreate changed services after update",
+                ),
+            ],
+        ),
+        CommandSpec(
+            "regenerate",
+            "regenerate known configurations",
+            [
+                _configs_argument(),
+                ArgumentSpec(
+                    "-a",
+                    "--all",
+                    action="store_true",
+                    help="regenerate all your configurations",
+                ),
+                ArgumentSpec(
+                    "-w",
+                    "--workers",
+                    type=int,
+                    help="max concurrent configurations",
+                ),
+            ],
+        ),
+        CommandSpec(
+            "watch",
+            "regenerate configurations on source changes",
+            [
+                _configs_argument(),
+                ArgumentSpec(
+                    "-a",
+                    "--all",
+                    action="store_true",
+                    help="watch all your configurations",
+                ),
+                ArgumentSpec(
+                    "-r",
+                    "--restart",
+                    action="store_true",
+                    help="restart affected services after regeneration",
+                ),
+                ArgumentSpec(
+                    "-d",
+                    "--debounce",
+                    type=float,
+                    default=0.5,
+                    help="debounce delay in seconds (default: 0.5)",
+                ),
+                ArgumentSpec(
+                    "--polling",
+                    action="store_true",
+                    help="use polling instead of inotify",
+                ),
+            ],
+        ),
+        CommandSpec(
+            "rm",
+            "remove known configurations",
+            [
+                ArgumentSpec("configs", nargs="+", help="configurations"),
+                ArgumentSpec(
+                    "-f", "--force", help="force remove", action="store_true"
+                ),
+            ],
+        ),
+    ],
+)
+
+SERVICE_COMMAND = CommandSpec(
+    "service",
+    "manage one service at a time (service mode)",
+    [
+        ArgumentSpec(
+            "-c", "--config", help="configuration name (swap)", default=None
+        )
+    ],
+    subcommands=[
+        CommandSpec("start", "start a container", [_service_argument()]),
+        CommandSpec("stop", "stop a container", [_service_argument()]),
+        CommandSpec(
+            "restart",
+            "restart a container",
+            [
+                _service_argument(),
+                ArgumentSpec(
+                    "-f", "--force", action="store_true", help="force restart"
+                ),
+            ],
+        ),
+        CommandSpec(
+            "run",
+            "run a command on a container",
+            [
+                _service_argument(),
+                ArgumentSpec("run_command", help="command to run"),
+                ArgumentSpec(
+                    "-d",
+                    "--daemon",
+                    action="store_true",
+                    help="run in background",
+                ),
+            ],
+        ),
+        CommandSpec(
+            "exec",
+            "execute command on a running container",
+            [
+                _service_argument(),
+                ArgumentSpec("run_command", help="command to run"),
+            ],
+        ),
+        CommandSpec(
+            "shell",
+            "run shell",
+            [
+                _service_argument(),
+                ArgumentSpec(
+                    "shell",
+                    help="shell executable",
+                    default="/bin/bash",
+                    nargs="?",
+                ),
+            ],
+        ),
+        CommandSpec(
+            "logs",
+            "show container logs",
+            [
+                _service_argument(),
+                ArgumentSpec(
+                    "-t", "--tail", type=int, help="tail logs", default=0
+                ),
+                ArgumentSpec(
+                    "-f",
+                    "--follow",
+                    help="follow logs",
+                    action="store_true",
+                    default=False,
+                ),
+            ],
+        ),
+        CommandSpec(
+            "push",
+            "push a file to a container",
+            [
+                _service_argument(),
+                ArgumentSpec("host_paths", nargs="+", help="host paths"),
+                ArgumentSpec("container_path", help="container path"),
+                _replica_argument(),
+                ArgumentSpec(
+                    "-a",
+                    "--all-replicas",
+                    action="store_true",
+                    help="push to all replicas",
+                ),
+                ArgumentSpec(
+                    "-z",
+                    "--compression",
+                    choices=("gz", "bz2", "xz"),
+                    default=None,
+                    help="compress the archive",
+                ),
+                ArgumentSpec(
+                    "-i",
+                    "--incremental",
+                    action="store_true",
+                    help="only send files changed since the last push",
+                ),
+            ],
+        ),
+        CommandSpec(
+            "pull",
+            "pull a file from a container",
+            [
+                _service_argument(),
+                ArgumentSpec(
+                    "container_paths", nargs="+", help="container paths"
+                ),
+                ArgumentSpec("host_path", help="host path"),
+                _replica_argument(),
+                ArgumentSpec(
+                    "-z",
+                    "--compression",
+                    action="store_true",
+                    help="compress the transfer",
+                ),
+            ],
+        ),
+        CommandSpec(
+            "build",
+            "build a service",
+            [_service_argument(), *_build_arguments()],
+        ),
+    ],
+)
+
+ENV_COMMAND = CommandSpec(
+    "env",
+    "manage environments",
+    subcommands=[
+        CommandSpec("ls", "list envs"),
+        CommandSpec(
+            "show",
+            "show an environment file",
+            [ArgumentSpec("env_name", help="environment file name")],
+        ),
+        CommandSpec(
+            "edit",
+            "edit an environment file",
+            [
+                ArgumentSpec("env_name", help="environment file name"),
+                _editor_argument(),
+            ],
+        ),
+    ],
+)
+
+SCHEMA_COMMAND = CommandSpec(
+    "schema", "manage schemas", subcommands=[CommandSpec("ls", "list schemas")]
+)
+
+IMAGES_COMMAND = CommandSpec(
+    "images",
+    "manage images",
+    subcommands=[
+        CommandSpec("ls", "list images"),
+        CommandSpec(
+            "build",
+            "build image",
+            [
+                ArgumentSpec("image", nargs="?", help="image name"),
+                ArgumentSpec("tag_name", nargs="?", help="image tag name"),
+                ArgumentSpec(
+                    "tag_version", nargs="?", help="image tag version"
+                ),
+                *_build_arguments(),
+                ArgumentSpec(
+                    "-a",
+                    "--all",
+                    action="store_true",
+                    help="build all images, in FROM dependency order",
+                ),
+                ArgumentSpec(
+                    "-P",
+                    "--tag-prefix",
+                    default="",
+                    help="image tag prefix, with --all",
+                ),
+                ArgumentSpec(
+                    "--image-version",
+                    default="latest",
+                    help="image version, with --all (default: latest)",
+                ),
+                ArgumentSpec(
+                    "-w",
+                    "--workers",
+                    type=int,
+                    default=4,
+                    help="max concurrent builds, with --all (default: 4)",
+                ),
+            ],
+        ),
+    ],
+)
+
+USER_COMMAND = CommandSpec(
+    "user",
+    "manage user config files",
+    subcommands=[
+        CommandSpec(
+            "clean",
+            "clean user config files for this project",
+            [ArgumentSpec("config", nargs="?", default=None)],
+        ),
+        CommandSpec(
+            "edit",
+            "edit user config for this project",
+            [
+                ArgumentSpec("config", nargs="?", default=None),
+                _editor_argument(),
+            ],
+        ),
+        CommandSpec("rm-lock", "remove the user lockfile"),
+    ],
+)
+
+SCAFFOLD_COMMAND = CommandSpec(
+    "scaffold",
+    "scaffolding",
+    subcommands=[
+        CommandSpec(
+            "project",
+            "scaffold a new docknv project",
+            [ArgumentSpec("project_path", help="project path")],
+        ),
+        CommandSpec(
+            "image",
+            "scaffold an image Dockerfile",
+            [
+                ArgumentSpec("image_name", help="image name"),
+                ArgumentSpec(
+                    "image_url", help="image url (Docker style path)"
+                ),
+                ArgumentSpec(
+                    "image_tag",
+                    help="image tag (default: latest)",
+                    nargs="?",
+                    default="latest",
+                ),
+            ],
+        ),
+        CommandSpec(
+            "env",
+            "scaffold an environment file",
+            [
+                ArgumentSpec("name", help="environment file name"),
+                ArgumentSpec(
+                    "-i",
+                    "--inherit",
+                    nargs="?",
+                    default=None,
+                    help="inherit from existing environment",
+                ),
+            ],
+        ),
+    ],
+)
+
+CUSTOM_COMMAND = CommandSpec(
+    "custom",
+    "custom commands",
+    [
+        ArgumentSpec(
+            "-c", "--config", help="configuration name", default=None
+        ),
+        ArgumentSpec("args", nargs=argparse.REMAINDER),
+    ],
+)
+
+MACHINE_COMMAND = CommandSpec(
+    "machine",
+    "removed machine command, use `service` instead",
+    [ArgumentSpec("args", nargs=argparse.REMAINDER)],
+)
+
+SERVE_COMMAND = CommandSpec(
+    "serve",
+    "keep the project loaded to run next commands faster",
+    [ArgumentSpec("-s", "--socket", help="socket path", default=None)],
+)
+
+STATS_COMMAND = CommandSpec(
+    "stats",
+    "summarize operation latencies from an event log",
+    [
+        ArgumentSpec(
+            "path", nargs="?", help="event log path (default: $DOCKNV_EVENTS)"
+        ),
+        ArgumentSpec(
+            "-o", "--operation", help="only show names matching a regex"
+        ),
+        ArgumentSpec(
+            "-c",
+            "--calls",
+            action="store_true",
+            help="summarize calls (API, subprocesses) instead of operations",
+        ),
+        _format_argument(),
+    ],
+)
+
+COMMAND_SPECS = (
+    CONFIG_COMMAND,
+    SERVICE_COMMAND,
+    ENV_COMMAND,
+    SCHEMA_COMMAND,
+    IMAGES_COMMAND,
+    USER_COMMAND,
+    SCAFFOLD_COMMAND,
+    CUSTOM_COMMAND,
+    MACHINE_COMMAND,
+    SERVE_COMMAND,
+    STATS_COMMAND,
+)
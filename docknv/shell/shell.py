@@ -5,20 +5,25 @@ import importlib
 import os
 import sys
 
-from docknv.logger import Logger
+from docknv.utils.events import (
+    EVENTS_ENV,
+    events_start,
+    events_stop,
+    using_operation,
+)
+from docknv.utils.tracing import (
+    TRACE_ENV,
+    TRACE_MODES,
+    tracer_parse_setting,
+    tracer_start,
+    tracer_stop,
+    using_span,
+)
 from docknv.version import __version__
 
-STANDARD_COMMANDS = (
-    "config",
-    "service",
-    "env",
-    "schema",
-    "images",
-    "user",
-    "scaffold",
-    "custom",
-    "machine",
-)
+from .registry import COMMAND_SPECS
+
+STANDARD_COMMANDS = tuple(spec.name for spec in COMMAND_SPECS)
 
 
 class Shell(object):
@@ -43,6 +48,45 @@ class Shell(object):
         self.parser.add_argument(
             "--dry-run", help="dry run", action="store_true"
         )
+        self.parser.add_argument(
+            "--profile", help="profile the command", action="store_true"
+        )
+        self.parser.add_argument(
+            "--profile-format",
+            help="profile output format (default: summary)",
+            choices=TRACE_MODES,
+            default="summary",
+        )
+        self.parser.add_argument(
+            "--profile-output", help="profile output path", default=None
+        )
+        self.parser.add_argument(
+            "--log-file", help="also write logs to a file", default=None
+        )
+        self.parser.add_argument(
+            "--log-format",
+            help="log file format (default: text)",
+            choices=("text", "json"),
+            default="text",
+        )
+        self.parser.add_argument(
+            "--log-stderr",
+            help="write logs to stderr, keeping stdout for output",
+            action="store_true",
+        )
+        self.parser.add_argument(
+            "--events",
+            help=(
+                "write an event log of operations, to a file or a socket"
+                f" (unix:<path>) (default: ${EVENTS_ENV})"
+            ),
+            default=None,
+        )
+        self.parser.add_argument(
+            "--mem-profile",
+            help="report memory usage per stage",
+            action="store_true",
+        )
 
         self.subparsers = self.parser.add_subparsers(
             dest="command", metavar=""
@@ -75,10 +119,14 @@ class Shell(object):
         return self.parse_args(self.parser.parse_args(args))
 
     def init_parsers(self):
-        """Initialize each parsers."""
-        for cmd in STANDARD_COMMANDS:
-            module = importlib.import_module("docknv.shell.handlers." + cmd)
-            module._init(self.subparsers)
+        """
+        Initialize each parsers.
+
+        Parsers are built from command specifications: handler modules
+        are only imported when their command runs.
+        """
+        for spec in COMMAND_SPECS:
+            spec.add_to_subparsers(self.subparsers)
 
     def parse_args(self, args):
         """
@@ -86,11 +134,14 @@ class Shell(object):
 
         :param args:    Arguments (iterable)
         """
+        from docknv.logger import Logger
+
         # Verbose mode activation
         if args.verbose:
             Logger.set_log_level("DEBUG")
         else:
             Logger.set_log_level("INFO")
+        _set_log_handlers(args)
 
         # Command detection
         if args.command is None:
@@ -108,7 +159,63 @@ class Shell(object):
                         subpar.print_help()
                         sys.exit(1)
 
-        return handle_parsers(self, args)
+        # Event log
+        events_target = args.events or os.environ.get(EVENTS_ENV)
+        if not events_target or args.command == "stats":
+            return self.run_command(args)
+
+        from docknv.logger import EventHandler
+
+        events_start(events_target)
+        event_handler = EventHandler()
+        Logger.add_handler(event_handler)
+        try:
+            return self.run_command(args)
+        finally:
+            Logger.set_handlers(
+                [h for h in Logger.handlers if h is not event_handler]
+            )
+            events_stop()
+
+    def run_command(self, args):
+        """
+        Run the command, profiled if asked.
+
+        :param args:    Arguments (iterable)
+        """
+        from docknv.logger import Logger
+
+        # Profiling
+        trace_setting = None
+        if args.mem_profile:
+            trace_setting = ("memory", None)
+        elif args.profile:
+            trace_setting = (args.profile_format, args.profile_output)
+        elif os.environ.get(TRACE_ENV):
+            trace_setting = tracer_parse_setting(os.environ[TRACE_ENV])
+            if trace_setting[0] not in TRACE_MODES:
+                Logger.warn(f"unknown {TRACE_ENV} mode: {trace_setting[0]}")
+                trace_setting = None
+
+        if trace_setting is None:
+            return handle_parsers(self, args)
+
+        tracer = tracer_start(*trace_setting)
+        try:
+            with using_span(f"command.{args.command}"):
+                return handle_parsers(self, args)
+        finally:
+            tracer_stop()
+            if tracer.mode == "memory":
+                Logger.info("memory profile summary:")
+                for line in tracer.format_summary():
+                    Logger.raw(line)
+            elif tracer.mode == "summary":
+                Logger.info("profile summary:")
+                for line in tracer.format_summary():
+                    Logger.raw(line)
+            else:
+                Logger.info(f"profile written to {tracer.output_path}")
 
 
 def handle_parsers(shell, args):
@@ -126,6 +233,45 @@ def handle_parsers(shell, args):
     args.project = os.path.abspath(args.project)
 
     module = importlib.import_module("docknv.shell.handlers." + args.command)
-    exit_code = module._handle(args)
+
+    # Cached container states only live for one command
+    from docknv.wrapper import docker_ps_clear_cache
+
+    docker_ps_clear_cache()
+
+    operation = args.command
+    subcommand = getattr(args, f"{args.command}_cmd", None)
+    if subcommand:
+        operation += f".{subcommand}"
+    with using_operation(f"command.{operation}", project=args.project):
+        exit_code = module._handle(args)
 
     return exit_code
+
+
+# PRIVATE ##########
+
+
+def _set_log_handlers(args):
+    from docknv.logger import (
+        FileHandler,
+        JSONLinesHandler,
+        Logger,
+        StreamHandler,
+    )
+
+    if args.log_stderr:
+        handlers = [
+            StreamHandler("stdout", logs=False),
+            StreamHandler("stderr", raw=False),
+        ]
+    else:
+        handlers = [StreamHandler()]
+
+    if args.log_file:
+        if args.log_format == "json":
+            handlers.append(JSONLinesHandler(args.log_file))
+        else:
+            handlers.append(FileHandler(args.log_file))
+
+    Logger.set_handlers(handlers)
@@ -1,31 +1,61 @@
 """Jinja template renderer."""
 
+from collections import OrderedDict
 import os
-import copy
-
-from jinja2 import Template
 
 from docknv.utils.serialization import yaml_ordered_dump, yaml_ordered_load
 from docknv.utils.ioutils import io_open
+from docknv.utils.tracing import traced
 
 from .exceptions import MalformedTemplate, MissingTemplate
 
+# Entries of these sections are rendered by chunks, so YAML dumping and
+# parsing never hold the whole document at once
+RENDER_CHUNKED_SECTIONS = ("services", "volumes", "networks")
+RENDER_CHUNK_SIZE = 50
+TEMPLATE_MARKERS = ("{{", "{%", "{#")
+# Statements may define names for the whole document (set, macro, import)
+TEMPLATE_BLOCK_MARKER = "{%"
+
 
+@traced("template.render_compose")
 def renderer_render_compose_template(compose_content, environment_data=None):
     """
     Resolve compose content.
 
+    Large sections are rendered by chunks, unless the content has block
+    statements: they are rendered as one document.
+
     :param compose_content:      Compose content (dict)
     :param environment_data:     Environment data (dict?) (default: None)
     :rtype: Template data (dict)
     """
-    output_content = copy.deepcopy(compose_content)
-
-    template_result = renderer_render_template_inplace(
-        output_content, environment_data
-    )
-
-    return yaml_ordered_load(template_result)
+    # Content is only dumped, no need to copy it
+    if not isinstance(compose_content, dict) or _has_block_statements(
+        compose_content
+    ):
+        return _render_compose_chunk(compose_content, environment_data)
+
+    output = OrderedDict()
+    for key, value in compose_content.items():
+        if key in RENDER_CHUNKED_SECTIONS and isinstance(value, dict):
+            section = OrderedDict()
+            names = list(value)
+            for start in range(0, len(names), RENDER_CHUNK_SIZE):
+                end = start + RENDER_CHUNK_SIZE
+                chunk = OrderedDict(
+                    (name, value[name]) for name in names[start:end]
+                )
+                section.update(
+                    _render_compose_chunk(chunk, environment_data) or {}
+                )
+            output[key] = section
+        else:
+            output.update(
+                _render_compose_chunk({key: value}, environment_data) or {}
+            )
+
+    return output
 
 
 def renderer_render_template_inplace(content, environment_data=None):
@@ -39,12 +69,17 @@ def renderer_render_template_inplace(content, environment_data=None):
     environment_data = environment_data if environment_data else {}
     string_content = yaml_ordered_dump(content)
 
-    template = Template(string_content)
+    # Nothing to render
+    if not any(marker in string_content for marker in TEMPLATE_MARKERS):
+        return string_content
+
+    template = _load_template(string_content)
     template_output = template.render(**environment_data)
 
     return template_output
 
 
+@traced("template.render")
 def renderer_render_template(template_path, config):
     """
     Render a Jinja template, using a namespace and environment.
@@ -81,7 +116,7 @@ def renderer_render_template(template_path, config):
 
     # Loading template
     with io_open(real_template_path, encoding="utf-8", mode="r") as handle:
-        template = Template(handle.read())
+        template = _load_template(handle.read())
 
     # Rendering template
     file_output = os.path.join(
@@ -100,3 +135,32 @@ def renderer_render_template(template_path, config):
         handle.write(rendered_template)
 
     return file_output
+
+
+def _load_template(source):
+    # Jinja is slow to import, load it on first render
+    from jinja2 import Template
+
+    return Template(source)
+
+
+def _render_compose_chunk(content, environment_data):
+    return yaml_ordered_load(
+        renderer_render_template_inplace(content, environment_data)
+    )
+
+
+def _has_block_statements(content):
+    pending = [content]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, str):
+            if TEMPLATE_BLOCK_MARKER in value:
+                return True
+        elif isinstance(value, dict):
+            pending.extend(value.keys())
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+
+    return False
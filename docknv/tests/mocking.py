@@ -1,6 +1,11 @@
 """Mocking utility."""
 
+import base64
+import io
+import json
+import os
 import sys
+import tarfile
 from contextlib import contextmanager
 
 try:
@@ -57,3 +62,325 @@ def patch(attr, value):
     """
     with mock.patch(attr, value):
         yield
+
+
+class FakeDockerAPI(object):
+    """Docker low-level API, listing fixed containers.
+
+    Container filesystems are folders in `root`, per container name.
+    """
+
+    def __init__(
+        self, containers, root=None, logs=None, events=None, images=None
+    ):
+        """
+        Init.
+
+        :param containers:  Containers, as listed by the API (list)
+        :param root:        Container filesystems root (str?)
+        :param logs:        Log chunks by container name (dict?)
+        :param events:      State changes: (container name, status,
+            state), sent as events (list?) (default: events unavailable)
+        :param images:      Images, as inspected by the API (list?)
+        """
+        self._images = images if images is not None else []
+        self.calls = []
+        self.archives = []
+        self.log_calls = []
+        self.root = root
+        self.timeout = 60
+        self._containers = containers
+        self._logs = logs or {}
+        self._events = events
+
+    def events(self, since=None, until=None, filters=None, decode=False):
+        """
+        Stream container events, applying state changes.
+
+        :param since:   Start time (int?)
+        :param until:   End time (int?)
+        :param filters: Filters (dict?)
+        :param decode:  Decode events? (bool)
+        """
+        import docker
+
+        if self._events is None:
+            raise docker.errors.APIError("events unavailable")
+
+        for name, status, state in self._events:
+            container = self._get_container(name)
+            container["Status"] = status
+            container["State"] = state
+            yield {
+                "id": container["Id"],
+                "Action": state,
+                "Actor": {
+                    "ID": container["Id"],
+                    "Attributes": dict(container["Labels"], name=name),
+                },
+            }
+
+    def inspect_container(self, container):
+        """
+        Inspect a container.
+
+        :param container:   Container name or ID (str)
+        """
+        from docknv.wrapper import HEALTH_PATTERN
+
+        data = self._get_container(container)
+        state = {"Status": data["State"]}
+        match = HEALTH_PATTERN.search(data["Status"])
+        if match:
+            state["Health"] = {"Status": match.group(1)}
+        return {"State": state}
+
+    def inspect_image(self, image):
+        """
+        Inspect an image.
+
+        :param image:   Image name or ID (str)
+        """
+        import docker
+
+        if ":" not in image.rpartition("/")[2]:
+            image += ":latest"
+        for data in self._images:
+            if image == data["Id"] or image in data["RepoTags"]:
+                return data
+        raise docker.errors.ImageNotFound(f"missing image: {image}")
+
+    def images(self, quiet=False, filters=None):
+        """
+        List image IDs.
+
+        :param quiet:   Only IDs? (bool)
+        :param filters: Filters, on one label (dict?)
+        """
+        key, _, value = (filters or {}).get("label", "=").partition("=")
+        return [
+            data["Id"]
+            for data in self._images
+            if not key or data["Config"]["Labels"].get(key) == value
+        ]
+
+    def tag(self, image, repository, tag=None):
+        """
+        Tag an image.
+
+        :param image:       Image name or ID (str)
+        :param repository:  Repository (str)
+        :param tag:         Tag (str?)
+        """
+        self.inspect_image(image)["RepoTags"].append(
+            f"{repository}:{tag or 'latest'}"
+        )
+        return True
+
+    def _get_container(self, name_or_id):
+        for container in self._containers:
+            if name_or_id in (container["Id"], container["Names"][0][1:]):
+                return container
+        raise KeyError(name_or_id)
+
+    def logs(self, container, stream=False, timestamps=False, **kwargs):
+        """
+        Stream logs of a container.
+
+        :param container:   Container name (str)
+        :param stream:      Stream logs? (bool)
+        :param timestamps:  Show timestamps? (bool)
+        :param kwargs:      Other options, recorded (dict)
+        """
+        self.log_calls.append((container, kwargs))
+        return iter(self._logs.get(container, []))
+
+    def put_archive(self, container, path, data):
+        """
+        Extract an archive in a container directory.
+
+        :param container:   Container name (str)
+        :param path:        Container directory (str)
+        :param data:        Archive (bytes or iterable)
+        """
+        if not isinstance(data, bytes):
+            data = b"".join(data)
+        self.archives.append((container, path, data))
+
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as tar:
+            tar.extractall(self._get_path(container, path))
+        return True
+
+    def get_archive(
+        self, container, path, chunk_size=None, encode_stream=False
+    ):
+        """
+        Get an archive of a container path.
+
+        :param container:       Container name (str)
+        :param path:            Container path (str)
+        :param chunk_size:      Chunk size (int?)
+        :param encode_stream:   Compress the transfer? (bool)
+        """
+        import docker
+
+        host_path = self._get_path(container, path)
+        if not os.path.lexists(host_path):
+            raise docker.errors.NotFound(f"missing path: {path}")
+
+        output = io.BytesIO()
+        stat = self._get_stat(host_path)
+        with tarfile.open(fileobj=output, mode="w") as tar:
+            tar.add(host_path, arcname=stat["name"])
+        return iter([output.getvalue()]), stat
+
+    def head(self, url, params=None, **kwargs):
+        """
+        Send a HEAD request: only archive stats are supported.
+
+        :param url:     URL, from `_url` (str)
+        :param params:  Query parameters (dict?)
+        """
+        import requests
+
+        _, _, container, _ = url.split("/")
+        host_path = self._get_path(container, params["path"])
+
+        response = requests.Response()
+        response.url = url
+        response.raw = io.BytesIO()
+        response.status_code = 404
+        if os.path.lexists(host_path):
+            stat = json.dumps(self._get_stat(host_path)).encode("utf-8")
+            response.status_code = 200
+            response.headers["X-Docker-Container-Path-Stat"] = (
+                base64.b64encode(stat).decode("ascii")
+            )
+        return response
+
+    def _url(self, pathfmt, *args):
+        return pathfmt.format(*args)
+
+    def _raise_for_status(self, response):
+        import docker
+
+        if response.status_code == 404:
+            raise docker.errors.NotFound(f"not found: {response.url}")
+
+    def _get_path(self, container, path):
+        return os.path.join(self.root, container, path.lstrip("/"))
+
+    def _get_stat(self, host_path):
+        mode = 0o755
+        if os.path.isdir(host_path):
+            mode |= 1 << 31
+        return {"name": os.path.basename(host_path), "mode": mode}
+
+    def containers(self, all=False, filters=None):
+        """
+        List containers.
+
+        :param all:     Include stopped containers? (bool)
+        :param filters: Filters (dict?)
+        """
+        self.calls.append((all, filters))
+
+        # Label filters are combined (`all` is shadowed)
+        labels = (filters or {}).get("label", [])
+        label_filters = {tuple(label.split("=", 1)) for label in labels}
+        return [
+            container
+            for container in self._containers
+            if label_filters <= set(container["Labels"].items())
+            and (all or container["State"] == "running")
+        ]
+
+
+class FakeDockerClient(object):
+    """Docker client."""
+
+    def __init__(
+        self, containers, root=None, logs=None, events=None, images=None
+    ):
+        """
+        Init.
+
+        :param containers:  Containers, as listed by the API (list)
+        :param root:        Container filesystems root (str?)
+        :param logs:        Log chunks by container name (dict?)
+        :param events:      State changes, sent as events (list?)
+        :param images:      Images, as inspected by the API (list?)
+        """
+        self.api = FakeDockerAPI(containers, root, logs, events, images)
+
+
+def fake_image(image_id, tags, labels=None):
+    """
+    Build an image, as inspected by the API.
+
+    :param image_id:    Image ID (str)
+    :param tags:        Tags, as repository:version (list)
+    :param labels:      Labels (dict?)
+    :rtype: Image (dict)
+    """
+    return {
+        "Id": image_id,
+        "RepoTags": list(tags),
+        "Config": {"Labels": dict(labels or {})},
+    }
+
+
+def fake_container(project, service, number=1, status="Up 2 minutes"):
+    """
+    Build a container, as listed by the API.
+
+    :param project: Compose project name (str)
+    :param service: Service name (str)
+    :param number:  Replica number (int)
+    :param status:  Status text (str)
+    :rtype: Container (dict)
+    """
+    name = f"{project}_{service}_{number}"
+    return {
+        "Id": name + "-id",
+        "Names": [f"/{name}"],
+        "Labels": {
+            "com.docker.compose.project": project,
+            "com.docker.compose.service": service,
+            "com.docker.compose.container-number": str(number),
+        },
+        "State": "running",
+        "Status": status,
+        "Ports": [
+            {"PrivatePort": 80, "Type": "tcp", "PublicPort": 8080},
+            {"PrivatePort": 80, "Type": "tcp", "PublicPort": 8080},
+        ],
+    }
+
+
+@contextmanager
+def using_fake_docker_client(
+    containers, root=None, logs=None, events=None, images=None
+):
+    """
+    Use a fake Docker client.
+
+    :param containers:  Containers, as listed by the API (list)
+    :param root:        Container filesystems root (str?)
+    :param logs:        Log chunks by container name (dict?)
+    :param events:      State changes, sent as events (list?)
+    :param images:      Images, as inspected by the API (list?)
+
+    **Context manager**
+    """
+    from docknv.wrapper import docker_ps_clear_cache
+
+    client = FakeDockerClient(containers, root, logs, events, images)
+    docker_ps_clear_cache()
+    try:
+        with mock.patch(
+            "docknv.wrapper.docker_api_wrapper._docker_client", client
+        ):
+            yield client
+    finally:
+        docker_ps_clear_cache()
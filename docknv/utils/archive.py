@@ -0,0 +1,233 @@
+"""Streamed tar archives."""
+
+import os
+import queue
+import tarfile
+import threading
+
+ARCHIVE_COMPRESSIONS = ("gz", "bz2", "xz")
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+# Max chunks waiting to be sent
+ARCHIVE_QUEUE_SIZE = 8
+
+
+def archive_list_entries(host_path, arcname):
+    """
+    List archive entries for a path, recursively.
+
+    Directories come before their contents.
+
+    :param host_path:   Host path (str)
+    :param arcname:     Name in archive (str)
+    :rtype: Entries: (path, name in archive) (iterable)
+    """
+    yield host_path, arcname
+    if not os.path.isdir(host_path) or os.path.islink(host_path):
+        return
+
+    for root, dirs, files in os.walk(host_path):
+        dirs.sort()
+        rel_root = os.path.relpath(root, host_path)
+        for name in dirs + sorted(files):
+            path = os.path.join(root, name)
+            if rel_root == ".":
+                yield path, f"{arcname}/{name}"
+            else:
+                yield path, f"{arcname}/{rel_root}/{name}"
+
+
+def archive_get_signature(path):
+    """
+    Get the signature of a file, to detect changes.
+
+    :param path:    Path (str)
+    :rtype: Modification time (ns) and size (list)
+    """
+    stat = os.lstat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def archive_stream(entries, compression=None, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """
+    Generate a tar archive as chunks, without temporary files.
+
+    The archive is written from a background thread, at most
+    `ARCHIVE_QUEUE_SIZE` chunks ahead of the consumer.
+
+    :param entries:     Entries: (path, name in archive) (iterable)
+    :param compression: Compression: gz, bz2 or xz (str?) (default: None)
+    :param chunk_size:  Chunk size (int)
+    :rtype: Chunks (iterable)
+    """
+    if compression and compression not in ARCHIVE_COMPRESSIONS:
+        raise ValueError(f"unknown compression: {compression}")
+
+    chunks = queue.Queue(maxsize=ARCHIVE_QUEUE_SIZE)
+    writer = _ChunkWriter(chunks, chunk_size)
+    errors = []
+
+    def _write():
+        try:
+            mode = f"w|{compression}" if compression else "w|"
+            with tarfile.open(fileobj=writer, mode=mode) as tar:
+                for path, arcname in entries:
+                    tar.add(path, arcname=arcname, recursive=False)
+            writer.flush()
+        except _ArchiveCancelled:
+            pass
+        except BaseException as exc:
+            errors.append(exc)
+        finally:
+            chunks.put(None)
+
+    thread = threading.Thread(target=_write, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        # Consumer stopped early: unblock the writer
+        writer.cancelled = True
+        while thread.is_alive():
+            try:
+                chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+def archive_extract_stream(chunks, destination, rename=None):
+    """
+    Extract a streamed tar archive.
+
+    :param chunks:      Chunks (iterable)
+    :param destination: Destination directory (str)
+    :param rename:      Rename the archive root: (old name, new name)
+        (tuple?)
+    :rtype: Extracted member count (int)
+    """
+    count = 0
+    with tarfile.open(fileobj=_ChunkReader(chunks), mode="r|*") as tar:
+        for member in tar:
+            if rename is not None:
+                member.name = _rename_root(member.name, *rename)
+            _extract_member(tar, member, destination)
+            count += 1
+
+    return count
+
+
+# PRIVATE ##########
+
+
+class _ArchiveCancelled(Exception):
+    pass
+
+
+class _ChunkWriter(object):
+    def __init__(self, chunks, chunk_size):
+        self.chunks = chunks
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.cancelled = False
+
+    def write(self, data):
+        if self.cancelled:
+            raise _ArchiveCancelled()
+
+        self.buffer += data
+        size = self.chunk_size
+        while len(self.buffer) >= size:
+            self.chunks.put(bytes(self.buffer[:size]))
+            del self.buffer[:size]
+        return len(data)
+
+    def flush(self):
+        if self.buffer:
+            self.chunks.put(bytes(self.buffer))
+            self.buffer = bytearray()
+
+
+class _ChunkReader(object):
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.current = b""
+        self.offset = 0
+
+    def read(self, size=-1):
+        # Chunks are read with an offset: no copy of the remaining data
+        parts = []
+        while size != 0:
+            if self.offset >= len(self.current):
+                chunk = next(self.chunks, None)
+                if chunk is None:
+                    break
+                self.current = chunk
+                self.offset = 0
+                continue
+
+            start = self.offset
+            end = len(self.current)
+            if size > 0:
+                end = min(end, start + size)
+                size -= end - start
+            parts.append(self.current[start:end])
+            self.offset = end
+
+        return b"".join(parts)
+
+
+def _rename_root(name, old_root, new_root):
+    if name == old_root:
+        return new_root
+    if name.startswith(old_root + "/"):
+        suffix_start = len(old_root)
+        return new_root + name[suffix_start:]
+    return name
+
+
+def _extract_member(tar, member, destination):
+    # Refuse absolute paths, parent references and special files
+    if hasattr(tarfile, "data_filter"):
+        tar.extract(member, destination, filter="data")
+    else:
+        _check_member(member, destination)
+        tar.extract(member, destination)
+
+
+def _check_member(member, destination):
+    # Same checks as the "data" extraction filter, for older Pythons
+    root = os.path.realpath(destination)
+    name = member.name
+    if os.path.isabs(name) or ".." in name.replace("\\", "/").split("/"):
+        raise tarfile.ExtractError(f"unsafe member path: {name}")
+    if not (
+        member.isfile() or member.isdir() or member.issym() or member.islnk()
+    ):
+        raise tarfile.ExtractError(f"special file member: {name}")
+
+    path = os.path.join(root, name)
+    if member.issym():
+        # Existing links are replaced, not followed
+        parent = os.path.realpath(os.path.dirname(path))
+        paths = [parent, os.path.join(parent, member.linkname)]
+    else:
+        paths = [path]
+        if member.islnk():
+            paths.append(os.path.join(root, member.linkname))
+
+    for checked in paths:
+        checked = os.path.realpath(checked)
+        if checked != root and not checked.startswith(root + os.sep):
+            raise tarfile.ExtractError(f"member out of destination: {name}")
+
+    if not member.issym():
+        # No setuid, setgid, sticky nor group/other write bits
+        member.mode &= 0o755
@@ -0,0 +1,505 @@
+"""Structured event log.
+
+Operations (commands and lifecycle actions) are written as JSON lines,
+with their configuration, services, calls made, duration and outcome.
+The log is only written when enabled, with the `--events` flag or the
+`DOCKNV_EVENTS` environment variable: a file path, or `unix:<path>` for
+a Unix socket. Events are written by a background thread.
+"""
+
+from contextlib import contextmanager
+import functools
+import json
+import os
+import queue
+import threading
+import time
+
+EVENTS_ENV = "DOCKNV_EVENTS"
+EVENTS_SOCKET_PREFIX = "unix:"
+# Pending events, dropped beyond
+EVENTS_QUEUE_SIZE = 10000
+# Max calls recorded per operation
+EVENTS_MAX_CALLS = 100
+# Max wait for pending events on close, in seconds
+EVENTS_CLOSE_TIMEOUT = 2.0
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+OUTCOME_INTERRUPTED = "interrupted"
+
+_current_log = None
+_operations = threading.local()
+_root_operations = []
+
+
+class EventLog(object):
+    """
+    Event log, written by a background thread.
+
+    Events are queued without blocking: when the queue is full, events
+    are dropped and counted.
+    """
+
+    def __init__(self, target):
+        """
+        Init.
+
+        :param target:  File path, or `unix:<path>` (str)
+        """
+        self.target = target
+        self.queue = queue.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self.dropped = 0
+        self.thread = threading.Thread(
+            target=self._run, name="docknv-events", daemon=True
+        )
+
+    def start(self):
+        """Start the writer thread."""
+        self.thread.start()
+
+    def emit(self, event):
+        """
+        Queue an event.
+
+        :param event:   Event (dict)
+        """
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Write pending events and stop the writer thread."""
+        try:
+            self.queue.put(None, timeout=EVENTS_CLOSE_TIMEOUT)
+        except queue.Full:
+            return
+        self.thread.join(EVENTS_CLOSE_TIMEOUT)
+
+    def _run(self):
+        writer = _open_writer(self.target)
+        running = True
+        while running:
+            events = [self.queue.get()]
+            # Write available events at once
+            while True:
+                try:
+                    events.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in events:
+                running = False
+                events = [event for event in events if event is not None]
+
+            if writer is not None and events:
+                data = "".join(
+                    json.dumps(event, default=str) + "\n" for event in events
+                )
+                try:
+                    writer.write(data)
+                except OSError:
+                    # Unwritable sink: drop next events
+                    writer = None
+
+        if writer is not None:
+            writer.close()
+
+
+class Operation(object):
+    """Running operation, collecting its calls."""
+
+    __slots__ = ("name", "fields", "time", "start", "calls", "parent")
+
+    def __init__(self, name, fields, parent=None):
+        """
+        Init.
+
+        :param name:    Operation name (str)
+        :param fields:  Event fields: config, services, ... (dict)
+        :param parent:  Parent operation name (str?)
+        """
+        self.name = name
+        self.fields = fields
+        self.time = time.time()
+        self.start = time.perf_counter()
+        self.calls = []
+        self.parent = parent
+
+    def add_call(self, name, category, duration, args):
+        """
+        Add a call.
+
+        :param name:        Call name (str)
+        :param category:    Category (str)
+        :param duration:    Duration in seconds (float)
+        :param args:        Arguments (dict)
+        """
+        # list.append is atomic, calls come from multiple threads
+        self.calls.append(
+            {
+                "name": name,
+                "category": category,
+                "duration": round(duration, 6),
+                "args": {key: str(value) for key, value in args.items()},
+            }
+        )
+
+
+def events_start(target):
+    """
+    Start the event log.
+
+    :param target:  File path, or `unix:<path>` (str)
+    :rtype: Event log (EventLog)
+    """
+    global _current_log
+
+    events_stop()
+    event_log = EventLog(target)
+    event_log.start()
+    _current_log = event_log
+    return event_log
+
+
+def events_stop():
+    """
+    Stop the event log, writing pending events.
+
+    :rtype: Event log (EventLog?)
+    """
+    global _current_log
+
+    event_log = _current_log
+    _current_log = None
+    if event_log is not None:
+        event_log.close()
+    return event_log
+
+
+def events_is_active():
+    """
+    Check if the event log is started.
+
+    :rtype: True/False
+    """
+    return _current_log is not None
+
+
+def events_emit(event_type, **fields):
+    """
+    Write an event, if the event log is started.
+
+    :param event_type:  Event type (str)
+    :param fields:      Event fields
+    """
+    event_log = _current_log
+    if event_log is None:
+        return
+
+    event_log.emit(
+        {
+            "type": event_type,
+            "time": time.time(),
+            "pid": os.getpid(),
+            **fields,
+        }
+    )
+
+
+def events_get_operation():
+    """
+    Get the current operation of the thread.
+
+    Threads without operation get the first running operation, e.g.
+    for concurrent builds.
+
+    :rtype: Operation (Operation?)
+    """
+    stack = getattr(_operations, "stack", None)
+    if stack:
+        return stack[-1]
+    if _root_operations:
+        return _root_operations[0]
+    return None
+
+
+def events_record_call(name, category, duration, args):
+    """
+    Record a call (API call, subprocess, ...) in the current operation.
+
+    Calls made out of operations are written as events.
+
+    :param name:        Call name (str)
+    :param category:    Category (str)
+    :param duration:    Duration in seconds (float)
+    :param args:        Arguments (dict)
+    """
+    if _current_log is None:
+        return
+
+    operation = events_get_operation()
+    if operation is None:
+        events_emit(
+            "call",
+            name=name,
+            category=category,
+            duration=round(duration, 6),
+        )
+    elif len(operation.calls) < EVENTS_MAX_CALLS:
+        operation.add_call(name, category, duration, args)
+
+
+@contextmanager
+def using_operation(name, **fields):
+    """
+    Record an operation, if the event log is started.
+
+    :param name:    Operation name (str)
+    :param fields:  Event fields: config, services, ...
+
+    **Context manager**
+    """
+    if _current_log is None:
+        yield
+        return
+
+    stack = getattr(_operations, "stack", None)
+    if stack is None:
+        stack = _operations.stack = []
+
+    parent = events_get_operation()
+    operation = Operation(name, fields, parent.name if parent else None)
+    stack.append(operation)
+    if parent is None:
+        _root_operations.append(operation)
+
+    outcome = OUTCOME_OK
+    error = None
+    try:
+        yield operation
+    except KeyboardInterrupt:
+        outcome = OUTCOME_INTERRUPTED
+        raise
+    except BaseException as exc:
+        outcome = OUTCOME_ERROR
+        error = f"{exc.__class__.__name__}: {exc}"
+        raise
+    finally:
+        duration = time.perf_counter() - operation.start
+        stack.pop()
+        if parent is None:
+            _root_operations.remove(operation)
+
+        events_emit(
+            "operation",
+            operation=name,
+            parent=operation.parent,
+            started=operation.time,
+            **fields,
+            duration=round(duration, 6),
+            outcome=outcome,
+            error=error,
+            calls=operation.calls,
+        )
+
+
+def evented(name, **params):
+    """
+    Record each call of the decorated function as an operation.
+
+    Configuration and services are read from the `config_names` or
+    `config_name`, and `service_names` or `service_name` arguments.
+    Without configuration, the current one of the project (from a
+    lifecycle `self`) is used.
+
+    :param name:    Operation name (str)
+    :param params:  Other event fields, by argument name (str...)
+    """
+    params = {
+        "config": ("config_names", "config_name"),
+        "services": ("service_names", "service_name"),
+        **{field: (param,) for field, param in params.items()},
+    }
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_log is None:
+                return fn(*args, **kwargs)
+
+            fields = _get_fields(fn, params, args, kwargs)
+            with using_operation(name, **fields):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def events_load(path):
+    """
+    Load events from a log file.
+
+    Malformed lines (e.g. interrupted writes) are skipped.
+
+    :param path:    File path (str)
+    :rtype: Events (list)
+    """
+    events = []
+    with open(path, mode="r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+
+    return events
+
+
+def events_get_percentile(values, percent):
+    """
+    Get a percentile, with the nearest-rank method.
+
+    :param values:  Sorted values (list)
+    :param percent: Percent (float)
+    :rtype: Value (float?)
+    """
+    if not values:
+        return None
+
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+def events_get_stats(events, calls=False, pattern=None):
+    """
+    Summarize operation latencies.
+
+    :param events:  Events (list)
+    :param calls:   Summarize calls instead of operations? (bool)
+        (default: False)
+    :param pattern: Name filter (Pattern?)
+    :rtype: Rows: name, count, errors, p50, p90, p99 and max, in
+        seconds, by total time (list)
+    """
+    durations = {}
+    errors = {}
+    for event in events:
+        if event.get("type") != "operation":
+            continue
+
+        if calls:
+            items = [
+                (call["name"], call["duration"], False)
+                for call in event.get("calls") or []
+            ]
+        else:
+            items = [
+                (
+                    event["operation"],
+                    event["duration"],
+                    event.get("outcome") != OUTCOME_OK,
+                )
+            ]
+
+        for name, duration, failed in items:
+            if pattern is not None and not pattern.search(name):
+                continue
+            durations.setdefault(name, []).append(duration)
+            errors[name] = errors.get(name, 0) + int(failed)
+
+    rows = []
+    for name, values in durations.items():
+        values.sort()
+        rows.append(
+            {
+                "name": name,
+                "count": len(values),
+                "errors": errors[name],
+                "p50": events_get_percentile(values, 50),
+                "p90": events_get_percentile(values, 90),
+                "p99": events_get_percentile(values, 99),
+                "max": values[-1],
+                "total": sum(values),
+            }
+        )
+
+    return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+
+# PRIVATE ##########
+
+
+class _FileWriter(object):
+    def __init__(self, path):
+        self.handle = open(path, mode="a", encoding="utf-8")
+
+    def write(self, data):
+        self.handle.write(data)
+        self.handle.flush()
+
+    def close(self):
+        self.handle.close()
+
+
+class _SocketWriter(object):
+    def __init__(self, path):
+        import socket
+
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+
+    def write(self, data):
+        self.socket.sendall(data.encode("utf-8"))
+
+    def close(self):
+        self.socket.close()
+
+
+def _open_writer(target):
+    try:
+        prefix, sep, path = target.partition(EVENTS_SOCKET_PREFIX)
+        if sep and not prefix:
+            return _SocketWriter(path)
+
+        return _FileWriter(target)
+    except OSError:
+        return None
+
+
+def _get_fields(fn, params, args, kwargs):
+    import inspect
+
+    try:
+        arguments = inspect.signature(fn).bind_partial(*args, **kwargs)
+    except TypeError:
+        return {}
+
+    fields = {}
+    for field, names in params.items():
+        for name in names:
+            value = arguments.arguments.get(name)
+            if value is not None:
+                fields[field] = value
+                break
+
+    if arguments.arguments.get("dry_run"):
+        fields["dry_run"] = True
+    if isinstance(fields.get("services"), str):
+        fields["services"] = [fields["services"]]
+    if "config" not in fields and args:
+        fields["config"] = _get_current_config(args[0])
+    return fields
+
+
+def _get_current_config(instance):
+    project = getattr(instance, "project", None)
+    if project is None:
+        return None
+
+    try:
+        return project.get_current_configuration()
+    except Exception:
+        return None
@@ -2,10 +2,16 @@
 
 import copy
 from collections import OrderedDict
+import functools
+import json
+import sys
 
 import six
 import yaml
 
+# Longer string values are not interned
+INTERNED_VALUE_MAX_LENGTH = 64
+
 
 def yaml_merge(contents):
     """
@@ -36,30 +42,74 @@ def yaml_ordered_load(
     :param loader_class:         Loader class (Loader) (default: yaml.Loader)
     :param object_pairs_hook:    Hook type (any) (default: OrderedDict)
     """
+    return yaml.load(
+        stream, _get_ordered_loader(loader_class, object_pairs_hook)
+    )
+
+
+def yaml_ordered_dump(data, stream=None, dumper_class=yaml.Dumper, **kwds):
+    """
+    Dump ordered YAML content.
+
+    :param stream:           Stream (stream)
+    :param dumper_class:     Dumper class (Dumper) (default: yaml.Dumper)
+    :param kwds:             Keywords arguments
+    """
+    out = yaml.dump(data, stream, _get_ordered_dumper(dumper_class), **kwds)
+
+    if six.PY2:
+        out = unicode(out)  # noqa
+
+    return out
+
+
+def structured_dump(data, output_format):
+    """
+    Dump data in a machine-readable format.
+
+    :param data:            Data (dict)
+    :param output_format:   Format: json or yaml (str)
+    :rtype: Output (str)
+    """
+    if output_format == "json":
+        return json.dumps(data, indent=2)
+    elif output_format == "yaml":
+        return yaml_ordered_dump(data, default_flow_style=False).rstrip()
 
+    raise ValueError(f"unknown output format: {output_format}")
+
+
+# PRIVATE ##########
+
+
+@functools.lru_cache(maxsize=None)
+def _get_ordered_loader(loader_class, object_pairs_hook):
     class OrderedLoader(loader_class):
         """Ordered loader."""
 
     def _construct_mapping(loader, node):
         loader.flatten_mapping(node)
-        return object_pairs_hook(loader.construct_pairs(node))
+        return object_pairs_hook(
+            (_intern(key), _intern(value))
+            for key, value in loader.construct_pairs(node)
+        )
 
     OrderedLoader.add_constructor(
         yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG, _construct_mapping
     )
 
-    return yaml.load(stream, OrderedLoader)
+    return OrderedLoader
 
 
-def yaml_ordered_dump(data, stream=None, dumper_class=yaml.Dumper, **kwds):
-    """
-    Dump ordered YAML content.
+def _intern(value):
+    # Keys and short values repeat a lot in compose trees (one copy each)
+    if type(value) is str and len(value) <= INTERNED_VALUE_MAX_LENGTH:
+        return sys.intern(value)
+    return value
 
-    :param stream:           Stream (stream)
-    :param dumper_class:     Dumper class (Dumper) (default: yaml.Dumper)
-    :param kwds:             Keywords arguments
-    """
 
+@functools.lru_cache(maxsize=None)
+def _get_ordered_dumper(dumper_class):
     class OrderedDumper(dumper_class):
         """Ordered dumper."""
 
@@ -78,15 +128,7 @@ def yaml_ordered_dump(data, stream=None, dumper_class=yaml.Dumper, **kwds):
             unicode, yaml.representer.SafeRepresenter.represent_unicode
         )  # noqa
 
-    out = yaml.dump(data, stream, OrderedDumper, **kwds)
-
-    if six.PY2:
-        out = unicode(out)  # noqa
-
-    return out
-
-
-# PRIVATE ##########
+    return OrderedDumper
 
 
 def _merge_yaml_two(src1, src2):
@@ -0,0 +1,44 @@
+"""Timing utilities."""
+
+from contextlib import contextmanager
+import time
+
+from .tracing import using_span
+
+
+@contextmanager
+def using_timer(timings, name):
+    """
+    Measure elapsed time of a block into a timings dict.
+
+    Durations are accumulated when the same name is used multiple times.
+    The block is also recorded as a span when tracing.
+
+    :param timings:  Timings (dict?) - no-op if None
+    :param name:     Timing name (str)
+
+    **Context manager**
+    """
+    with using_span(name, category="stage"):
+        if timings is None:
+            yield
+            return
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start_time
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def format_timings(timings):
+    """
+    Format timings as a short human readable string.
+
+    :param timings:  Timings (dict)
+    :rtype: Formatted timings (str)
+    """
+    return ", ".join(
+        f"{name}: {value:.3f}s" for name, value in timings.items()
+    )
@@ -0,0 +1,491 @@
+"""Tracing utilities.
+
+Spans are only recorded when a tracer is started, with the `--profile`
+or `--mem-profile` flags or the `DOCKNV_TRACE` environment variable
+(`mode[:output_path]`).
+"""
+
+from contextlib import contextmanager
+import functools
+import json
+import os
+import threading
+import time
+
+from .events import events_is_active, events_record_call
+
+TRACE_ENV = "DOCKNV_TRACE"
+TRACE_MODES = ("summary", "cprofile", "chrome", "memory")
+TRACE_DEFAULT_OUTPUTS = {
+    "cprofile": "docknv.prof",
+    "chrome": "docknv-trace.json",
+}
+
+# Spans of this category get their top allocators in memory mode
+MEMORY_SNAPSHOT_CATEGORY = "stage"
+MEMORY_TOP_ALLOCATORS = 5
+MEMORY_TRACEBACK_DEPTH = 1
+
+_current_tracer = None
+
+
+class Span(object):
+    """Recorded span."""
+
+    __slots__ = (
+        "name",
+        "category",
+        "start",
+        "duration",
+        "thread_id",
+        "args",
+        "memory",
+    )
+
+    def __init__(
+        self, name, category, start, duration, thread_id, args, memory=None
+    ):
+        """
+        Init.
+
+        :param name:        Span name (str)
+        :param category:    Category (str)
+        :param start:       Start time in seconds, from tracer start (float)
+        :param duration:    Duration in seconds (float)
+        :param thread_id:   Thread identifier (int)
+        :param args:        Arguments (dict)
+        :param memory:      Memory usage, in memory mode (MemoryUsage?)
+        """
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = duration
+        self.thread_id = thread_id
+        self.args = args
+        self.memory = memory
+
+
+class MemoryUsage(object):
+    """Memory usage of a span."""
+
+    __slots__ = ("allocated", "peak", "rss", "top")
+
+    def __init__(self, allocated, peak, rss, top):
+        """
+        Init.
+
+        :param allocated:   Allocated bytes still alive at exit (int)
+        :param peak:        Peak bytes allocated during the span (int)
+        :param rss:         Process peak RSS at exit, in bytes (int)
+        :param top:         Top allocators: (location, bytes) (list)
+        """
+        self.allocated = allocated
+        self.peak = peak
+        self.rss = rss
+        self.top = top
+
+
+class _MemoryFrame(object):
+    __slots__ = ("start", "peak", "snapshot")
+
+    def __init__(self, start, snapshot):
+        self.start = start
+        self.peak = start
+        self.snapshot = snapshot
+
+
+class Tracer(object):
+    """Record spans or profile a run."""
+
+    def __init__(self, mode="summary", output_path=None):
+        """
+        Init.
+
+        :param mode:        Mode: summary, cprofile, chrome or memory (str)
+        :param output_path: Output path (str?) (default: per mode)
+        """
+        if mode not in TRACE_MODES:
+            raise ValueError(f"unknown trace mode: {mode}")
+
+        self.mode = mode
+        self.output_path = output_path or TRACE_DEFAULT_OUTPUTS.get(mode)
+        self.spans = []
+        self.profiler = None
+        self.start_time = time.perf_counter()
+        self._memory_frames = threading.local()
+
+    def start(self):
+        """Start tracing."""
+        self.start_time = time.perf_counter()
+        if self.mode == "cprofile":
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.mode == "memory":
+            import tracemalloc
+
+            tracemalloc.start(MEMORY_TRACEBACK_DEPTH)
+
+    def stop(self):
+        """
+        Stop tracing and write output.
+
+        :rtype: Output path (str?) (None for summary)
+        """
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.output_path)
+            return self.output_path
+
+        if self.mode == "chrome":
+            self.write_chrome_trace(self.output_path)
+            return self.output_path
+
+        if self.mode == "memory":
+            import tracemalloc
+
+            tracemalloc.stop()
+
+        return None
+
+    def enter_memory_span(self, category):
+        """
+        Start measuring memory for a span, in memory mode.
+
+        Peaks are process-wide: the current peak is folded in the parent
+        span before being reset for the new span. Before Python 3.9,
+        peaks cannot be reset: they are peaks since tracing started.
+
+        :param category:    Category (str)
+        """
+        if self.mode != "memory":
+            return
+
+        import tracemalloc
+
+        frames = self._get_memory_frames()
+        current, peak = tracemalloc.get_traced_memory()
+        if frames:
+            frames[-1].peak = max(frames[-1].peak, peak)
+        _reset_memory_peak()
+
+        snapshot = None
+        if category == MEMORY_SNAPSHOT_CATEGORY:
+            snapshot = _take_memory_snapshot()
+        frames.append(_MemoryFrame(current, snapshot))
+
+    def exit_memory_span(self):
+        """
+        Stop measuring memory for the current span, in memory mode.
+
+        :rtype: Memory usage (MemoryUsage?)
+        """
+        if self.mode != "memory":
+            return None
+
+        import resource
+        import tracemalloc
+
+        frames = self._get_memory_frames()
+        frame = frames.pop()
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(frame.peak, peak)
+        if frames:
+            frames[-1].peak = max(frames[-1].peak, peak)
+        _reset_memory_peak()
+
+        top = []
+        if frame.snapshot is not None:
+            stats = _take_memory_snapshot().compare_to(
+                frame.snapshot, "lineno"
+            )
+            top = [
+                (str(stat.traceback[0]), stat.size_diff)
+                for stat in stats[:MEMORY_TOP_ALLOCATORS]
+                if stat.size_diff > 0
+            ]
+
+        # Kilobytes on Linux
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return MemoryUsage(current - frame.start, peak - frame.start, rss, top)
+
+    def _get_memory_frames(self):
+        frames = getattr(self._memory_frames, "frames", None)
+        if frames is None:
+            frames = self._memory_frames.frames = []
+        return frames
+
+    def add_span(
+        self, name, category, start, duration, args=None, memory=None
+    ):
+        """
+        Add a span.
+
+        :param name:        Span name (str)
+        :param category:    Category (str)
+        :param start:       Start time (perf_counter value) (float)
+        :param duration:    Duration in seconds (float)
+        :param args:        Arguments (dict?)
+        :param memory:      Memory usage (MemoryUsage?)
+        """
+        # list.append is atomic, spans come from multiple threads
+        self.spans.append(
+            Span(
+                name,
+                category,
+                start - self.start_time,
+                duration,
+                threading.get_ident(),
+                args or {},
+                memory,
+            )
+        )
+
+    def get_summary(self):
+        """
+        Aggregate spans by name.
+
+        :rtype: Rows: (name, count, total, max), by total time (list)
+        """
+        rows = {}
+        for span in self.spans:
+            count, total, maximum = rows.get(span.name, (0, 0.0, 0.0))
+            rows[span.name] = (
+                count + 1,
+                total + span.duration,
+                max(maximum, span.duration),
+            )
+
+        return sorted(
+            ((name,) + values for name, values in rows.items()),
+            key=lambda row: row[2],
+            reverse=True,
+        )
+
+    def get_memory_summary(self):
+        """
+        Aggregate memory usage by span name, in memory mode.
+
+        :rtype: Rows: (name, count, max allocated, max peak, max RSS),
+            by peak (list)
+        """
+        rows = {}
+        for span in self.spans:
+            if span.memory is None:
+                continue
+
+            count, allocated, peak, rss = rows.get(span.name, (0, 0, 0, 0))
+            rows[span.name] = (
+                count + 1,
+                max(allocated, span.memory.allocated),
+                max(peak, span.memory.peak),
+                max(rss, span.memory.rss),
+            )
+
+        return sorted(
+            ((name,) + values for name, values in rows.items()),
+            key=lambda row: row[3],
+            reverse=True,
+        )
+
+    def format_summary(self):
+        """
+        Format the summary table.
+
+        :rtype: Lines (list)
+        """
+        if self.mode == "memory":
+            return self.format_memory_summary()
+
+        lines = [
+            f"{'span':<32} {'count':>7} {'total (ms)':>12} {'max (ms)':>10}"
+        ]
+        for name, count, total, maximum in self.get_summary():
+            lines.append(
+                f"{name:<32} {count:>7} {total * 1000:>12.2f}"
+                f" {maximum * 1000:>10.2f}"
+            )
+
+        return lines
+
+    def format_memory_summary(self):
+        """
+        Format the memory summary: usage per span and top allocators.
+
+        :rtype: Lines (list)
+        """
+        megabyte = 1024 * 1024
+        lines = [
+            f"{'span':<32} {'count':>7} {'alloc (MB)':>11}"
+            f" {'peak (MB)':>10} {'RSS (MB)':>9}"
+        ]
+        for name, count, allocated, peak, rss in self.get_memory_summary():
+            lines.append(
+                f"{name:<32} {count:>7} {allocated / megabyte:>11.2f}"
+                f" {peak / megabyte:>10.2f} {rss / megabyte:>9.1f}"
+            )
+
+        for span in self.spans:
+            if span.memory is None or not span.memory.top:
+                continue
+
+            lines.append(f"top allocators for {span.name}:")
+            for location, size in span.memory.top:
+                lines.append(f"  {size / megabyte:>8.2f} MB  {location}")
+
+        return lines
+
+    def write_chrome_trace(self, path):
+        """
+        Write spans in Chrome trace event format (Perfetto, about:tracing).
+
+        :param path:    Output path (str)
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {key: str(value) for key, value in span.args.items()},
+            }
+            for span in self.spans
+        ]
+
+        with open(path, mode="w") as handle:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, handle)
+
+
+def tracer_parse_setting(value):
+    """
+    Parse a trace setting (`mode[:output_path]`).
+
+    `1` enables the summary mode.
+
+    :param value:   Setting (str)
+    :rtype: Mode and output path (tuple)
+    """
+    mode, _, output_path = value.partition(":")
+    if mode in ("1", "true", "yes"):
+        mode = "summary"
+
+    return mode, output_path or None
+
+
+def tracer_start(mode="summary", output_path=None):
+    """
+    Start the current tracer.
+
+    :param mode:        Mode: summary, cprofile, chrome or memory (str)
+    :param output_path: Output path (str?) (default: per mode)
+    :rtype: Tracer
+    """
+    global _current_tracer
+
+    tracer = Tracer(mode, output_path)
+    tracer.start()
+    _current_tracer = tracer
+    return tracer
+
+
+def tracer_stop():
+    """
+    Stop the current tracer and write its output.
+
+    :rtype: Tracer (Tracer?)
+    """
+    global _current_tracer
+
+    tracer = _current_tracer
+    _current_tracer = None
+    if tracer is not None:
+        tracer.stop()
+    return tracer
+
+
+def tracer_get_current():
+    """
+    Get the current tracer.
+
+    :rtype: Tracer (Tracer?)
+    """
+    return _current_tracer
+
+
+@contextmanager
+def using_span(name, category="docknv", **args):
+    """
+    Record a span on the current tracer, if any.
+
+    Spans are also recorded as calls in the event log, if started.
+
+    :param name:        Span name (str)
+    :param category:    Category (str) (default: docknv)
+    :param args:        Span arguments
+
+    **Context manager**
+    """
+    tracer = _current_tracer
+    if tracer is None and not events_is_active():
+        yield
+        return
+
+    if tracer is not None:
+        tracer.enter_memory_span(category)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start_time
+        if tracer is not None:
+            tracer.add_span(
+                name,
+                category,
+                start_time,
+                duration,
+                args,
+                tracer.exit_memory_span(),
+            )
+        # Calls of the current operation, in the event log
+        events_record_call(name, category, duration, args)
+
+
+def _take_memory_snapshot():
+    import tracemalloc
+
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    )
+
+
+def _reset_memory_peak():
+    import tracemalloc
+
+    # Python 3.9+
+    reset_peak = getattr(tracemalloc, "reset_peak", None)
+    if reset_peak is not None:
+        reset_peak()
+
+
+def traced(name, category="docknv"):
+    """
+    Record each call of the decorated function as a span.
+
+    :param name:        Span name (str)
+    :param category:    Category (str) (default: docknv)
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with using_span(name, category):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
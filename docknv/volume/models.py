@@ -10,6 +10,15 @@ from .exceptions import MalformedVolume
 class Volume(object):
     """Volume object."""
 
+    __slots__ = (
+        "host_path",
+        "container_path",
+        "mode",
+        "is_absolute",
+        "is_relative",
+        "is_named",
+    )
+
     def __init__(self, host_path, container_path, mode="rw"):
         """
         Volume object constructor.
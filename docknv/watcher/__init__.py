@@ -0,0 +1,4 @@
+"""Project source watcher."""
+
+from .models import *  # noqa
+from .methods import *  # noqa
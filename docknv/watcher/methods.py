@@ -0,0 +1,184 @@
+"""Watcher methods."""
+
+from collections import OrderedDict
+import os
+
+from docknv.environment import env_get_imported_environments
+from docknv.volume import Volume
+
+from .models import (
+    ConfigurationChange,
+    InotifyWatcher,
+    PollingWatcher,
+    WATCHER_OVERFLOW,
+)
+
+WATCHED_FOLDERS = ("composefiles", "envs", os.path.join("data", "files"))
+ENV_EXTENSION = ".env.yml"
+
+
+def watcher_get_watched_paths(project_path):
+    """
+    Get project paths to watch.
+
+    :param project_path:    Project path (str)
+    :rtype: Paths (list)
+    """
+    return [os.path.join(project_path, path) for path in WATCHED_FOLDERS]
+
+
+def watcher_create(project_path, polling=False, interval=0.5):
+    """
+    Create a watcher on project sources.
+
+    Use inotify when available, else fallback to polling.
+
+    :param project_path:    Project path (str)
+    :param polling:         Force polling? (bool) (default: False)
+    :param interval:        Polling interval (float) (default: 0.5)
+    :rtype: Watcher
+    """
+    paths = watcher_get_watched_paths(project_path)
+    if not polling:
+        try:
+            return InotifyWatcher(paths)
+        except OSError:
+            pass
+
+    return PollingWatcher(paths, interval=interval)
+
+
+def watcher_wait_for_changes(watcher, debounce=0.5, timeout=None):
+    """
+    Wait for a burst of changes.
+
+    Once a first change is detected, changes are accumulated until no
+    change happens during `debounce` seconds.
+
+    :param watcher:     Watcher
+    :param debounce:    Debounce delay in seconds (float) (default: 0.5)
+    :param timeout:     Timeout in seconds (float?) (default: wait forever)
+    :rtype: Changed paths (set)
+    """
+    changes = watcher.poll(timeout)
+    if not changes:
+        return changes
+
+    while True:
+        more_changes = watcher.poll(debounce)
+        if not more_changes:
+            return changes
+        changes |= more_changes
+
+
+def watcher_classify_path(project_path, path):
+    """
+    Classify a changed path.
+
+    :param project_path:    Project path (str)
+    :param path:            Changed path (str)
+    :rtype: (Kind (str?), Value (str?))
+
+    Kinds are `composefile`, `environment` (value: environment name),
+    `file` (value: path relative to `data/files`) and `overflow` (lost
+    events: anything may have changed).
+    """
+    if path == WATCHER_OVERFLOW:
+        return ("overflow", None)
+
+    relative_path = os.path.relpath(path, project_path)
+    parts = relative_path.split(os.sep)
+
+    if parts[0] == "composefiles" and len(parts) > 1:
+        return ("composefile", relative_path)
+    elif parts[0] == "envs" and relative_path.endswith(ENV_EXTENSION):
+        return ("environment", parts[-1][: -len(ENV_EXTENSION)])
+    elif parts[:2] == ["data", "files"] and len(parts) > 2:
+        return ("file", "/".join(parts[2:]))
+
+    return (None, None)
+
+
+def watcher_get_affected_configurations(compose_def, configs, paths):
+    """
+    Map changed paths to affected configurations.
+
+    :param compose_def:     Merged (unrendered) compose definition
+    :param configs:         Configurations (list)
+    :param paths:           Changed paths (iterable)
+    :rtype: Changes per configuration (OrderedDict)
+    """
+    if len(configs) == 0:
+        return OrderedDict()
+
+    project_path = configs[0].database.project_path
+    composefile_changed = False
+    changed_envs = set()
+    changed_files = set()
+
+    for path in paths:
+        kind, value = watcher_classify_path(project_path, path)
+        if kind in ("composefile", "overflow"):
+            # Every configuration is regenerated
+            composefile_changed = True
+        elif kind == "environment":
+            changed_envs.add(value)
+        elif kind == "file":
+            changed_files.add(value)
+
+    services = compose_def.get_services()
+    results = OrderedDict()
+
+    for config in configs:
+        change = ConfigurationChange(config.name)
+
+        env_names = {config.environment}
+        env_names.update(
+            env_get_imported_environments(project_path, config.environment)
+        )
+        if composefile_changed or changed_envs & env_names:
+            change.compose = True
+            change.services.update(config.services)
+
+        for service_name in config.services:
+            volumes = (services.get(service_name) or {}).get("volumes")
+            if not isinstance(volumes, dict):
+                continue
+
+            if _match_volumes(volumes.get("static"), changed_files, True):
+                change.compose = True
+                change.services.add(service_name)
+
+            templates = _match_volumes(volumes.get("templates"), changed_files)
+            if templates:
+                change.templates.update(templates)
+                change.services.add(service_name)
+
+        if change.compose or change.templates:
+            results[config.name] = change
+
+    return results
+
+
+def _match_volumes(entries, changed_files, include_children=False):
+    matches = set()
+    for entry in entries or []:
+        # Ignore empty volumes
+        if entry == "":
+            continue
+
+        host_path = Volume.load_from_entry(entry).host_path
+        stripped_path = host_path.strip("/")
+        for changed_file in changed_files:
+            if (
+                changed_file == stripped_path
+                # Moved or deleted folder
+                or stripped_path.startswith(changed_file + "/")
+                or (
+                    include_children
+                    and changed_file.startswith(stripped_path + "/")
+                )
+            ):
+                matches.add(host_path)
+
+    return matches
@@ -0,0 +1,218 @@
+"""Watcher models."""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+INOTIFY_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+)
+INOTIFY_EVENT = struct.Struct("iIII")
+INOTIFY_BUFFER_SIZE = 64 * 1024
+
+# Changed path reported when events were lost
+WATCHER_OVERFLOW = "<overflow>"
+
+
+class PollingWatcher(object):
+    """Watch paths by periodically comparing file modification times."""
+
+    def __init__(self, paths, interval=0.5):
+        """
+        Init.
+
+        :param paths:       Root paths to watch (list)
+        :param interval:    Polling interval in seconds (float)
+        """
+        self.paths = [p for p in paths if os.path.exists(p)]
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+
+    def poll(self, timeout=None):
+        """
+        Wait for changes.
+
+        :param timeout: Timeout in seconds (float?) (default: wait forever)
+        :rtype: Changed paths (set)
+        """
+        deadline = None if timeout is None else time.time() + timeout
+
+        while True:
+            sleep_time = self.interval
+            if deadline is not None:
+                sleep_time = min(sleep_time, max(deadline - time.time(), 0))
+            time.sleep(sleep_time)
+
+            snapshot = self._take_snapshot()
+            changes = {
+                path
+                for path in set(snapshot) | set(self.snapshot)
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+
+            if changes:
+                return changes
+            if deadline is not None and time.time() >= deadline:
+                return set()
+
+    def close(self):
+        """Close watcher."""
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for root_path in self.paths:
+            for root, _folders, filenames in os.walk(root_path):
+                for filename in filenames:
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+
+class InotifyWatcher(object):
+    """Watch paths using Linux inotify."""
+
+    def __init__(self, paths):
+        """
+        Init.
+
+        :raise OSError if inotify is not available
+
+        :param paths:   Root paths to watch (list)
+        """
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc not found")
+
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.paths = [p for p in paths if os.path.exists(p)]
+        self.watches = {}
+        for root_path in self.paths:
+            self._add_tree(root_path)
+
+    def poll(self, timeout=None):
+        """
+        Wait for changes.
+
+        Deleted or moved folders are reported as changed paths. When
+        events were lost, `WATCHER_OVERFLOW` is reported.
+
+        :param timeout: Timeout in seconds (float?) (default: wait forever)
+        :rtype: Changed paths (set)
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            data = os.read(self.fd, INOTIFY_BUFFER_SIZE)
+        except BlockingIOError:
+            return set()
+
+        changes = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name_end = offset + length
+            name = data[offset:name_end].rstrip(b"\0")
+            offset = name_end
+
+            # Lost events: consider everything changed, and watch
+            # folders which may have been missed
+            if mask & IN_Q_OVERFLOW:
+                changes.add(WATCHER_OVERFLOW)
+                for root_path in self.paths:
+                    self._add_tree(root_path)
+                continue
+
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                # Contents of moved or deleted folders are not reported
+                if mask & (IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE):
+                    changes.add(path)
+                continue
+
+            changes.add(path)
+
+        return changes
+
+    def close(self):
+        """Close watcher."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def _add_tree(self, root_path):
+        for root, _folders, _filenames in os.walk(root_path):
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(root), INOTIFY_MASK
+            )
+            if wd >= 0:
+                self.watches[wd] = root
+
+
+class ConfigurationChange(object):
+    """Changes impacting one configuration."""
+
+    def __init__(self, name):
+        """
+        Init.
+
+        :param name:    Configuration name (str)
+        """
+        self.name = name
+        self.compose = False
+        self.templates = set()
+        self.services = set()
+
+    def __repr__(self):
+        """Repr."""
+        return (
+            f"ConfigurationChange({self.name}, compose={self.compose}, "
+            f"templates={sorted(self.templates)}, "
+            f"services={sorted(self.services)})"
+        )
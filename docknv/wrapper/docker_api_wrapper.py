@@ -1,8 +1,22 @@
 """Docker API wrapper."""
 
 from contextlib import contextmanager
+import re
 
-import docker
+from docknv.utils.tracing import traced, using_span
+
+from .exceptions import FailedCommandExecution
+
+COMPOSE_PROJECT_LABEL = "com.docker.compose.project"
+COMPOSE_SERVICE_LABEL = "com.docker.compose.service"
+COMPOSE_NUMBER_LABEL = "com.docker.compose.container-number"
+COMPOSE_ONEOFF_LABEL = "com.docker.compose.oneoff"
+# Directory bit in archive stats (Go's os.ModeDir)
+STAT_MODE_DIR = 1 << 31
+HEALTH_PATTERN = re.compile(r"\((?:health: )?(healthy|unhealthy|starting)\)")
+
+_docker_client = None
+_docker_ps_cache = {}
 
 
 def text_ellipse(s, maxlen):
@@ -21,42 +35,307 @@ def using_docker_client():
     """
     Open a Docker client.
 
+    The client is created once per process, as creating it queries the
+    daemon version.
+
     **Context manager**
     """
-    yield docker.from_env()
+    global _docker_client
+
+    with using_span("docker.client", category="api"):
+        # The Docker SDK is slow to import, load it on first use
+        import docker
+
+        if _docker_client is None:
+            try:
+                _docker_client = docker.from_env()
+            except docker.errors.DockerException as exc:
+                raise FailedCommandExecution(str(exc))
 
+    try:
+        yield _docker_client
+    except docker.errors.DockerException as exc:
+        raise FailedCommandExecution(str(exc))
 
-def docker_ps(client, project_name, namespace_name=None):
+
+@traced("docker.ps", category="api")
+def docker_ps(
+    client,
+    project_name,
+    namespace_name=None,
+    service_names=None,
+    include_stopped=False,
+):
     """
-    Get running container infos.
+    Get container infos for a compose project.
+
+    Containers are filtered by the Docker daemon on the compose project
+    label, with a single list call (no per-container inspection).
+    Results are cached until `docker_ps_clear_cache` is called.
 
     :param client:          Client (Client)
-    :param namespace_name:  Namespace name (str)
-    :rtype: Info list (iterable)
+    :param project_name:    Compose project name (str)
+    :param namespace_name:  Namespace name (str?)
+    :param service_names:   Service names, namespaced (iterable?)
+    :param include_stopped: Include stopped containers? (bool)
+        (default: False)
+    :rtype: Info list (list)
     """
-    containers = client.containers.list()
-    status_lines = []
+    cache_key = (project_name, include_stopped)
+    status_lines = _docker_ps_cache.get(cache_key)
+    if status_lines is None:
+        status_lines = _docker_ps_cache[cache_key] = [
+            _docker_ps_get_info(container)
+            for container in client.api.containers(
+                all=include_stopped,
+                filters={"label": [f"{COMPOSE_PROJECT_LABEL}={project_name}"]},
+            )
+        ]
 
-    container_filter = project_name + "_"
     if namespace_name:
-        container_filter += namespace_name + "_"
-
-    for container in containers:
-        attrs = container.attrs
-        state = attrs["State"]
-
-        container_name = attrs["Name"][1:]
-        if not container_name.startswith(container_filter):
-            continue
-
-        status_lines.append(
-            {
-                "name": container_name,
-                "status": state["Status"],
-                "ports": " - ".join(
-                    list(attrs["NetworkSettings"]["Ports"].keys())
-                ),
-            }
-        )
+        prefix = namespace_name + "_"
+        status_lines = [
+            info
+            for info in status_lines
+            if info["service"] and info["service"].startswith(prefix)
+        ]
+
+    if service_names is not None:
+        service_names = set(service_names)
+        status_lines = [
+            info for info in status_lines if info["service"] in service_names
+        ]
 
     return status_lines
+
+
+def docker_ps_clear_cache():
+    """Clear cached container infos."""
+    _docker_ps_cache.clear()
+
+
+def docker_stat_path(client, container, path):
+    """
+    Get infos on a path in a container.
+
+    Only the archive headers are requested: the path is not archived.
+
+    :param client:      Client (Client)
+    :param container:   Container name or ID (str)
+    :param path:        Container path (str)
+    :rtype: Stat: name, size, mode, ... (dict?) (None if missing)
+    """
+    import docker
+    from docker.utils import decode_json_header
+
+    api = client.api
+    response = api.head(
+        api._url("/containers/{0}/archive", container),
+        params={"path": path},
+        timeout=api.timeout,
+    )
+    try:
+        api._raise_for_status(response)
+    except docker.errors.NotFound:
+        return None
+    finally:
+        response.close()
+
+    stat = response.headers.get("X-Docker-Container-Path-Stat")
+    return decode_json_header(stat) if stat else None
+
+
+def docker_stat_is_dir(stat):
+    """
+    Check if a path stat is a directory.
+
+    :param stat:    Stat (dict?)
+    :rtype: True/False
+    """
+    return stat is not None and bool(stat["mode"] & STAT_MODE_DIR)
+
+
+def docker_put_archive(client, container, path, chunks):
+    """
+    Extract a tar archive in a container directory.
+
+    :param client:      Client (Client)
+    :param container:   Container name or ID (str)
+    :param path:        Container directory (str)
+    :param chunks:      Archive, possibly compressed (bytes or iterable)
+    """
+    with using_span(
+        "docker.put_archive", category="api", container=container, path=path
+    ):
+        client.api.put_archive(container, path, chunks)
+
+
+def docker_get_archive(client, container, path, compression=False):
+    """
+    Get a tar archive of a container path.
+
+    :param client:      Client (Client)
+    :param container:   Container name or ID (str)
+    :param path:        Container path (str)
+    :param compression: Compress the transfer? (bool) (default: False)
+    :rtype: Archive chunks (iterable) and stat (dict)
+    """
+    with using_span(
+        "docker.get_archive", category="api", container=container, path=path
+    ):
+        return client.api.get_archive(
+            container, path, encode_stream=compression
+        )
+
+
+def docker_logs(
+    client, container, follow=False, tail=None, since=None, until=None
+):
+    """
+    Stream timestamped logs of a container.
+
+    Each log line starts with its RFC 3339 timestamp. Chunks may hold
+    several lines, or part of a line.
+
+    :param client:      Client (Client)
+    :param container:   Container name or ID (str)
+    :param follow:      Follow logs? (bool) (default: False)
+    :param tail:        Last lines count (int?) (default: all)
+    :param since:       Start time, as UNIX timestamp (float?)
+    :param until:       End time, as UNIX timestamp (float?)
+    :rtype: Log chunks (iterable)
+    """
+    with using_span("docker.logs", category="api", container=container):
+        return client.api.logs(
+            container,
+            stream=True,
+            timestamps=True,
+            follow=follow,
+            tail="all" if tail is None else tail,
+            since=since,
+            until=until,
+        )
+
+
+def docker_events(client, project_name, since=None, until=None):
+    """
+    Stream container events of a compose project.
+
+    The stream ends at `until`, or never if not set.
+
+    :param client:          Client (Client)
+    :param project_name:    Compose project name (str)
+    :param since:           Start time, as UNIX timestamp (float?)
+    :param until:           End time, as UNIX timestamp (float?)
+    :rtype: Decoded events (iterable)
+    """
+    with using_span("docker.events", category="api"):
+        return client.api.events(
+            since=since,
+            until=until,
+            filters={
+                "type": "container",
+                "label": [f"{COMPOSE_PROJECT_LABEL}={project_name}"],
+            },
+            decode=True,
+        )
+
+
+def docker_inspect_state(client, container):
+    """
+    Get the state of a container.
+
+    :param client:      Client (Client)
+    :param container:   Container name or ID (str)
+    :rtype: Status and health, None without health check (dict)
+    """
+    with using_span("docker.inspect", category="api", container=container):
+        state = client.api.inspect_container(container)["State"]
+
+    health = state.get("Health")
+    return {
+        "status": state["Status"],
+        "health": health["Status"] if health else None,
+    }
+
+
+def docker_inspect_image(client, image):
+    """
+    Inspect an image.
+
+    :param client:  Client (Client)
+    :param image:   Image name or ID (str)
+    :rtype: Image data, None if missing (dict?)
+    """
+    import docker
+
+    with using_span("docker.inspect_image", category="api", image=image):
+        try:
+            return client.api.inspect_image(image)
+        except docker.errors.ImageNotFound:
+            return None
+
+
+def docker_find_images(client, label):
+    """
+    Find images by label.
+
+    :param client:  Client (Client)
+    :param label:   Label, as KEY=VALUE (str)
+    :rtype: Image IDs (list)
+    """
+    with using_span("docker.images", category="api", label=label):
+        return client.api.images(quiet=True, filters={"label": label})
+
+
+def docker_tag_image(client, image, tag):
+    """
+    Tag an image.
+
+    :param client:  Client (Client)
+    :param image:   Image name or ID (str)
+    :param tag:     Tag, as repository[:version] (str)
+    """
+    repository, version = _split_tag(tag)
+    with using_span("docker.tag", category="api", image=image, tag=tag):
+        client.api.tag(image, repository, version)
+
+
+# PRIVATE ##########
+
+
+def _docker_ps_get_info(container):
+    labels = container.get("Labels") or {}
+
+    ports = []
+    for port in container.get("Ports") or []:
+        port_name = f"{port['PrivatePort']}/{port['Type']}"
+        if port_name not in ports:
+            ports.append(port_name)
+
+    # Health is only given in the human-readable status, e.g.
+    # "Up 2 minutes (healthy)"
+    health = None
+    match = HEALTH_PATTERN.search(container.get("Status", ""))
+    if match:
+        health = match.group(1)
+
+    number = labels.get(COMPOSE_NUMBER_LABEL)
+
+    return {
+        "id": container["Id"],
+        "name": container["Names"][0][1:],
+        "service": labels.get(COMPOSE_SERVICE_LABEL),
+        "number": int(number) if number else None,
+        "oneoff": labels.get(COMPOSE_ONEOFF_LABEL) == "True",
+        "status": container["State"],
+        "health": health,
+        "ports": " - ".join(ports),
+    }
+
+
+def _split_tag(tag):
+    # Registry ports come before the last slash
+    head, slash, tail = tag.rpartition("/")
+    name, _, version = tail.partition(":")
+    return f"{head}{slash}{name}", version or "latest"
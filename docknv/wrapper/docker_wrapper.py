@@ -1,6 +1,7 @@
 """Docker commands wrapper."""
 
-from .methods import exec_process, exec_process_with_output
+from .docker_api_wrapper import docker_ps_clear_cache
+from .methods import exec_process
 
 
 def exec_docker(project_path, args, dry_run=False):
@@ -12,6 +13,8 @@ def exec_docker(project_path, args, dry_run=False):
     :param dry_run:          Dry run? (bool) (default: False)
     """
     cmd = ["docker"] + [str(a) for a in args if a != ""]
+    # Container states may change
+    docker_ps_clear_cache()
     return exec_process(cmd, cwd=project_path, dry_run=dry_run)
 
 
@@ -24,7 +27,8 @@ def exec_compose(
     :param project_path:     Project path (str)
     :param composefile_path: Composefile path (str)
     :param args:             Arguments (...)
-    :param pretty:           Pretty filtering ? (default: False) (bool)
+    :param pretty:           Filter noisy output lines? (bool)
+        (default: False)
     :param dry_run:          Dry run? (bool) (default: False)
     """
     cmd = [
@@ -34,18 +38,25 @@ def exec_compose(
         "--project-directory",
         project_path,
     ]
-    cmd += [str(a) for a in args if a != ""]
+    args = [str(a) for a in args if a != ""]
+    cmd += args
+    # Container states may change
+    docker_ps_clear_cache()
 
+    filters = None
     if pretty:
-        exec_process_with_output(
-            cmd, project_path, _pretty_handler, dry_run=dry_run
-        )
+        action = args[0] if args else None
+        filters = [lambda line: _pretty_handler(action, line)]
 
-    return exec_process(cmd, cwd=project_path, dry_run=dry_run)
+    return exec_process(
+        cmd, cwd=project_path, filters=filters, dry_run=dry_run
+    )
+
+
+# PRIVATE ##########
 
 
-def _pretty_handler(args, line):
-    action = args[0]
+def _pretty_handler(action, line):
     if not _pretty_handler_common(line):
         return False
 
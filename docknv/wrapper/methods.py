@@ -1,76 +1,458 @@
 """Wrapper methods."""
 
-import subprocess
+import asyncio
+import os
+import sys
+import threading
+import time
 
 from docknv.logger import Logger
+from docknv.utils.tracing import using_span
 
 from .exceptions import FailedCommandExecution, StoppedCommandExecution
 
+# Max output line length (asyncio default: 64 KiB)
+PROCESS_LINE_LIMIT = 1024 * 1024
+# Delay before killing a process which ignores SIGTERM, in seconds
+PROCESS_KILL_DELAY = 5.0
+PROCESS_MAX_CONCURRENCY = 4
 
-def exec_process(args, cwd=None, shell=False, dry_run=False):
+
+class ProcessResult(object):
+    """Process result."""
+
+    __slots__ = ("args", "returncode", "stdout", "stderr", "duration")
+
+    def __init__(self, args, returncode, stdout=None, stderr=None, duration=0):
+        """
+        Init.
+
+        :param args:        Arguments (list)
+        :param returncode:  Return code (int)
+        :param stdout:      Captured output lines (list?)
+        :param stderr:      Captured error lines (list?)
+        :param duration:    Duration, in seconds (float)
+        """
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+
+    def __repr__(self):
+        """Repr."""
+        return f"<ProcessResult {self.args} rc={self.returncode}>"
+
+
+class ProcessHandle(object):
+    """Running process, which can be stopped from any thread."""
+
+    def __init__(self, loop, process):
+        """
+        Init.
+
+        :param loop:    Event loop running the process
+        :param process: Process (asyncio.subprocess.Process)
+        """
+        self.loop = loop
+        self.process = process
+
+    @property
+    def pid(self):
+        """Get the process ID."""
+        return self.process.pid
+
+    def terminate(self):
+        """Terminate the process."""
+        self.loop.call_soon_threadsafe(_signal_process, self.process, False)
+
+    def kill(self):
+        """Kill the process."""
+        self.loop.call_soon_threadsafe(_signal_process, self.process, True)
+
+
+async def exec_process_async(
+    args,
+    cwd=None,
+    env=None,
+    filters=None,
+    on_line=None,
+    on_start=None,
+    capture=False,
+    timeout=None,
+    check=True,
+):
     """
-    Execute a process.
+    Execute a process, asynchronously.
 
-    :param args:    Arguments (list)
-    :param cwd:     Working directory (str?)
-    :param shell:   Shell? (bool) (default: False)
-    :param dry_run: Dry run? (bool) (default: False)
-    :rtype: Arguments or return code
+    No shell is involved. Without filters, line handler or capture, the
+    process shares the terminal. Otherwise, output and error lines are
+    streamed as they come: lines rejected by a filter are dropped, then
+    lines are passed to `on_line`, else written to the matching stream
+    when not captured.
+
+    On timeout or cancellation, the process is terminated, and killed
+    if still running after `PROCESS_KILL_DELAY`.
+
+    :param args:        Arguments (list)
+    :param cwd:         Working directory (str?)
+    :param env:         Extra environment variables (dict?)
+    :param filters:     Line filters: fn(line) -> keep? (list?)
+    :param on_line:     Line handler: fn(line) (fn?)
+    :param on_start:    Process handler, e.g. to stop it: fn(handle) (fn?)
+    :param capture:     Capture output lines? (bool) (default: False)
+    :param timeout:     Timeout, in seconds (float?)
+    :param check:       Fail on non-zero return code? (bool) (default: True)
+    :rtype: Result (ProcessResult)
     """
-    try:
-        Logger.debug(f"executing command {args}...")
-        if dry_run:
-            return args
+    args = [str(arg) for arg in args]
+    piped = bool(filters or on_line or capture)
+    pipe = asyncio.subprocess.PIPE if piped else None
+    started = time.monotonic()
 
-        rc = subprocess.call(args, cwd=cwd, shell=shell)
-    except KeyboardInterrupt:
-        raise StoppedCommandExecution("CTRL+C")
-    except BaseException as exc:
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            cwd=cwd,
+            env={**os.environ, **env} if env else None,
+            stdout=pipe,
+            stderr=pipe,
+            limit=PROCESS_LINE_LIMIT,
+        )
+    except OSError as exc:
         raise FailedCommandExecution(str(exc))
 
-    if rc != 0:
-        raise FailedCommandExecution(f"bad return code: {rc}")
-    return rc
+    if on_start:
+        on_start(ProcessHandle(asyncio.get_event_loop(), process))
+
+    result = ProcessResult(args, None)
+    tasks = [process.wait()]
+    if piped:
+        result.stdout = [] if capture else None
+        result.stderr = [] if capture else None
+        tasks += [
+            _read_lines(
+                process.stdout, sys.stdout, result.stdout, filters, on_line
+            ),
+            _read_lines(
+                process.stderr, sys.stderr, result.stderr, filters, on_line
+            ),
+        ]
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout)
+    except asyncio.TimeoutError:
+        await _stop_process(process)
+        raise FailedCommandExecution(f"timeout after {timeout:g}s: {args}")
+    except BaseException:
+        # Cancelled, or failing filter
+        await _stop_process(process)
+        raise
+
+    result.returncode = process.returncode
+    result.duration = time.monotonic() - started
+    if check and result.returncode != 0:
+        raise FailedCommandExecution(f"bad return code: {result.returncode}")
+    return result
 
 
-def exec_process_with_output(args, cwd=None, outfilter=None, dry_run=False):
+def exec_process(
+    args,
+    cwd=None,
+    env=None,
+    filters=None,
+    on_line=None,
+    on_start=None,
+    timeout=None,
+    dry_run=False,
+):
     """
-    Execute a process with output.
+    Execute a process.
+
+    See `exec_process_async` for output handling.
 
     :param args:        Arguments (list)
     :param cwd:         Working directory (str?)
-    :param outfilter:   Output filter func (fn?)
+    :param env:         Extra environment variables (dict?)
+    :param filters:     Line filters: fn(line) -> keep? (list?)
+    :param on_line:     Line handler: fn(line) (fn?)
+    :param on_start:    Process handler, e.g. to stop it: fn(handle) (fn?)
+    :param timeout:     Timeout, in seconds (float?)
     :param dry_run:     Dry run? (bool) (default: False)
-    :rtype: Arguments or return code and output
+    :rtype: Arguments or return code
     """
+    Logger.debug(f"executing command {args}...")
     if dry_run:
         return args
 
-    try:
-        proc = subprocess.Popen(
-            " ".join(args),
+    result = _run_sync(
+        args,
+        exec_process_async(
+            args,
             cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            shell=True,
-            universal_newlines=True,
-        )
+            env=env,
+            filters=filters,
+            on_line=on_line,
+            on_start=on_start,
+            timeout=timeout,
+        ),
+    )
+    return result.returncode
+
+
+def exec_process_output(
+    args, cwd=None, env=None, timeout=None, check=True, dry_run=False
+):
+    """
+    Execute a process, capturing its output.
+
+    :param args:        Arguments (list)
+    :param cwd:         Working directory (str?)
+    :param env:         Extra environment variables (dict?)
+    :param timeout:     Timeout, in seconds (float?)
+    :param check:       Fail on non-zero return code? (bool) (default: True)
+    :param dry_run:     Dry run? (bool) (default: False)
+    :rtype: Arguments or result (ProcessResult)
+    """
+    Logger.debug(f"executing command {args}...")
+    if dry_run:
+        return args
+
+    return _run_sync(
+        args,
+        exec_process_async(
+            args,
+            cwd=cwd,
+            env=env,
+            capture=True,
+            timeout=timeout,
+            check=check,
+        ),
+    )
 
-        while True:
-            out = proc.stdout.readline()
-            if out == "" and proc.poll() is not None:
-                break
-            if out:
-                out = out.strip()
-                if outfilter and outfilter(args, out):
-                    print(out)
 
-        rc = proc.poll()
+def exec_processes(
+    commands,
+    cwd=None,
+    env=None,
+    on_line=None,
+    max_concurrency=PROCESS_MAX_CONCURRENCY,
+    timeout=None,
+    dry_run=False,
+):
+    """
+    Execute processes concurrently.
+
+    On the first failure, running processes are stopped and no other
+    process starts.
+
+    :param commands:        Arguments, by process (list)
+    :param cwd:             Working directory (str?)
+    :param env:             Extra environment variables (dict?)
+    :param on_line:         Line handler: fn(index, line) (fn?)
+    :param max_concurrency: Max concurrent processes (int)
+    :param timeout:         Timeout per process, in seconds (float?)
+    :param dry_run:         Dry run? (bool) (default: False)
+    :rtype: Arguments or return codes, by process (list)
+    """
+    for args in commands:
+        Logger.debug(f"executing command {args}...")
+    if dry_run:
+        return commands
+
+    async def _run_all():
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _run(index, args):
+            async with semaphore:
+                return await exec_process_async(
+                    args,
+                    cwd=cwd,
+                    env=env,
+                    on_line=(
+                        (lambda line: on_line(index, line))
+                        if on_line
+                        else None
+                    ),
+                    timeout=timeout,
+                )
+
+        tasks = [
+            asyncio.ensure_future(_run(index, args))
+            for index, args in enumerate(commands)
+        ]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    results = _run_sync(commands, _run_all())
+    return [result.returncode for result in results]
+
+
+# PRIVATE ##########
+
+
+def _run_sync(args, coroutine):
+    _check_child_watcher()
+
+    # No asyncio.run before Python 3.7
+    loop = asyncio.new_event_loop()
+    try:
+        # Also attaches the child watcher of older Pythons
+        asyncio.set_event_loop(loop)
+        with using_span("process", category="subprocess", args=args):
+            return loop.run_until_complete(coroutine)
     except KeyboardInterrupt:
         raise StoppedCommandExecution("CTRL+C")
+    except (FailedCommandExecution, StoppedCommandExecution):
+        raise
     except BaseException as exc:
         raise FailedCommandExecution(str(exc))
+    finally:
+        _close_loop(loop)
+
+
+def _close_loop(loop):
+    # Interrupted: cancel pending tasks, stopping their processes
+    all_tasks = getattr(asyncio, "all_tasks", None) or asyncio.Task.all_tasks
+    tasks = [task for task in all_tasks(loop) if not task.done()]
+    try:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            loop.run_until_complete(
+                asyncio.gather(*tasks, return_exceptions=True)
+            )
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def _check_child_watcher():
+    # Before Python 3.8, the default child watcher only attaches to the main
+    # thread loop: processes started from other threads cannot be awaited.
+    # Child watchers are deprecated from Python 3.12, all being thread-safe.
+    if (
+        sys.version_info >= (3, 12)
+        or threading.current_thread() is threading.main_thread()
+    ):
+        return
+
+    policy = asyncio.get_event_loop_policy()
+    if not hasattr(policy, "get_child_watcher"):
+        return
+
+    with _CHILD_WATCHER_LOCK:
+        if not isinstance(policy.get_child_watcher(), _THREADED_WATCHERS):
+            policy.set_child_watcher(_ThreadedChildWatcher())
+
 
-    if rc != 0:
-        raise FailedCommandExecution(f"bad return code: {rc}")
-    return rc
+if sys.version_info < (3, 8) and sys.platform != "win32":
+
+    class _ThreadedChildWatcher(asyncio.AbstractChildWatcher):
+        # Backport of the Python 3.8 watcher: each process is waited for
+        # from its own thread, then reported to the loop which started it
+
+        def add_child_handler(self, pid, callback, *args):
+            thread = threading.Thread(
+                target=self._wait,
+                args=(asyncio.get_event_loop(), pid, callback, args),
+                name=f"waitpid-{pid}",
+                daemon=True,
+            )
+            thread.start()
+
+        def remove_child_handler(self, pid):
+            return True
+
+        def attach_loop(self, loop):
+            pass
+
+        def is_active(self):
+            return True
+
+        def close(self):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def _wait(self, loop, pid, callback, args):
+            try:
+                _, status = os.waitpid(pid, 0)
+            except ChildProcessError:
+                returncode = 255
+            else:
+                if os.WIFSIGNALED(status):
+                    returncode = -os.WTERMSIG(status)
+                else:
+                    returncode = os.WEXITSTATUS(status)
+
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(callback, pid, returncode, *args)
+
+else:
+    _ThreadedChildWatcher = getattr(asyncio, "ThreadedChildWatcher", None)
+
+_THREADED_WATCHERS = tuple(
+    watcher
+    for watcher in (
+        _ThreadedChildWatcher,
+        getattr(asyncio, "PidfdChildWatcher", None),
+        getattr(asyncio, "MultiLoopChildWatcher", None),
+    )
+    if watcher is not None
+)
+_CHILD_WATCHER_LOCK = threading.Lock()
+
+
+async def _read_lines(reader, stream, captured, filters, on_line):
+    while True:
+        data = await reader.readline()
+        if not data:
+            break
+
+        line = data.decode("utf-8", errors="replace").rstrip("\r\n")
+        if filters and not all(keep(line) for keep in filters):
+            continue
+
+        if captured is not None:
+            captured.append(line)
+        if on_line:
+            on_line(line)
+        elif captured is None:
+            stream.write(line + "\n")
+            stream.flush()
+
+
+async def _stop_process(process):
+    if process.returncode is not None:
+        return
+
+    _signal_process(process, False)
+    try:
+        await asyncio.wait_for(process.wait(), PROCESS_KILL_DELAY)
+    except asyncio.TimeoutError:
+        _signal_process(process, True)
+        await process.wait()
+
+
+def _signal_process(process, kill):
+    if process.returncode is not None:
+        return
+
+    try:
+        if kill:
+            process.kill()
+        else:
+            process.terminate()
+    except ProcessLookupError:
+        pass
@@ -69,3 +69,182 @@ def test_compose():
         compose = ComposeDefinition.load_from_project(project_path)
         compose.apply_configuration(conf2)
         assert len(compose.get_services()) == 2
+
+
+def test_compose_diff():
+    """Compose diff test."""
+    from docknv.compose.diffing import (
+        composefile_diff_services,
+        composefile_snapshot_services,
+    )
+
+    with using_temporary_directory() as tempdir:
+        files_root = os.path.join(tempdir, "config")
+        os.makedirs(files_root)
+        template_path = os.path.join(files_root, "template.txt")
+        env_path = os.path.join(files_root, "environment.env")
+        for path in (template_path, env_path):
+            with io_open(path, mode="w") as handle:
+                handle.write("A=1\n")
+
+        content = {
+            "services": {
+                "one": {
+                    "image": "one",
+                    "env_file": [env_path],
+                    "volumes": [f"{template_path}:/template.txt:rw"],
+                },
+                "two": {"image": "two", "volumes": ["/tmp:/tmp:rw"]},
+                "three": {"image": "three"},
+            }
+        }
+
+        old_snapshot = composefile_snapshot_services(
+            content, tempdir, files_root
+        )
+        assert list(old_snapshot["one"]["files"].keys()) == [
+            env_path,
+            template_path,
+        ]
+        # Files outside of the config root are ignored
+        assert len(old_snapshot["two"]["files"]) == 0
+
+        # Same content, no diff
+        assert (
+            composefile_diff_services(
+                old_snapshot,
+                composefile_snapshot_services(content, tempdir, files_root),
+            )
+            == {}
+        )
+
+        # Template content change
+        with io_open(template_path, mode="w") as handle:
+            handle.write("A=2\n")
+
+        new_content = {
+            "services": {
+                "one": content["services"]["one"],
+                "two": {"image": "two:2", "volumes": ["/tmp:/tmp:rw"]},
+                "four": {"image": "four"},
+            }
+        }
+        new_snapshot = composefile_snapshot_services(
+            new_content, tempdir, files_root
+        )
+        diff = composefile_diff_services(old_snapshot, new_snapshot)
+        assert diff == {
+            "one": [f"~file:{template_path}"],
+            "two": ["~image"],
+            "four": ["added"],
+            "three": ["removed"],
+        }
+
+
+def test_compose_merge():
+    """Compose merge test."""
+    from docknv.compose.merging import (
+        composefile_clear_cache,
+        composefile_load_cached,
+        composefile_merge,
+    )
+    from docknv.utils.serialization import yaml_merge, yaml_ordered_load
+
+    with using_temporary_directory() as tempdir:
+        paths = []
+        for i in range(50):
+            path = os.path.join(tempdir, f"{i:03d}.yml")
+            with io_open(path, mode="w") as handle:
+                handle.write(
+                    'version: "3"\n'
+                    "services:\n"
+                    f"  service{i}:\n"
+                    f"    image: image{i}\n"
+                    "  common:\n"
+                    f"    image: common{i}\n"
+                    f"    ports: ['{i}:{i}']\n"
+                    "networks:\n"
+                    "  net:\n"
+                )
+            paths.append(path)
+
+        # Same result as the sequential merge, whatever the input order
+        expected = {}
+        for path in paths:
+            with io_open(path, mode="r") as handle:
+                content = yaml_ordered_load(handle.read())
+            expected = yaml_merge([expected, content])
+
+        content, sources = composefile_merge(reversed(paths))
+        assert content == expected
+        assert content["services"]["common"]["image"] == "common0"
+        assert len(content["services"]["common"]["ports"]) == 50
+
+        # Sources
+        assert sources["services"]["service3"] == [paths[3]]
+        assert sources["services"]["common"] == paths
+        assert sources["networks"]["net"] == paths
+
+        # Cache is used while files are unchanged
+        first = composefile_load_cached(paths[0])
+        assert composefile_load_cached(paths[0]) is first
+
+        # Merging never modifies cached contents
+        content["services"]["service0"]["image"] = "changed"
+        assert first["services"]["service0"]["image"] == "image0"
+
+        with io_open(paths[0], mode="w") as handle:
+            handle.write("services:\n  other:\n    image: other\n")
+        assert composefile_load_cached(paths[0]) is not first
+
+        composefile_clear_cache()
+        content, sources = composefile_merge(paths)
+        assert "service0" not in content["services"]
+        assert sources["services"]["other"] == [paths[0]]
+
+
+def test_compose_sources():
+    """Compose sources test."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        compose = ComposeDefinition.load_from_project(project_path)
+        composefiles_path = os.path.join(project_path, "composefiles")
+
+        assert compose.get_sources("services", "pouet") == [
+            os.path.join(composefiles_path, "sample2.yml")
+        ]
+        assert compose.get_sources("networks", "net") == [
+            os.path.join(composefiles_path, "sample.yml"),
+            os.path.join(composefiles_path, "sample2.yml"),
+        ]
+        assert compose.get_sources("services", "unknown") == []
+
+
+def test_compose_filter():
+    """Compose filter test."""
+    from collections import OrderedDict
+
+    from docknv.compose.filtering import composefile_filter_entries
+
+    services = OrderedDict(
+        (f"service{i}", {"image": f"image{i}"}) for i in range(400)
+    )
+    content = OrderedDict(
+        [
+            ("version", "3"),
+            ("services", services),
+            ("volumes", OrderedDict([("a", None), ("b", None)])),
+        ]
+    )
+
+    output = composefile_filter_entries(
+        content, services=["service300", "service2"], volumes=["b"]
+    )
+    assert list(output.keys()) == ["version", "services", "volumes"]
+    assert list(output["services"].keys()) == ["service2", "service300"]
+    assert list(output["volumes"].keys()) == ["b"]
+
+    # Entries are shared, source is untouched
+    assert output["services"]["service2"] is services["service2"]
+    assert len(content["services"]) == 400
+    assert len(content["volumes"]) == 2
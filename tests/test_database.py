@@ -176,3 +176,68 @@ def test_old_database():
         with io_open(db_file) as handle:
             data = yaml_ordered_load(handle.read())
             assert "values" not in data
+
+
+def test_regenerate_configurations():
+    """Regenerate configurations test."""
+    database_file = """\
+first:
+    services: ["portainer", "pouet"]
+    volumes: ["portainer"]
+    networks: ["net"]
+    environment: default
+    user: test
+    namespace:
+second:
+    services: ["portainer"]
+    volumes: []
+    networks: ["net"]
+    environment: default
+    user: test
+    namespace: hello
+third:
+    services: ["pouet"]
+    volumes: []
+    networks: []
+    environment: inclusion
+    user: test
+    namespace:
+"""
+
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+
+        os.makedirs(os.path.join(project_path, ".docknv"))
+        with open(
+            os.path.join(project_path, ".docknv", ".docknv.yml"), mode="w"
+        ) as handle:
+            handle.write(database_file)
+
+        project = Project.load_from_path(project_path)
+        database = project.database
+
+        # Reference generation, one configuration at a time
+        expected = {}
+        for name in ("first", "second", "third"):
+            config = database.get_configuration(name)
+            database.update_configuration(config)
+            with io_open(config.get_composefile_path()) as handle:
+                expected[name] = yaml_ordered_load(handle.read())
+            os.remove(config.get_composefile_path())
+
+        shared_timings, results = database.regenerate_configurations()
+        assert list(results.keys()) == ["first", "second", "third"]
+        assert "merge" in shared_timings
+        assert "render" in shared_timings
+        assert "write" in results["first"]
+
+        for name in ("first", "second", "third"):
+            config = database.get_configuration(name)
+            with io_open(config.get_composefile_path()) as handle:
+                content = yaml_ordered_load(handle.read())
+            assert content == expected[name]
+            assert os.path.exists(config.get_environment_path())
+
+        # Unknown configuration
+        with pytest.raises(MissingConfiguration):
+            database.regenerate_configurations(["pouet"])
@@ -1,12 +1,22 @@
 """Image handler test."""
 
 import os
+from types import SimpleNamespace
+
+from unittest import mock
 
 from docknv.image import (
+    ImageCollection,
+    image_discover,
     image_get_dockerfile_path,
+    image_get_dockerfile_references,
     image_check_dockerfile,
     image_load_in_memory,
 )
+from docknv.image import methods as image_methods
+from docknv.image.fingerprint import fingerprint_get_context
+from docknv.tests.utils import using_temporary_directory
+from docknv.utils.ioutils import io_open
 
 
 def test_image_get_dockerfile_path():
@@ -42,3 +52,154 @@ def test_image_load_in_memory():
         image_load_in_memory("samples/sample01", "app/hello-world")
         == "FROM hello-world:latest\n"
     )
+
+
+def test_image_get_dockerfile_references():
+    """Get Dockerfile references."""
+    content = (
+        "ARG BASE=base\n"
+        "ARG VERSION\n"
+        "FROM --platform=linux/amd64 ${BASE}:$VERSION AS builder\n"
+        "ARG BASE=ignored\n"
+        "FROM builder\n"
+        "from registry:5000/org/tool@sha256:abc as tool\n"
+        "COPY --from=tool /bin/tool /bin/tool\n"
+    )
+    assert image_get_dockerfile_references(content) == [
+        "base",
+        "registry:5000/org/tool",
+    ]
+    assert image_get_dockerfile_references(content, ["BASE=other"]) == [
+        "other",
+        "registry:5000/org/tool",
+    ]
+
+
+def test_image_collection_dependencies():
+    """Get image dependencies."""
+    with using_temporary_directory() as tempdir:
+        dockerfiles = {
+            "base": "FROM debian:12\n",
+            "app": "FROM org/base:1.0\n",
+            "tools/worker": "FROM app AS build\nFROM base\n",
+        }
+        for name, content in dockerfiles.items():
+            os.makedirs(os.path.join(tempdir, "images", name))
+            path = image_get_dockerfile_path(tempdir, name)
+            with io_open(path, mode="w") as handle:
+                handle.write(content)
+
+        project = SimpleNamespace(project_path=tempdir)
+        images = ImageCollection.load_from_project(project)
+        assert images.get_dependencies(tempdir, "org/") == {
+            "app": ["base"],
+            "base": [],
+            "worker": ["app", "base"],
+        }
+
+
+def test_image_discover():
+    """Discover images incrementally."""
+    with using_temporary_directory() as tempdir:
+        images_path = os.path.join(tempdir, "images")
+        for name in (
+            "base",
+            "base/nested",
+            "app/web",
+            "node_modules/lib",
+            "skipped/tool",
+        ):
+            os.makedirs(os.path.join(images_path, name))
+            path = os.path.join(images_path, name, "Dockerfile")
+            with io_open(path, mode="w") as handle:
+                handle.write("FROM debian:12\n")
+        path = os.path.join(images_path, ".docknvignore")
+        with io_open(path, mode="w") as handle:
+            handle.write("# Comment\nskipped/\n")
+
+        # Image folders are not descended into, ignored folders skipped
+        project = SimpleNamespace(project_path=tempdir)
+        images = ImageCollection.load_from_project(project)
+        assert list(images.images) == ["base", "web"]
+        assert images.images["web"].path == "./images/app/web"
+
+        # The index is only saved in an existing project folder
+        assert not os.path.exists(os.path.join(tempdir, ".docknv"))
+        os.makedirs(os.path.join(tempdir, ".docknv"))
+
+        def _read_only(path, **kwargs):
+            if kwargs.get("mode") != "r":
+                raise PermissionError(path)
+            return io_open(path, **kwargs)
+
+        with mock.patch.object(image_methods, "io_open", _read_only):
+            images = ImageCollection.load_from_project(project)
+        assert list(images.images) == ["base", "web"]
+        images = ImageCollection.load_from_project(project)
+
+        # Unchanged folders are not listed again
+        index = image_methods.image_load_index(
+            os.path.join(tempdir, ".docknv", ".images.json")
+        )
+        with mock.patch.object(
+            image_methods, "_list_folder", side_effect=AssertionError
+        ):
+            assert list(ImageCollection.load_from_project(project).images) == [
+                "base",
+                "web",
+            ]
+
+        # Changed folders are
+        os.makedirs(os.path.join(images_path, "app", "worker"))
+        path = os.path.join(images_path, "app", "worker", "Dockerfile")
+        with io_open(path, mode="w") as handle:
+            handle.write("FROM base\n")
+        patterns = image_methods.image_load_ignore_patterns(images_path)
+        images, new_index = image_discover(images_path, patterns, index)
+        assert sorted(images) == ["base", "web", "worker"]
+        assert new_index["folders"]["app"][2] == ["app/web", "app/worker"]
+
+        # Other patterns invalidate the index
+        images, _ = image_discover(images_path, index=new_index)
+        assert sorted(images) == ["base", "tool", "web", "worker"]
+
+
+def test_fingerprint():
+    """Build context fingerprint."""
+    with using_temporary_directory() as tempdir:
+        files = {
+            "Dockerfile": "FROM debian:12\n",
+            "a.txt": "a",
+            ".dockerignore": "# Comment\nignored\n*.log\n",
+        }
+        for name, content in files.items():
+            with io_open(os.path.join(tempdir, name), mode="w") as handle:
+                handle.write(content)
+
+        file_hashes = {}
+        fingerprint = fingerprint_get_context(tempdir, file_hashes=file_hashes)
+        assert os.path.join(tempdir, "a.txt") in file_hashes
+
+        # Ignored files
+        os.makedirs(os.path.join(tempdir, "ignored"))
+        for name in ("ignored/b.txt", "c.log"):
+            with io_open(os.path.join(tempdir, name), mode="w") as handle:
+                handle.write(name)
+        assert fingerprint_get_context(tempdir) == fingerprint
+
+        # Build args
+        assert fingerprint_get_context(tempdir, build_args=["A=1"]) not in (
+            fingerprint,
+            fingerprint_get_context(tempdir, build_args=["A=2"]),
+        )
+
+        # Unchanged files are not read again
+        file_hashes[os.path.join(tempdir, "a.txt")][2] = "other"
+        assert (
+            fingerprint_get_context(tempdir, file_hashes=file_hashes)
+            != fingerprint
+        )
+
+        with io_open(os.path.join(tempdir, "a.txt"), mode="w") as handle:
+            handle.write("changed")
+        assert fingerprint_get_context(tempdir) != fingerprint
@@ -1,13 +1,53 @@
 """Lifecycle tests."""
 
+import datetime
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
 import pytest
+import yaml
 
 from docknv.database import MissingActiveConfiguration
+from docknv.lifecycle import MissingContainer, UnhealthyServices
+from docknv.lifecycle.building import building_get_levels, building_run_graph
+from docknv.lifecycle.caching import (
+    BuildCache,
+    CACHE_HIT,
+    CACHE_MISS,
+    CACHE_RETAG,
+    caching_get_compose_builds,
+)
+from docknv.lifecycle.health import health_get_start_levels, health_wait
+from docknv.lifecycle.logs import (
+    logs_get_sort_key,
+    logs_parse_time,
+    logs_stream,
+)
+from docknv.lifecycle.methods import lifecycle_get_containers_from_service
+from docknv.lifecycle.planning import (
+    planning_get_dependencies,
+    planning_get_key,
+    planning_get_targets,
+)
+from docknv.image.fingerprint import (
+    FINGERPRINT_LABEL,
+    fingerprint_get_index_path,
+    fingerprint_load_index,
+)
 from docknv.project import Project
 
 from docknv.utils.ioutils import io_open
+from docknv.wrapper import FailedCommandExecution, using_docker_client
+from docknv.utils.serialization import structured_dump
+from docknv.tests.mocking import (
+    fake_container,
+    fake_image,
+    using_fake_docker_client,
+)
 from docknv.tests.utils import using_temporary_directory, copy_sample
 
 CONFIG_DATA = """\
@@ -72,9 +112,34 @@ def test_lifecycle():
         # Update config
         lifecycle.config.update(dry_run=True)
         lifecycle.config.update("config2", dry_run=True)
-        lifecycle.config.update(restart=True, dry_run=True)
+        diff = lifecycle.config.update(restart=True, dry_run=True)
+        assert diff == {}
+        diff = lifecycle.config.update(
+            services=["portainer"], restart=True, dry_run=True
+        )
+        assert diff == {"pouet": ["removed"]}
+        diff = lifecycle.config.update(
+            services=["portainer", "pouet"], restart=True, dry_run=True
+        )
+        assert diff == {"pouet": ["added"]}
+        diff = lifecycle.config.update(
+            environment="inclusion", restart=True, dry_run=True
+        )
+        assert "portainer" in diff
+        lifecycle.config.update(environment="default", dry_run=True)
         lifecycle.config.build(dry_run=True)
 
+        # Baseline signatures
+        lifecycle.config.start(["config"], True)
+        lifecycle.config.build("config", None, False, True)
+        lifecycle.config.build(name="config", dry_run=True)
+
+        # Regenerate configs
+        results = lifecycle.config.regenerate()
+        assert list(results.keys()) == ["config"]
+        results = lifecycle.config.regenerate(all_configs=True, workers=2)
+        assert list(results.keys()) == ["config", "config2"]
+
         lifecycle.config.update(environment="default", dry_run=True)
         lifecycle.config.update(services=[], dry_run=True)
         lifecycle.config.update(volumes=[], dry_run=True)
@@ -85,3 +150,814 @@ def test_lifecycle():
         # Create config
         lifecycle.config.create(name="tutu", services=["portainer"])
         lifecycle.config.ps(dry_run=True)
+
+
+def test_update_removed_services():
+    """Update with only removed services should not start anything."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        project_config_root = os.path.join(project_path, ".docknv")
+        session_file_path = os.path.join(project_config_root, ".docknv.yml")
+
+        os.makedirs(project_config_root)
+        with io_open(session_file_path, mode="w") as handle:
+            handle.write(CONFIG_DATA)
+
+        project = Project.load_from_path(project_path)
+        project.set_current_configuration("config")
+        lifecycle = project.lifecycle
+        lifecycle.config.update(dry_run=True)
+
+        with mock.patch(
+            "docknv.lifecycle.models.lifecycle_compose_command_on_configs"
+        ) as compose:
+            diff = lifecycle.config.update(
+                services=["portainer"], restart=True, dry_run=True
+            )
+            assert diff == {"pouet": ["removed"]}
+            args = compose.call_args[0][2]
+            assert "-d" not in args
+            assert "--no-start" in args
+            assert "--no-recreate" in args
+            assert "--remove-orphans" in args
+
+            diff = lifecycle.config.update(
+                services=["portainer", "pouet"], restart=True, dry_run=True
+            )
+            assert diff == {"pouet": ["added"]}
+            args = compose.call_args[0][2]
+            assert args[:2] == ["up", "-d"]
+            assert "--remove-orphans" not in args
+            assert args[-1] == "pouet"
+
+
+def test_query():
+    """Query test."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        project_config_root = os.path.join(project_path, ".docknv")
+        session_file_path = os.path.join(project_config_root, ".docknv.yml")
+
+        os.makedirs(project_config_root)
+        with io_open(session_file_path, mode="w") as handle:
+            handle.write(CONFIG_DATA)
+
+        project = Project.load_from_path(project_path)
+        lifecycle = project.lifecycle
+
+        # Nothing selected
+        state = lifecycle.config.query(dry_run=True)
+        assert state["current"] is None
+        assert state["configurations"] == []
+
+        state = lifecycle.config.query(all_configs=True, containers=False)
+        assert [entry["name"] for entry in state["configurations"]] == [
+            "config",
+            "config2",
+        ]
+        assert "containers" not in state["configurations"][0]
+
+        project.set_current_configuration("config2")
+        state = lifecycle.config.query(dry_run=True)
+        assert state["project"] == project.project_name
+        assert state["current"] == "config2"
+        entry = state["configurations"][0]
+        assert entry["name"] == "config2"
+        assert entry["current"]
+        assert entry["namespace"] == "pouet"
+        assert entry["containers"] == []
+
+        assert json.loads(structured_dump(state, "json")) == state
+        assert yaml.safe_load(structured_dump(state, "yaml")) == state
+        with pytest.raises(ValueError):
+            structured_dump(state, "xml")
+
+
+def test_container_resolution():
+    """Container resolution test."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        project = Project.load_from_path(project_path)
+        name = project.project_name
+
+        # Replicas are listed out of order
+        containers = [
+            fake_container(name, "pouet_portainer", 2),
+            fake_container(name, "pouet_portainer", 1),
+            fake_container(name, "portainer", 1),
+            fake_container("other", "portainer", 1),
+        ]
+        with using_fake_docker_client(containers):
+            assert lifecycle_get_containers_from_service(
+                project, "pouet_portainer"
+            ) == [f"{name}_pouet_portainer_1", f"{name}_pouet_portainer_2"]
+            assert lifecycle_get_containers_from_service(
+                project, "pouet_portainer", replica=2
+            ) == [f"{name}_pouet_portainer_2"]
+
+            with pytest.raises(MissingContainer):
+                lifecycle_get_containers_from_service(
+                    project, "pouet_portainer", replica=3
+                )
+            with pytest.raises(MissingContainer):
+                lifecycle_get_containers_from_service(project, "pouet")
+
+        # Dry run guesses the name
+        assert lifecycle_get_containers_from_service(
+            project, "portainer", replica=2, dry_run=True
+        ) == [f"{name}_portainer_2"]
+
+
+def test_transfer():
+    """Push and pull test."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        project_config_root = os.path.join(project_path, ".docknv")
+        session_file_path = os.path.join(project_config_root, ".docknv.yml")
+
+        os.makedirs(project_config_root)
+        with io_open(session_file_path, mode="w") as handle:
+            handle.write(CONFIG_DATA)
+
+        project = Project.load_from_path(project_path)
+        project.set_current_configuration("config")
+        name = project.project_name
+        service = project.lifecycle.service
+
+        # Host files
+        source = os.path.join(tempdir, "source")
+        os.makedirs(os.path.join(source, "sub"))
+        for path in ("a.txt", "sub/b.txt"):
+            with io_open(os.path.join(source, path), mode="w") as handle:
+                handle.write(path)
+        single = os.path.join(source, "a.txt")
+
+        # Container filesystems
+        root = os.path.join(tempdir, "containers")
+        containers = [
+            fake_container(name, "portainer", 1),
+            fake_container(name, "portainer", 2),
+        ]
+        replicas = [f"{name}_portainer_1", f"{name}_portainer_2"]
+        for replica in replicas:
+            os.makedirs(os.path.join(root, replica, "data"))
+
+        with using_fake_docker_client(containers, root) as client:
+            # All replicas, in directory
+            sent = service.push(
+                "portainer",
+                [source, single],
+                "/data",
+                all_replicas=True,
+                compression="gz",
+            )
+            assert sent == {replicas[0]: 3, replicas[1]: 3}
+            for replica in replicas:
+                data_path = os.path.join(root, replica, "data")
+                assert os.path.isfile(
+                    os.path.join(data_path, "source", "sub", "b.txt")
+                )
+                assert os.path.isfile(os.path.join(data_path, "a.txt"))
+
+            # Incremental
+            archive_count = len(client.api.archives)
+            assert service.push(
+                "portainer", source, "/data", incremental=True
+            ) == {replicas[0]: 0}
+            assert len(client.api.archives) == archive_count
+
+            with io_open(os.path.join(source, "a.txt"), mode="w") as handle:
+                handle.write("changed")
+            assert service.push(
+                "portainer", source, "/data", incremental=True
+            ) == {replicas[0]: 1}
+
+            # Renamed file, second replica
+            service.push(
+                "portainer",
+                host_path=single,
+                container_path="/data/renamed.txt",
+                replica=2,
+            )
+            assert os.path.isfile(
+                os.path.join(root, replicas[1], "data", "renamed.txt")
+            )
+
+            # Pull
+            output = os.path.join(tempdir, "output")
+            service.pull("portainer", ["/data/source", "/data/a.txt"], output)
+            with io_open(os.path.join(output, "source", "a.txt")) as handle:
+                assert handle.read() == "changed"
+            assert os.path.isfile(os.path.join(output, "a.txt"))
+
+            pulled = os.path.join(tempdir, "pulled.txt")
+            service.pull(
+                "portainer",
+                container_path="/data/a.txt",
+                host_path=pulled,
+                replica=2,
+            )
+            with io_open(pulled) as handle:
+                assert handle.read() == "a.txt"
+
+            with pytest.raises(FailedCommandExecution):
+                service.push("portainer", [source, single], "/missing")
+
+
+def test_logs(capsys):
+    """Logs test."""
+    now = 1_700_000_000.0
+    assert logs_parse_time("10m", now=now) == now - 600
+    assert logs_parse_time("1.5h", now=now) == now - 5400
+    assert logs_parse_time("1700000000") == now
+    assert logs_parse_time("2023-11-14T22:13:20Z") == now
+    assert logs_parse_time("2023-11-14T23:13:20+01:00") == now
+    assert logs_parse_time("2023-11-14T22:13Z") == now - 20
+    assert logs_parse_time("2023-11-14T22:13:20.123456789Z") == pytest.approx(
+        now + 0.123456
+    )
+    assert logs_parse_time("2023-11-14T22:13:20.5") == pytest.approx(
+        datetime.datetime(2023, 11, 14, 22, 13, 20, 500000).timestamp()
+    )
+    assert logs_parse_time("2023-11-14") == (
+        datetime.datetime(2023, 11, 14).timestamp()
+    )
+    for value in ("yesterday", "2023-13-01", "2023-11-14T25:00Z"):
+        with pytest.raises(FailedCommandExecution):
+            logs_parse_time(value)
+
+    # Trimmed nanoseconds still sort
+    assert logs_get_sort_key("2023-11-14T22:13:20.1Z") < logs_get_sort_key(
+        "2023-11-14T22:13:20.12Z"
+    )
+
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        project_config_root = os.path.join(project_path, ".docknv")
+        session_file_path = os.path.join(project_config_root, ".docknv.yml")
+
+        os.makedirs(project_config_root)
+        with io_open(session_file_path, mode="w") as handle:
+            handle.write(CONFIG_DATA)
+
+        project = Project.load_from_path(project_path)
+        project.set_current_configuration("config")
+        name = project.project_name
+        config = project.lifecycle.config
+
+        containers = [
+            fake_container(name, "portainer", 1),
+            fake_container(name, "pouet_portainer", 1),
+        ]
+        logs = {
+            # Lines split across chunks
+            f"{name}_portainer_1": [
+                b"2023-11-14T22:13:20.1Z first\n2023-11-14T22:13:2",
+                b"2.5Z third\n",
+            ],
+            f"{name}_pouet_portainer_1": [
+                b"2023-11-14T22:13:21Z second\n",
+                b"2023-11-14T22:13:23Z fourth\n",
+            ],
+        }
+
+        with using_fake_docker_client(containers, logs=logs) as client:
+            # Merged by timestamp, over configurations
+            capsys.readouterr()
+            config.logs(["config", "config2"], since="10m", tail=5)
+            lines = capsys.readouterr().out.splitlines()
+            assert [line.rsplit(" ", 1)[-1] for line in lines] == [
+                "first",
+                "second",
+                "third",
+                "fourth",
+            ]
+            assert "portainer_1 " in lines[0]
+            assert "pouet_portainer_1 " in lines[1]
+            assert client.api.log_calls[0][1]["tail"] == 5
+            assert client.api.log_calls[0][1]["since"] < time.time()
+
+            # Current configuration, filtered
+            config.logs(pattern="^th", timestamps=True)
+            lines = capsys.readouterr().out.splitlines()
+            assert len(lines) == 1
+            assert lines[0].endswith("2023-11-14T22:13:22.5Z third")
+
+            # Service selection
+            config.logs(["config2"], service_names=["pouet"])
+            assert "no running container" in capsys.readouterr().out
+
+            # Bounded buffer, in follow mode
+            sources = [(f"source{i}", f"{name}_portainer_1") for i in range(8)]
+            with using_docker_client() as docker_client:
+                merged = list(
+                    logs_stream(
+                        docker_client, sources, follow=True, buffer_size=2
+                    )
+                )
+            assert len(merged) == 16
+
+
+def test_health():
+    """Health wait test."""
+    services = {
+        "ns_worker": {"depends_on": {"web": {"condition": "service_started"}}},
+        "ns_web": {"depends_on": ["db", "external"]},
+        "ns_db": None,
+        "ns_cache": {},
+    }
+    assert health_get_start_levels(services, "ns") == [
+        ["ns_db", "ns_cache"],
+        ["ns_web"],
+        ["ns_worker"],
+    ]
+
+    containers = [
+        fake_container("project", "db", status="Up 1 second (healthy)"),
+        fake_container("project", "web", status="Up (health: starting)"),
+        fake_container("project", "web", 2, status="Up (health: starting)"),
+    ]
+
+    # From events
+    events = [
+        ("project_web_1", "Up 2 seconds (healthy)", "running"),
+        ("project_web_2", "Up 2 seconds (healthy)", "running"),
+    ]
+    with using_fake_docker_client(containers, events=events) as client:
+        durations = health_wait(client, "project", ["db", "web"], timeout=5)
+        assert sorted(durations) == ["db", "web"]
+        assert client.api.calls == [
+            (True, {"label": ["com.docker.compose.project=project"]})
+        ]
+
+    # Stopped container
+    events = [("project_web_1", "Exited (1)", "exited")]
+    containers[1]["Status"] = "Up (health: starting)"
+    with using_fake_docker_client(containers, events=events) as client:
+        with pytest.raises(UnhealthyServices):
+            health_wait(client, "project", ["web"], timeout=5)
+
+    # Polling, without events
+    containers = [fake_container("project", "db", status="Up (unhealthy)")]
+    with using_fake_docker_client(containers) as client:
+        with pytest.raises(UnhealthyServices):
+            health_wait(client, "project", ["db"], timeout=0.1)
+
+        timer = threading.Timer(
+            0.1, containers[0].update, [{"Status": "Up (healthy)"}]
+        )
+        timer.start()
+        assert list(health_wait(client, "project", ["db"], timeout=5)) == [
+            "db"
+        ]
+        assert len(client.api.calls) == 4
+
+    # Polling, with an exited container: fail fast
+    containers = [
+        fake_container("project", "db", status="Up (health: starting)"),
+        fake_container("project", "web", status="Exited (1) 1 second ago"),
+    ]
+    containers[1]["State"] = "exited"
+    with using_fake_docker_client(containers) as client:
+        started = time.monotonic()
+        with pytest.raises(UnhealthyServices):
+            health_wait(client, "project", ["db", "web"], timeout=5)
+        assert time.monotonic() - started < 1
+
+        # Exited `run` containers are ignored
+        containers[0]["Status"] = "Up (healthy)"
+        containers[1]["Labels"]["com.docker.compose.oneoff"] = "True"
+        containers.append(fake_container("project", "web", 2))
+        assert sorted(
+            health_wait(client, "project", ["db", "web"], timeout=5)
+        ) == ["db", "web"]
+
+
+def test_building():
+    """Dependency-ordered builds test."""
+    dependencies = {"app": ["base"], "base": [], "tool": [], "all": ["app"]}
+    assert building_get_levels(dependencies) == [
+        ["base", "tool"],
+        ["app"],
+        ["all"],
+    ]
+    with pytest.raises(FailedCommandExecution):
+        building_get_levels({"a": ["b"], "b": ["a"]})
+
+    # Dependencies first
+    order = []
+    lock = threading.Lock()
+
+    def _build(node):
+        with lock:
+            order.append(node)
+        return node.upper()
+
+    results = building_run_graph(dependencies, _build, max_workers=2)
+    assert results == {
+        "base": "BASE",
+        "tool": "TOOL",
+        "app": "APP",
+        "all": "ALL",
+    }
+    assert order.index("base") < order.index("app") < order.index("all")
+
+    # Fail fast
+    order.clear()
+    errors = []
+
+    def _fail(node):
+        if node == "base":
+            raise FailedCommandExecution("base")
+        return _build(node)
+
+    with pytest.raises(FailedCommandExecution):
+        building_run_graph(
+            dependencies,
+            _fail,
+            max_workers=1,
+            on_error=lambda node, exc: errors.append(node),
+        )
+    assert "app" not in order
+    assert errors == ["base"]
+
+
+def test_build_cache():
+    """Build cache test."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        project_config_root = os.path.join(project_path, ".docknv")
+        session_file_path = os.path.join(project_config_root, ".docknv.yml")
+
+        os.makedirs(project_config_root)
+        with io_open(session_file_path, mode="w") as handle:
+            handle.write(CONFIG_DATA)
+
+        project = Project.load_from_path(project_path)
+        project.set_current_configuration("config")
+        cache = BuildCache(project)
+        fingerprint = cache.get_fingerprint(
+            os.path.join(project_path, "images", "portainer")
+        )
+
+        # Same context under another tag
+        images = [
+            fake_image(
+                "sha256:1", ["other:1.0"], {FINGERPRINT_LABEL: fingerprint}
+            )
+        ]
+        with using_fake_docker_client([], images=images):
+            image = project.lifecycle.image
+            assert image.build("portainer", "sample", "1.0") == CACHE_RETAG
+            assert images[0]["RepoTags"] == ["other:1.0", "sample:1.0"]
+            assert image.build("portainer", "sample", "1.0") == CACHE_HIT
+
+        # Index
+        index = fingerprint_load_index(fingerprint_get_index_path(project))
+        assert index["images"]["sample:1.0"] == {
+            "fingerprint": fingerprint,
+            "id": "sha256:1",
+        }
+
+        # Compose services, recorded by image ID
+        config = project.database.get_configuration("config")
+        os.makedirs(config.get_path())
+        with io_open(config.get_composefile_path(), mode="w") as handle:
+            handle.write(
+                "services:\n"
+                "  app:\n"
+                "    build:\n"
+                "      context: ./images/portainer\n"
+                "      args: {A: '1'}\n"
+            )
+        builds = caching_get_compose_builds(project, config)
+        assert builds["app"]["tag"] == "sample01_app"
+        assert builds["app"]["build_args"] == ["A=1"]
+
+        images = [fake_image("sha256:2", ["sample01_app:latest"])]
+        with using_fake_docker_client([], images=images) as client:
+            cache = BuildCache(project)
+            app_fingerprint = cache.get_fingerprint(
+                builds["app"]["context"], build_args=["A=1"]
+            )
+            assert (
+                cache.lookup(client, "sample01_app", app_fingerprint)
+                == CACHE_MISS
+            )
+            cache.record(client, "sample01_app", app_fingerprint)
+            cache.save()
+
+            assert project.lifecycle.service.build("app") == CACHE_HIT
+            assert project.lifecycle.config.build() == {"app": CACHE_HIT}
+
+
+def test_build_cache_index():
+    """Build cache index test."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        project_config_root = os.path.join(project_path, ".docknv")
+        session_file_path = os.path.join(project_config_root, ".docknv.yml")
+
+        os.makedirs(project_config_root)
+        with io_open(session_file_path, mode="w") as handle:
+            handle.write(CONFIG_DATA)
+
+        project = Project.load_from_path(project_path)
+        project.set_current_configuration("config")
+        context = os.path.join(project_path, "images", "portainer")
+        dockerfile = os.path.join(context, "Dockerfile")
+        extra = os.path.join(context, "extra.txt")
+        outside = os.path.join(tempdir, "outside.txt")
+        for path in (extra, outside):
+            with io_open(path, mode="w") as handle:
+                handle.write("content")
+
+        # Concurrent fingerprints
+        cache = BuildCache(project)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            fingerprints = set(
+                pool.map(lambda _: cache.get_fingerprint(context), range(8))
+            )
+        assert len(fingerprints) == 1
+        assert {dockerfile, extra} <= cache.index["files"].keys()
+        cache.index["files"][outside] = [0, 0, "hash"]
+        cache.index["files"][outside + ".missing"] = [0, 0, "hash"]
+        cache.save()
+
+        # Hashes of missing files are pruned
+        os.remove(extra)
+        cache = BuildCache(project)
+        cache.get_fingerprint(context)
+        cache.save()
+        index = fingerprint_load_index(fingerprint_get_index_path(project))
+        assert sorted(index["files"]) == sorted([dockerfile, outside])
+
+
+def test_build_cache_dependencies():
+    """Build cache test, with local base images."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        project_config_root = os.path.join(project_path, ".docknv")
+        os.makedirs(project_config_root)
+        with io_open(
+            os.path.join(project_config_root, ".docknv.yml"), mode="w"
+        ) as handle:
+            handle.write(CONFIG_DATA)
+
+        os.makedirs(os.path.join(project_path, "images", "child"))
+        path = os.path.join(project_path, "images", "child", "Dockerfile")
+        with io_open(path, mode="w") as handle:
+            handle.write("FROM portainer\n")
+
+        project = Project.load_from_path(project_path)
+        images = []
+        built = []
+
+        def _build(args, **kwargs):
+            tag = args[args.index("-t") + 1]
+            label = args[args.index("--label") + 1].split("=", 1)[1]
+            for image in images:
+                if tag in image["RepoTags"]:
+                    image["RepoTags"].remove(tag)
+            images.append(
+                fake_image(
+                    f"sha256:{len(images)}", [tag], {FINGERPRINT_LABEL: label}
+                )
+            )
+            built.append(tag)
+
+        with mock.patch(
+            "docknv.lifecycle.building.exec_process", side_effect=_build
+        ):
+            with using_fake_docker_client([], images=images):
+                build_all = project.lifecycle.image.build_all
+                assert set(build_all().values()) == {CACHE_MISS}
+                assert built.index("portainer:latest") < built.index(
+                    "child:latest"
+                )
+                assert set(build_all().values()) == {CACHE_HIT}
+
+                # Parent rebuild invalidates its child
+                path = os.path.join(project_path, "images", "portainer", "a")
+                with io_open(path, mode="w") as handle:
+                    handle.write("changed")
+                built.clear()
+                assert build_all() == {
+                    "hello-world": CACHE_HIT,
+                    "portainer": CACHE_MISS,
+                    "child": CACHE_MISS,
+                }
+                assert built == ["portainer:latest", "child:latest"]
+                assert set(build_all().values()) == {CACHE_HIT}
+
+                # Single builds, with the same fingerprints
+                build = project.lifecycle.image.build
+                assert build("child", "child", "latest") == CACHE_HIT
+                with io_open(path, mode="w") as handle:
+                    handle.write("changed again")
+                built.clear()
+                with mock.patch(
+                    "docknv.lifecycle.models.exec_docker",
+                    side_effect=lambda _path, args, **kwargs: _build(args),
+                ):
+                    for name in ("portainer", "child"):
+                        assert build(name, name, "latest") == CACHE_MISS
+                    assert build("child", "child", "latest") == CACHE_HIT
+                assert built == ["portainer:latest", "child:latest"]
+
+
+def test_build_planning():
+    """Multi-configuration build planning test."""
+    assert planning_get_key("a", None, ["A=1", "B"]) == planning_get_key(
+        "./a", "Dockerfile", ["B", "A=0", "A=1"]
+    )
+
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        project_config_root = os.path.join(project_path, ".docknv")
+        session_file_path = os.path.join(project_config_root, ".docknv.yml")
+
+        os.makedirs(project_config_root)
+        with io_open(session_file_path, mode="w") as handle:
+            handle.write(CONFIG_DATA)
+
+        os.makedirs(os.path.join(project_path, "images", "tool"))
+        path = os.path.join(project_path, "images", "tool", "Dockerfile")
+        with io_open(path, mode="w") as handle:
+            handle.write("FROM org/app:${VERSION}\n")
+
+        project = Project.load_from_path(project_path)
+        project.set_current_configuration("config")
+        composefiles = {
+            "config": (
+                "services:\n"
+                "  app:\n"
+                "    image: org/app\n"
+                "    build: {context: ./images/portainer, args: [A=1, B=2]}\n"
+                "  tool:\n"
+                "    image: org/tool\n"
+                "    build: ./images/tool\n"
+            ),
+            "config2": (
+                "services:\n"
+                "  pouet_app:\n"
+                "    image: org/app-2\n"
+                "    build: {context: images/portainer, args: {B: 2, A: 1}}\n"
+            ),
+        }
+        configs = []
+        for name, content in composefiles.items():
+            config = project.database.get_configuration(name)
+            os.makedirs(config.get_path())
+            with io_open(config.get_composefile_path(), mode="w") as handle:
+                handle.write(content)
+            configs.append(config)
+
+        # Identical builds are deduplicated
+        targets = planning_get_targets(project, configs)
+        assert [target.tags for target in targets] == [
+            ["org/app", "org/app-2"],
+            ["org/tool"],
+        ]
+        assert targets[0].services == [
+            ("config", "app"),
+            ("config2", "pouet_app"),
+        ]
+        assert planning_get_dependencies(targets) == {0: [], 1: [0]}
+
+        # One build per target, tagged for each service
+        commands = []
+        with mock.patch(
+            "docknv.lifecycle.building.exec_process",
+            side_effect=lambda args, **kwargs: commands.append(args),
+        ):
+            statuses = project.lifecycle.config.build(
+                ["config", "config2"], dry_run=True
+            )
+            assert statuses == {
+                "app": CACHE_MISS,
+                "pouet_app": CACHE_MISS,
+                "tool": CACHE_MISS,
+            }
+            assert len(commands) == 2
+            tags = [
+                commands[0][i + 1]
+                for i, arg in enumerate(commands[0])
+                if arg == "-t"
+            ]
+            assert tags == ["org/app", "org/app-2"]
+
+            # Tags of new consumers, from an existing image
+            fingerprint = BuildCache(project).get_fingerprint(
+                targets[0].context, build_args=targets[0].build_args
+            )
+            images = [
+                fake_image(
+                    "sha256:1",
+                    ["org/app:latest"],
+                    {FINGERPRINT_LABEL: fingerprint},
+                )
+            ]
+            commands.clear()
+            with using_fake_docker_client([], images=images):
+                statuses = project.lifecycle.config.build(all_configs=True)
+            assert statuses["pouet_app"] == CACHE_RETAG
+            assert statuses["tool"] == CACHE_MISS
+            assert images[0]["RepoTags"] == [
+                "org/app:latest",
+                "org/app-2:latest",
+            ]
+            assert len(commands) == 1
+
+
+def test_build_planning_stages():
+    """Builds of other stages of one Dockerfile test."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        project_config_root = os.path.join(project_path, ".docknv")
+        session_file_path = os.path.join(project_config_root, ".docknv.yml")
+
+        os.makedirs(project_config_root)
+        with io_open(session_file_path, mode="w") as handle:
+            handle.write(CONFIG_DATA)
+
+        os.makedirs(os.path.join(project_path, "images", "stages"))
+        path = os.path.join(project_path, "images", "stages", "Dockerfile")
+        with io_open(path, mode="w") as handle:
+            handle.write(
+                "FROM debian:12 AS base\n"
+                "FROM base AS dev\n"
+                "FROM base AS prod\n"
+            )
+
+        project = Project.load_from_path(project_path)
+        project.set_current_configuration("config")
+        config = project.database.get_configuration("config")
+        os.makedirs(config.get_path())
+        with io_open(config.get_composefile_path(), mode="w") as handle:
+            handle.write(
+                "services:\n"
+                "  dev:\n"
+                "    image: org/dev\n"
+                "    build: {context: ./images/stages, target: dev}\n"
+                "  prod:\n"
+                "    image: org/prod\n"
+                "    build:\n"
+                "      context: ./images/stages\n"
+                "      target: prod\n"
+                "      cache_from: [org/prod]\n"
+                "      network: host\n"
+                "      labels: {b: 2, a: 1}\n"
+                "      extra_hosts: [db:10.0.0.1]\n"
+                "      shm_size: 64m\n"
+            )
+
+        builds = caching_get_compose_builds(project, config)
+        assert builds["dev"]["build_options"] == ["--target", "dev"]
+        assert builds["prod"]["build_options"] == [
+            "--target",
+            "prod",
+            "--cache-from",
+            "org/prod",
+            "--network",
+            "host",
+            "--label",
+            "a=1",
+            "--label",
+            "b=2",
+            "--add-host",
+            "db:10.0.0.1",
+            "--shm-size",
+            "64m",
+        ]
+
+        # One target per stage, with its own fingerprint
+        targets = planning_get_targets(project, [config])
+        assert [target.tags for target in targets] == [
+            ["org/dev"],
+            ["org/prod"],
+        ]
+        cache = BuildCache(project)
+        fingerprints = [
+            cache.get_fingerprint(
+                target.context,
+                build_args=target.build_args,
+                build_options=target.build_options,
+            )
+            for target in targets
+        ]
+        assert fingerprints[0] != fingerprints[1]
+
+        commands = []
+        with mock.patch(
+            "docknv.lifecycle.building.exec_process",
+            side_effect=lambda args, **kwargs: commands.append(args),
+        ):
+            project.lifecycle.config.build("config", dry_run=True)
+        stages = {
+            command[command.index("-t") + 1]: command[
+                command.index("--target") + 1
+            ]
+            for command in commands
+        }
+        assert stages == {"org/dev": "dev", "org/prod": "prod"}
@@ -1,14 +1,26 @@
 """Logger tests."""
 
+import json
+import os
+
 import pytest
 
 from docknv.tests.mocking import using_temporary_stdout
-from docknv.logger import Logger, Fore, LoggerError
+from docknv.logger import (
+    FileHandler,
+    Fore,
+    JSONLinesHandler,
+    Logger,
+    LoggerError,
+    StreamHandler,
+    Style,
+)
+from docknv.tests.utils import using_temporary_directory
 
 import six
 
 
-def test_log():
+def test_log(monkeypatch):
     """Simple logger tests."""
     with using_temporary_stdout() as stdout:
         # Info
@@ -30,11 +42,18 @@ def test_log():
         Logger.raw("Pouet pouet")
         assert stdout.getvalue().endswith("\n"), "Should end with a newline"
 
+    with using_temporary_stdout() as stdout:
+        Logger.raw("Pouet", color=Fore.BLUE)
+        Logger.raw(f"{Fore.RED}Pouet{Style.RESET_ALL}")
+        assert stdout.getvalue() == "Pouet\nPouet\n", "Should not be colored"
+
+    monkeypatch.setenv("FORCE_COLOR", "1")
     with using_temporary_stdout() as stdout:
         Logger.raw("Pouet", color=Fore.BLUE)
         assert stdout.getvalue().startswith(
             "\x1b[34m"
         ), "Should start with blue color"
+    monkeypatch.delenv("FORCE_COLOR")
 
     with using_temporary_stdout() as stdout:
         Logger.raw("Pouet pouet", linebreak=False)
@@ -57,3 +76,55 @@ def test_log():
         Logger.error("Pouet", crash=False)
         with pytest.raises(LoggerError):
             Logger.error("Pouet", crash=True)
+
+
+def test_log_handlers():
+    """Logger handlers tests."""
+    handlers = Logger.handlers
+    level = Logger.get_log_level()
+
+    with using_temporary_directory() as tempdir:
+        log_path = os.path.join(tempdir, "docknv.log")
+        json_path = os.path.join(tempdir, "docknv.jsonl")
+        stream = StreamHandler(buffer_size=16)
+        writes = []
+        stream.write = writes.append
+        Logger.set_handlers(
+            [stream, FileHandler(log_path), JSONLinesHandler(json_path)]
+        )
+        Logger.set_log_level("INFO")
+
+        try:
+            # Level checks
+            Logger.debug("Hidden")
+            assert not Logger.is_enabled("DEBUG")
+            assert Logger.is_enabled("WARN")
+            assert writes == []
+
+            # Batched writes
+            with Logger.batch():
+                Logger.raw("a")
+                Logger.raw("b")
+                assert writes == []
+                Logger.raw("c" * 16)
+                assert writes == ["a\nb\n" + "c" * 16 + "\n"]
+                Logger.raw("d")
+            assert writes[1:] == ["d\n"]
+
+            Logger.info(f"{Fore.RED}Shown")
+            assert writes[2].endswith("[INFO] Shown\n")
+        finally:
+            Logger.set_handlers(handlers)
+            Logger.set_log_level(level)
+
+        with open(log_path) as handle:
+            lines = handle.read().splitlines()
+        assert lines[:4] == ["a", "b", "c" * 16, "d"]
+        assert lines[4].endswith("[INFO] Shown")
+
+        # Log records only
+        with open(json_path) as handle:
+            records = [json.loads(line) for line in handle]
+        assert len(records) == 1
+        assert records[0]["level"] == "INFO"
+        assert records[0]["message"] == "Shown"
@@ -21,9 +21,14 @@ def test_project():
 
         # Project load
         proj = Project.load_from_path(project_path)
-        repr(proj)
         assert len(proj.schemas) == 2
 
+        # Images are discovered on first access
+        assert proj._images is None
+        repr(proj)
+        assert "portainer" in proj.images.images
+        assert proj.images is proj.images
+
         # Ensure current config
         with pytest.raises(MissingActiveConfiguration):
             proj.ensure_current_configuration()
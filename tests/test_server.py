@@ -0,0 +1,196 @@
+"""Server tests."""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import docknv.server.models as server_models
+from docknv.server import (
+    InsecureSocketDirectory,
+    Server,
+    ServerClient,
+    server_check_socket_dir,
+    server_get_peer_uid,
+    server_get_project_fingerprint,
+    server_get_socket_path,
+    server_parse_command_line,
+)
+
+from docknv.tests.utils import using_temporary_directory, copy_sample
+
+
+def _docknv(args, **kwargs):
+    code = (
+        "import sys\n"
+        "from docknv.shell.main import docknv_entry_point\n"
+        f"sys.argv = ['docknv'] + {args!r}\n"
+        "docknv_entry_point()\n"
+    )
+    return subprocess.Popen(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+        **kwargs,
+    )
+
+
+def test_server_command_line():
+    """Command line parsing."""
+    assert server_parse_command_line([]) == (".", None)
+    assert server_parse_command_line(["config", "ls"]) == (".", "config")
+    assert server_parse_command_line(
+        ["-v", "-p", "/tmp/project", "--dry-run", "config", "-p", "other"]
+    ) == ("/tmp/project", "config")
+    assert server_parse_command_line(["--project=/a", "serve"]) == (
+        "/a",
+        "serve",
+    )
+    assert server_parse_command_line(["-p/b", "env"]) == ("/b", "env")
+
+
+def test_server_socket_path(monkeypatch):
+    """Socket path."""
+    monkeypatch.delenv("DOCKNV_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", "/run/user/1000")
+
+    path = server_get_socket_path("/tmp/project")
+    assert path.startswith(f"/run/user/1000/docknv-{os.getuid()}/")
+    assert path == server_get_socket_path("/tmp/../tmp/project")
+    assert path != server_get_socket_path("/tmp/other")
+
+    monkeypatch.setenv("DOCKNV_SOCKET", "/tmp/docknv.sock")
+    assert server_get_socket_path("/tmp/project") == "/tmp/docknv.sock"
+
+
+def test_server_socket_dir():
+    """Socket directories must be private."""
+    with using_temporary_directory() as tempdir:
+        socket_dir = os.path.join(tempdir, "sockets")
+        socket_path = os.path.join(socket_dir, "docknv.sock")
+        assert not server_check_socket_dir(socket_dir)
+
+        os.makedirs(socket_dir, mode=0o700)
+        assert server_check_socket_dir(socket_dir)
+
+        link_path = os.path.join(tempdir, "link")
+        os.symlink(socket_dir, link_path)
+        assert not server_check_socket_dir(link_path)
+
+        # Pre-created by someone else, or shared
+        os.chmod(socket_dir, 0o755)
+        assert not server_check_socket_dir(socket_dir)
+        with pytest.raises(InsecureSocketDirectory):
+            Server(tempdir, socket_path)._bind()
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            listener.bind(socket_path)
+            listener.listen(1)
+            client = ServerClient(socket_path)
+            assert client.forward(["docknv"], tempdir, {"A": "1"}) is None
+        finally:
+            listener.close()
+
+    left, right = socket.socketpair(socket.AF_UNIX)
+    with left, right:
+        assert server_get_peer_uid(left) == os.getuid()
+
+
+def test_server_reset_output(monkeypatch):
+    """Streams are rewrapped when they cannot be reconfigured."""
+
+    class _Stream(object):
+        encoding = "utf-8"
+        errors = "strict"
+
+        def __init__(self, handle):
+            self.handle = handle
+
+        def fileno(self):
+            return self.handle.fileno()
+
+        def isatty(self):
+            return False
+
+        def flush(self):
+            self.handle.flush()
+
+    with using_temporary_directory() as tempdir:
+        path = os.path.join(tempdir, "output.txt")
+        with open(path, mode="w") as handle:
+            monkeypatch.setattr(sys, "stdout", _Stream(handle))
+            monkeypatch.setattr(sys, "stderr", _Stream(handle))
+            server_models._reset_output()
+
+            sys.stdout.write("out\n")
+            sys.stderr.write("err\n")
+            monkeypatch.undo()
+
+        with open(path, mode="r") as handle:
+            assert handle.read() == "out\nerr\n"
+
+
+def test_server_fingerprint():
+    """Project fingerprint."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        fingerprint = server_get_project_fingerprint(project_path, "test")
+        assert fingerprint == server_get_project_fingerprint(
+            project_path, "test"
+        )
+
+        env_path = os.path.join(project_path, "envs", "new.env.yml")
+        with open(env_path, mode="w") as handle:
+            handle.write("environment:\n  VALUE: 1\n")
+
+        assert fingerprint != server_get_project_fingerprint(
+            project_path, "test"
+        )
+
+
+def test_server():
+    """Forward commands to a server."""
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        socket_path = os.path.join(tempdir, "docknv.sock")
+        env = dict(os.environ, DOCKNV_SOCKET=socket_path)
+
+        server = _docknv(["-p", project_path, "serve"], env=env)
+        try:
+            for _ in range(100):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(0.1)
+            assert os.path.exists(socket_path)
+
+            def run(args):
+                proc = _docknv(["-p", project_path] + args, env=env)
+                output, _ = proc.communicate(timeout=30)
+                return proc.returncode, output
+
+            assert run(["config", "create", "toto", "-e", "default"])[0] == 0
+
+            # Database changed: project is reloaded
+            code, output = run(["config", "ls"])
+            assert code == 0
+            assert "Configuration 'toto'" in output
+            assert "ignoring server socket" not in output
+
+            code, output = run(["config", "set", "unknown"])
+            assert code == 1
+            assert "MissingConfiguration" in output
+
+            # Same socket
+            proc = _docknv(["-p", project_path, "serve"], env=env)
+            output, _ = proc.communicate(timeout=30)
+            assert "already listening" in output
+        finally:
+            server.terminate()
+            server.communicate(timeout=30)
+
+        assert not os.path.exists(socket_path)
@@ -1,10 +1,17 @@
 """Shell tests."""
 
+import json
+import os
+import subprocess
+import sys
+
 import pytest
 
+from docknv.logger import LoggerError
 from docknv.shell import Shell
+from docknv.shell.custom import custom_load_manifest
 
-from docknv.utils.ioutils import NoEditorFound
+from docknv.utils.ioutils import io_open, NoEditorFound
 
 from docknv.tests.mocking import mock_input
 from docknv.tests.utils import using_temporary_directory, copy_sample
@@ -82,9 +89,60 @@ def test_shell():
 
         run_shell(["config", "status"])
         run_shell(["config", "update"])
+        run_shell(["config", "regenerate"])
+        run_shell(["config", "regenerate", "--all", "-w", "2"])
         run_shell(["config", "ls"])
+        run_shell(["config", "ls", "--format", "json"])
+
+        # Log handlers
+        log_path = os.path.join(tempdir, "docknv.jsonl")
+        run_shell(
+            [
+                "--log-file",
+                log_path,
+                "--log-format",
+                "json",
+                "--log-stderr",
+                "config",
+                "ls",
+            ]
+        )
+        with io_open(log_path, mode="r") as handle:
+            assert '"level": "INFO"' in handle.read()
+
+        # Event log
+        events_path = os.path.join(tempdir, "events.jsonl")
+        run_shell(["--events", events_path, "config", "start"])
+        run_shell(["--events", events_path, "service", "stop", "portainer"])
+        with io_open(events_path, mode="r") as handle:
+            events = [json.loads(line) for line in handle]
+        operations = [
+            event["operation"]
+            for event in events
+            if event["type"] == "operation"
+        ]
+        assert operations == [
+            "config.start",
+            "command.config.start",
+            "service.stop",
+            "command.service.stop",
+        ]
+        assert events[-2]["services"] == ["portainer"]
+        assert events[-2]["parent"] == "command.service.stop"
+        assert events[-2]["dry_run"] is True
+        run_shell(["stats", events_path])
+        run_shell(["stats", events_path, "-o", "^service", "--calls"])
+        run_shell(["stats", events_path, "--format", "json"])
+        with pytest.raises(LoggerError):
+            run_shell(["stats", os.path.join(tempdir, "missing.jsonl")])
+        run_shell(["config", "ls"])
+        run_shell(["config", "status", "--format", "yaml"])
         run_shell(["config", "build"])
         run_shell(["config", "ps"])
+        run_shell(["config", "ps", "--format", "json"])
+        run_shell(["config", "start", "--wait", "--timeout", "10"])
+        run_shell(["config", "logs", "-f", "--since", "10m", "-g", "error"])
+        run_shell(["config", "logs", "--all", "-S", "portainer", "-t", "10"])
 
         ########
         # Service
@@ -101,6 +159,15 @@ def test_shell():
         run_shell(["service", "logs", "portainer"])
         run_shell(["service", "push", "portainer", "./a", "/b"])
         run_shell(["service", "pull", "portainer", "/a", "./b"])
+        run_shell(["service", "push", "portainer", "./a", "/b", "-a"])
+        run_shell(["service", "pull", "portainer", "/a", "./b", "-r", "2"])
+
+        #######
+        # Images
+
+        run_shell(["images", "ls"])
+        run_shell(["images", "build", "portainer", "portainer", "latest"])
+        run_shell(["images", "build", "--all", "-P", "sample/", "-w", "2"])
 
         #######
         # Env
@@ -158,6 +225,50 @@ def test_shell():
             run_shell(["machine", "restart", "portainer"])
 
 
+def test_profile():
+    """Profile flag."""
+    shell = Shell()
+
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        trace_path = os.path.join(tempdir, "trace.json")
+
+        shell.run(
+            [
+                "--project",
+                project_path,
+                "--profile",
+                "--profile-format",
+                "chrome",
+                "--profile-output",
+                trace_path,
+                "config",
+                "create",
+                "toto",
+                "-e",
+                "default",
+                "-S",
+                "portainer",
+                "-V",
+                "portainer",
+            ]
+        )
+
+        with open(trace_path) as handle:
+            names = {
+                event["name"] for event in json.load(handle)["traceEvents"]
+            }
+        for name in (
+            "command.config",
+            "project.load",
+            "environment.load",
+            "compose.merge",
+            "render",
+            "resolve",
+        ):
+            assert name in names
+
+
 def test_commands():
     """Commands."""
     shell = Shell()
@@ -191,3 +302,101 @@ def test_commands():
         )
 
         run_shell(["custom", "notebook", "password"])
+
+
+def test_commands_discovery():
+    """Custom commands discovery."""
+    shell = Shell()
+
+    with using_temporary_directory() as tempdir:
+        project_path = copy_sample("sample01", tempdir)
+        commands_path = os.path.join(project_path, "commands")
+        for i in range(100):
+            with open(os.path.join(commands_path, f"cmd{i}.py"), "w") as f:
+                f.write(
+                    "def pre_parse(shell):\n"
+                    f"    shell.subparsers.add_parser('cmd{i}', help='{i}')\n"
+                    "def post_parse(shell, args, project, config):\n"
+                    "    pass\n"
+                )
+
+        def run_custom(args):
+            for name in list(sys.modules):
+                if name.startswith("docknv_custom_"):
+                    del sys.modules[name]
+
+            shell.run(["--project", project_path, "custom"] + args)
+            return sorted(
+                name for name in sys.modules if name.startswith("docknv_")
+            )
+
+        # Loading does not create the project folder
+        assert len(custom_load_manifest(project_path)) == 100
+        assert not os.path.exists(os.path.join(project_path, ".docknv"))
+
+        # First run discovers every command
+        assert len(run_custom(["cmd5"])) == 100
+        manifest = custom_load_manifest(project_path)
+        assert len(manifest) == 100
+        assert manifest["cmd5.py"]["commands"] == [
+            {"name": "cmd5", "help": "5"}
+        ]
+
+        # Next runs only load the selected command
+        assert run_custom(["cmd5"]) == ["docknv_custom_cmd5"]
+        assert run_custom(["cmd42"]) == ["docknv_custom_cmd42"]
+
+        # Changed files are discovered again
+        with open(os.path.join(commands_path, "cmd7.py"), "w") as f:
+            f.write(
+                "def pre_parse(shell):\n"
+                "    shell.subparsers.add_parser('seven')\n"
+                "def post_parse(shell, args, project, config):\n"
+                "    pass\n"
+            )
+        assert run_custom(["seven"]) == ["docknv_custom_cmd7"]
+        with pytest.raises(SystemExit):
+            run_custom(["cmd7"])
+
+
+def _get_imported_modules(args, tempdir):
+    path = os.path.join(tempdir, "modules.json")
+    code = (
+        "import json, sys\n"
+        "from docknv.shell.main import docknv_entry_point\n"
+        f"sys.argv = ['docknv'] + {args!r}\n"
+        "try:\n"
+        "    docknv_entry_point()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"with open({path!r}, 'w') as handle:\n"
+        "    json.dump(sorted(sys.modules), handle)\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+
+    with io_open(path, mode="r") as handle:
+        return json.load(handle)
+
+
+def test_startup_imports():
+    """Heavy modules are not imported at startup."""
+    heavy_modules = ("docker", "jinja2", "yaml", "slugify", "colorama")
+
+    with using_temporary_directory() as tempdir:
+        modules = _get_imported_modules(["--help"], tempdir)
+        assert "docknv.shell.main" in modules
+        for module in heavy_modules + ("docknv.project",):
+            assert module not in modules
+
+        project_path = copy_sample("sample01", tempdir)
+        modules = _get_imported_modules(
+            ["-p", project_path, "config", "ls"], tempdir
+        )
+        assert "docknv.shell.common" in modules
+        for module in ("docker", "jinja2", "slugify"):
+            assert module not in modules
@@ -12,10 +12,11 @@ from docknv.project import Project
 from docknv.template import (
     MissingTemplate,
     MalformedTemplate,
+    RENDER_CHUNK_SIZE,
+    renderer_render_compose_template,
     renderer_render_template,
 )
 
-
 CONFIG_DATA = """\
 config:
     services: ["portainer", "pouet"]
@@ -55,3 +56,32 @@ def test_template():
         # Malformed template file
         with pytest.raises(MalformedTemplate):
             renderer_render_template("toto.sh", config)
+
+
+def test_render_compose_template():
+    """Compose rendering, by chunks or as one document."""
+    count = RENDER_CHUNK_SIZE * 2 + 10
+    services = {
+        f"svc{i}": {"image": "{{ repo }}/svc%d" % i} for i in range(count)
+    }
+    output = renderer_render_compose_template(
+        {"version": "3", "services": services}, {"repo": "org"}
+    )
+    assert sorted(output["services"]) == sorted(services)
+    assert output["services"][f"svc{count - 1}"]["image"] == (
+        f"org/svc{count - 1}"
+    )
+
+    # Macro defined in the first service, used by every service
+    services = {
+        f"svc{i}": {"image": '{{ image("svc%d") }}' % i} for i in range(count)
+    }
+    macro = "{% macro image(name) %}{{ repo }}/{{ name }}{% endmacro %}"
+    services["svc0"]["command"] = macro
+    output = renderer_render_compose_template(
+        {"services": services}, {"repo": "org"}
+    )
+    images = {
+        name: service["image"] for name, service in output["services"].items()
+    }
+    assert images == {f"svc{i}": f"org/svc{i}" for i in range(count)}
@@ -1,12 +1,46 @@
 """Utils tests."""
 
+import io
+import json
 import os
+import pstats
+import socket
+import tarfile
+import threading
+import tracemalloc
+
+import pytest
 
 from docknv.tests.mocking import mock_input
 from docknv.tests.utils import using_temporary_directory
 
+from docknv.logger import EventHandler, Logger
+from docknv.utils.archive import (
+    archive_extract_stream,
+    archive_list_entries,
+    archive_stream,
+)
+from docknv.utils.events import (
+    evented,
+    events_get_percentile,
+    events_get_stats,
+    events_is_active,
+    events_load,
+    events_start,
+    events_stop,
+    using_operation,
+)
 from docknv.utils.prompt import prompt_yes_no
 from docknv.utils.paths import create_path_tree, get_lower_basename
+from docknv.utils.timing import using_timer
+from docknv.utils.tracing import (
+    traced,
+    tracer_get_current,
+    tracer_parse_setting,
+    tracer_start,
+    tracer_stop,
+    using_span,
+)
 
 
 def test_prompt_yes_no():
@@ -44,3 +78,297 @@ def test_get_lower_basename():
         )
     else:
         assert get_lower_basename("/hello/Folder/FolderName") == "foldername"
+
+
+def test_tracing(monkeypatch):
+    """Tracing."""
+
+    @traced("double")
+    def double(value):
+        return value * 2
+
+    # Not tracing
+    assert tracer_get_current() is None
+    with using_span("noop"):
+        assert double(2) == 4
+
+    assert tracer_parse_setting("1") == ("summary", None)
+    assert tracer_parse_setting("chrome:/tmp/out.json") == (
+        "chrome",
+        "/tmp/out.json",
+    )
+
+    with using_temporary_directory() as tempdir:
+        # Summary
+        tracer = tracer_start()
+        for _ in range(3):
+            double(1)
+        with using_timer(None, "stage"):
+            pass
+        assert tracer_stop() is tracer
+        assert tracer_get_current() is None
+
+        summary = {row[0]: row[1:] for row in tracer.get_summary()}
+        assert summary["double"][0] == 3
+        assert summary["stage"][0] == 1
+        assert len(tracer.format_summary()) == 3
+
+        # Chrome trace
+        trace_path = os.path.join(tempdir, "trace.json")
+        tracer_start("chrome", trace_path)
+        with using_span("outer", path="/tmp"):
+            double(1)
+        tracer_stop()
+
+        with open(trace_path) as handle:
+            events = json.load(handle)["traceEvents"]
+        assert [event["name"] for event in events] == ["double", "outer"]
+        assert events[1]["args"] == {"path": "/tmp"}
+        assert events[1]["dur"] >= events[0]["dur"]
+
+        # cProfile
+        profile_path = os.path.join(tempdir, "docknv.prof")
+        tracer_start("cprofile", profile_path)
+        double(1)
+        tracer_stop()
+        assert pstats.Stats(profile_path).total_calls > 0
+
+    # Memory
+    tracer = tracer_start("memory")
+    with using_span("outer"):
+        with using_timer(None, "stage"):
+            data = [str(i) * 10 for i in range(10000)]
+        del data
+    tracer_stop()
+
+    usage = {span.name: span.memory for span in tracer.spans}
+    assert usage["stage"].peak > 100000
+    assert usage["stage"].top
+    assert usage["outer"].peak >= usage["stage"].peak
+    assert usage["outer"].allocated < usage["stage"].allocated
+    assert usage["outer"].rss > 0
+    assert tracer.format_summary()[0].split()[:3] == ["span", "count", "alloc"]
+
+    # Peaks cannot be reset before Python 3.9
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    tracer = tracer_start("memory")
+    with using_span("outer"):
+        data = [str(i) * 10 for i in range(10000)]
+        del data
+    tracer_stop()
+    assert tracer.spans[0].memory.peak > 100000
+
+
+def test_events():
+    """Event log."""
+
+    class Lifecycle(object):
+        project = None
+
+        @evented("service.start")
+        def start(self, service_names, config_name=None, dry_run=False):
+            with using_span("docker.start", category="docker"):
+                Logger.info("starting")
+            return service_names
+
+    lifecycle = Lifecycle()
+
+    # Not started
+    assert not events_is_active()
+    with using_operation("noop") as operation:
+        assert operation is None
+    assert lifecycle.start(["a"]) == ["a"]
+
+    with using_temporary_directory() as tempdir:
+        path = os.path.join(tempdir, "events.jsonl")
+        events_start(path)
+        assert events_is_active()
+        Logger.add_handler(EventHandler())
+        try:
+            with using_operation("command.service.start", project=tempdir):
+                lifecycle.start(["a", "b"], config_name="dev", dry_run=True)
+            with pytest.raises(ValueError):
+                with using_operation("command.fail"):
+                    raise ValueError("oops")
+            with using_span("orphan"):
+                pass
+        finally:
+            Logger.set_handlers(
+                [
+                    handler
+                    for handler in Logger.handlers
+                    if not isinstance(handler, EventHandler)
+                ]
+            )
+            events_stop()
+
+        assert not events_is_active()
+        with open(path, mode="a") as handle:
+            handle.write("{truncated\n")
+
+        events = events_load(path)
+        assert [event["type"] for event in events] == [
+            "log",
+            "operation",
+            "operation",
+            "operation",
+            "call",
+        ]
+        log, start, command, fail, call = events
+        assert log["operation"] == "service.start"
+        assert log["message"] == "starting"
+        assert start["parent"] == "command.service.start"
+        assert start["config"] == "dev"
+        assert start["services"] == ["a", "b"]
+        assert start["dry_run"] is True
+        assert [c["name"] for c in start["calls"]] == ["docker.start"]
+        assert command["project"] == tempdir
+        assert command["outcome"] == "ok"
+        assert command["duration"] >= start["duration"]
+        assert fail["outcome"] == "error"
+        assert fail["error"] == "ValueError: oops"
+        assert call["name"] == "orphan"
+
+        stats = {row["name"]: row for row in events_get_stats(events)}
+        assert stats["command.fail"]["errors"] == 1
+        assert stats["service.start"]["count"] == 1
+        calls = events_get_stats(events, calls=True)
+        assert [row["name"] for row in calls] == ["docker.start"]
+
+        # Unix socket
+        socket_path = os.path.join(tempdir, "events.sock")
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(socket_path)
+        server.listen(1)
+        received = []
+
+        def _accept():
+            connection, _ = server.accept()
+            with connection:
+                while True:
+                    data = connection.recv(4096)
+                    if not data:
+                        break
+                    received.append(data)
+
+        thread = threading.Thread(target=_accept)
+        thread.start()
+        events_start(f"unix:{socket_path}")
+        with using_operation("remote"):
+            pass
+        events_stop()
+        thread.join(5)
+        server.close()
+
+        event = json.loads(b"".join(received))
+        assert event["operation"] == "remote"
+
+    values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert events_get_percentile([], 50) is None
+    assert events_get_percentile(values, 50) == 5
+    assert events_get_percentile(values, 90) == 9
+    assert events_get_percentile(values, 99) == 10
+    assert events_get_percentile([3], 1) == 3
+
+
+def test_archive():
+    """Streamed archives."""
+    with using_temporary_directory() as tempdir:
+        source = os.path.join(tempdir, "source")
+        os.makedirs(os.path.join(source, "sub"))
+        with open(os.path.join(source, "sub", "big.bin"), mode="wb") as f:
+            f.write(os.urandom(300000))
+        with open(os.path.join(source, "a.txt"), mode="w") as handle:
+            handle.write("a")
+
+        entries = list(archive_list_entries(source, "root"))
+        assert [name for _, name in entries] == [
+            "root",
+            "root/sub",
+            "root/a.txt",
+            "root/sub/big.bin",
+        ]
+
+        for compression in (None, "gz", "xz"):
+            output = os.path.join(tempdir, f"output-{compression}")
+            os.makedirs(output)
+            chunks = list(
+                archive_stream(entries, compression, chunk_size=10000)
+            )
+            if compression is None:
+                assert len(chunks) > 30
+
+            assert archive_extract_stream(iter(chunks), output) == 4
+            with open(
+                os.path.join(output, "root", "sub", "big.bin"), "rb"
+            ) as f:
+                with open(os.path.join(source, "sub", "big.bin"), "rb") as g:
+                    assert f.read() == g.read()
+
+        # Rename
+        output = os.path.join(tempdir, "renamed")
+        os.makedirs(output)
+        archive_extract_stream(
+            archive_stream(entries), output, rename=("root", "other")
+        )
+        assert os.path.isfile(os.path.join(output, "other", "a.txt"))
+
+        # Consumer stopping early
+        stream = archive_stream(entries, chunk_size=512)
+        next(stream)
+        stream.close()
+
+
+@pytest.mark.parametrize("native_filter", [True, False])
+def test_archive_traversal(monkeypatch, native_filter):
+    """Streamed archives, with members out of the destination."""
+    if not native_filter:
+        monkeypatch.delattr(tarfile, "data_filter", raising=False)
+    elif not hasattr(tarfile, "data_filter"):
+        pytest.skip("no extraction filters")
+
+    def _archive(*members):
+        output = io.BytesIO()
+        with tarfile.open(fileobj=output, mode="w") as tar:
+            for name, kind, linkname in members:
+                info = tarfile.TarInfo(name)
+                info.type = kind
+                info.linkname = linkname
+                data = b"evil" if kind == tarfile.REGTYPE else b""
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        return [output.getvalue()]
+
+    with using_temporary_directory() as tempdir:
+        destination = os.path.join(tempdir, "destination")
+        os.makedirs(destination)
+
+        unsafe = [
+            [("../evil", tarfile.REGTYPE, "")],
+            [("link", tarfile.SYMTYPE, "../")],
+            [("link", tarfile.SYMTYPE, tempdir)],
+            [("hard", tarfile.LNKTYPE, "../evil")],
+            [("fifo", tarfile.FIFOTYPE, "")],
+        ]
+        for members in unsafe:
+            with pytest.raises(tarfile.TarError):
+                archive_extract_stream(_archive(*members), destination)
+
+        # Absolute paths are refused, or extracted in the destination
+        chunks = _archive((os.path.join(tempdir, "evil"), tarfile.REGTYPE, ""))
+        try:
+            archive_extract_stream(chunks, destination)
+        except tarfile.TarError:
+            pass
+        assert os.listdir(tempdir) == ["destination"]
+
+        # Links in the destination
+        chunks = _archive(
+            ("root", tarfile.DIRTYPE, ""),
+            ("root/a.txt", tarfile.REGTYPE, ""),
+            ("root/link", tarfile.SYMTYPE, "a.txt"),
+        )
+        assert archive_extract_stream(chunks, destination) == 3
+        assert os.readlink(os.path.join(destination, "root", "link")) == (
+            "a.txt"
+        )
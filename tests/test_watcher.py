@@ -0,0 +1,296 @@
+"""Watcher tests."""
+
+import os
+from unittest import mock
+
+import pytest
+
+from docknv.compose import ComposeDefinition
+from docknv.project import Project
+
+from docknv.utils.ioutils import io_open
+from docknv.tests.utils import using_temporary_directory, copy_sample
+
+from docknv.watcher import (
+    INOTIFY_EVENT,
+    IN_Q_OVERFLOW,
+    InotifyWatcher,
+    PollingWatcher,
+    WATCHER_OVERFLOW,
+    watcher_classify_path,
+    watcher_get_affected_configurations,
+    watcher_wait_for_changes,
+)
+
+CONFIG_DATA = """\
+config:
+    services: ["portainer", "pouet"]
+    volumes: ["portainer"]
+    networks: ["net"]
+    environment: default
+    user: test
+    namespace:
+config2:
+    services: ["pouet"]
+    volumes: []
+    networks: []
+    environment: inclusion2
+    user: test
+    namespace: pouet
+"""
+
+
+def _load_project(tempdir):
+    project_path = copy_sample("sample01", tempdir)
+    project_config_root = os.path.join(project_path, ".docknv")
+    os.makedirs(project_config_root)
+    with io_open(
+        os.path.join(project_config_root, ".docknv.yml"), mode="w"
+    ) as handle:
+        handle.write(CONFIG_DATA)
+
+    return Project.load_from_path(project_path)
+
+
+def test_classify_path():
+    """Classify path test."""
+    assert watcher_classify_path("/p", "/p/composefiles/a.yml") == (
+        "composefile",
+        os.path.join("composefiles", "a.yml"),
+    )
+    assert watcher_classify_path("/p", "/p/envs/default.env.yml") == (
+        "environment",
+        "default",
+    )
+    assert watcher_classify_path("/p", "/p/data/files/a/b.j2") == (
+        "file",
+        "a/b.j2",
+    )
+    assert watcher_classify_path("/p", "/p/envs/notes.txt") == (None, None)
+    assert watcher_classify_path("/p", "/p/config.yml") == (None, None)
+    assert watcher_classify_path("/p", WATCHER_OVERFLOW) == ("overflow", None)
+
+
+def test_affected_configurations():
+    """Affected configurations test."""
+    with using_temporary_directory() as tempdir:
+        project = _load_project(tempdir)
+        project_path = project.project_path
+        database = project.database
+        configs = [
+            database.get_configuration("config"),
+            database.get_configuration("config2"),
+        ]
+        compose_def = ComposeDefinition.load_from_project(project_path)
+
+        def affected(*paths):
+            return watcher_get_affected_configurations(
+                compose_def,
+                configs,
+                [os.path.join(project_path, p) for p in paths],
+            )
+
+        # Composefiles impact everything
+        changes = affected("composefiles/sample.yml")
+        assert list(changes.keys()) == ["config", "config2"]
+        assert changes["config"].compose
+
+        # Environments impact configurations importing them
+        changes = affected("envs/inclusion.env.yml")
+        assert list(changes.keys()) == ["config2"]
+        changes = affected("envs/default.env.yml")
+        assert list(changes.keys()) == ["config", "config2"]
+
+        # Templates only need rendering
+        changes = affected("data/files/portainer/template-test.txt.j2")
+        assert list(changes.keys()) == ["config"]
+        assert not changes["config"].compose
+        assert changes["config"].templates == {
+            "portainer/template-test.txt.j2"
+        }
+        assert changes["config"].services == {"portainer"}
+
+        # Static files need a regeneration
+        changes = affected("data/files/portainer/test.txt")
+        assert changes["config"].compose
+
+        # Deleted folders impact volumes under them
+        changes = affected("data/files/portainer")
+        assert list(changes.keys()) == ["config"]
+        assert changes["config"].compose
+        assert changes["config"].templates == {
+            "portainer/template-test.txt.j2",
+            "portainer/bash-test.sh.j2",
+        }
+
+        # Lost events impact everything
+        changes = watcher_get_affected_configurations(
+            compose_def, configs, {WATCHER_OVERFLOW}
+        )
+        assert list(changes.keys()) == ["config", "config2"]
+        assert changes["config"].compose
+        assert changes["config"].services == {"portainer", "pouet"}
+        assert changes["config2"].compose
+
+        # Unrelated files
+        assert len(affected("data/files/unknown.txt", "README.md")) == 0
+
+
+@pytest.mark.parametrize("watcher_class", [PollingWatcher, InotifyWatcher])
+def test_watchers(watcher_class):
+    """Watchers test."""
+    with using_temporary_directory() as tempdir:
+        watched = os.path.join(tempdir, "watched")
+        os.makedirs(watched)
+
+        try:
+            if watcher_class is PollingWatcher:
+                watcher = PollingWatcher([watched], interval=0.05)
+            else:
+                watcher = InotifyWatcher([watched])
+        except OSError:
+            pytest.skip("inotify unavailable")
+
+        try:
+            assert watcher.poll(0.1) == set()
+
+            path = os.path.join(watched, "file.txt")
+            with io_open(path, mode="w") as handle:
+                handle.write("hello")
+
+            assert path in watcher_wait_for_changes(
+                watcher, debounce=0.1, timeout=2
+            )
+            assert watcher_wait_for_changes(watcher, timeout=0.1) == set()
+
+            # New folders are watched too
+            os.makedirs(os.path.join(watched, "sub"))
+            watcher_wait_for_changes(watcher, debounce=0.1, timeout=0.5)
+            sub_path = os.path.join(watched, "sub", "file.txt")
+            with io_open(sub_path, mode="w") as handle:
+                handle.write("hello")
+
+            assert sub_path in watcher_wait_for_changes(
+                watcher, debounce=0.1, timeout=2
+            )
+
+            # Deleted folders
+            os.remove(sub_path)
+            os.rmdir(os.path.join(watched, "sub"))
+            changes = watcher_wait_for_changes(
+                watcher, debounce=0.1, timeout=2
+            )
+            assert sub_path in changes
+            if watcher_class is InotifyWatcher:
+                assert os.path.join(watched, "sub") in changes
+        finally:
+            watcher.close()
+
+
+def test_inotify_overflow():
+    """Lost inotify events."""
+    with using_temporary_directory() as tempdir:
+        try:
+            watcher = InotifyWatcher([tempdir])
+        except OSError:
+            pytest.skip("inotify unavailable")
+
+        # Events from a pipe, as an overflowing queue would send
+        read_fd, write_fd = os.pipe()
+        os.close(watcher.fd)
+        watcher.fd = read_fd
+        try:
+            os.write(write_fd, INOTIFY_EVENT.pack(-1, IN_Q_OVERFLOW, 0, 0))
+            assert watcher.poll(1) == {WATCHER_OVERFLOW}
+        finally:
+            os.close(write_fd)
+            watcher.close()
+
+
+def test_apply_source_changes():
+    """Apply source changes test."""
+    with using_temporary_directory() as tempdir:
+        project = _load_project(tempdir)
+        project_path = project.project_path
+        lifecycle = project.lifecycle
+        lifecycle.config.regenerate(["config", "config2"])
+
+        config = project.database.get_configuration("config")
+        rendered_path = os.path.join(
+            config.get_path(), "data", "templates", "portainer", "bash-test.sh"
+        )
+        os.remove(rendered_path)
+
+        changes = lifecycle.config.apply_source_changes(
+            [
+                os.path.join(
+                    project_path,
+                    "data",
+                    "files",
+                    "portainer",
+                    "bash-test.sh.j2",
+                )
+            ],
+            ["config", "config2"],
+            restart=True,
+            dry_run=True,
+        )
+        assert list(changes.keys()) == ["config"]
+        assert os.path.exists(rendered_path)
+
+        composefile_path = config.get_composefile_path()
+        os.remove(composefile_path)
+        changes = lifecycle.config.apply_source_changes(
+            [os.path.join(project_path, "envs", "default.env.yml")],
+            ["config"],
+            restart=True,
+            dry_run=True,
+        )
+        assert changes["config"].compose
+        assert os.path.exists(composefile_path)
+
+
+def test_watch_reloads_database():
+    """Watch follows configurations edited meanwhile."""
+    with using_temporary_directory() as tempdir:
+        project = _load_project(tempdir)
+        database_path = os.path.join(
+            project.project_path, ".docknv", ".docknv.yml"
+        )
+        env_path = os.path.join(
+            project.project_path, "envs", "default.env.yml"
+        )
+
+        calls = []
+
+        def _wait_for_changes(watcher, debounce):
+            if calls:
+                raise KeyboardInterrupt()
+
+            with io_open(database_path, mode="a") as handle:
+                handle.write(
+                    "config3:\n"
+                    "    services: []\n"
+                    "    volumes: []\n"
+                    "    networks: []\n"
+                    "    environment: default\n"
+                    "    user: test\n"
+                    "    namespace: three\n"
+                )
+            return {env_path}
+
+        lifecycle = project.lifecycle
+        with mock.patch.object(
+            lifecycle.config,
+            "apply_source_changes",
+            side_effect=lambda paths, names, **kwargs: calls.append(names),
+        ):
+            with mock.patch(
+                "docknv.lifecycle.models.watcher_wait_for_changes",
+                side_effect=_wait_for_changes,
+            ):
+                with mock.patch("docknv.lifecycle.models.watcher_create"):
+                    lifecycle.config.watch(all_configs=True, dry_run=True)
+
+        assert calls == [["config", "config2", "config3"]]
+        assert "config3" in project.database.configurations
@@ -1,15 +1,30 @@
 """Wrapper tests."""
 
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
 import pytest
 
 from docknv.wrapper import (
+    docker_ps,
+    docker_stat_is_dir,
+    docker_stat_path,
     exec_process,
-    exec_process_with_output,
+    exec_process_async,
+    exec_process_output,
+    exec_processes,
     exec_docker,
     exec_compose,
     FailedCommandExecution,
 )
 
+from docknv.tests.mocking import fake_container, using_fake_docker_client
+from docknv.tests.utils import using_temporary_directory
+
 
 def test_wrapper():
     """Wrapper test."""
@@ -28,19 +43,126 @@ def test_wrapper():
         exec_process(["ls", "/a/b/c/d"])
 
 
-def test_wrapper_with_output():
+def test_wrapper_with_output(capsys):
     """Output test."""
-    ret = exec_process_with_output(["ls"])
+    ret = exec_process(["echo", "a  'b'"], filters=[lambda line: True])
+    assert ret == 0
+    assert _get_output(capsys.readouterr().out) == ["a  'b'"]
+
+    # Filters, by stream
+    ret = exec_process(
+        ["sh", "-c", "echo one; echo two; echo three >&2"],
+        filters=[lambda line: line != "two"],
+    )
     assert ret == 0
+    captured = capsys.readouterr()
+    assert _get_output(captured.out) == ["one"]
+    assert captured.err == "three\n"
+
+    with pytest.raises(FailedCommandExecution):
+        exec_process(["ls"], filters=[lambda line: 0 / 0])
+
+    with pytest.raises(FailedCommandExecution):
+        exec_process(["ls", "/a/b/c/d"], filters=[lambda line: True])
 
-    ret = exec_process_with_output(["ls"], outfilter=lambda *args: True)
+    # Captured
+    result = exec_process_output(["sh", "-c", "echo one; echo two >&2"])
+    assert result.returncode == 0
+    assert result.stdout == ["one"]
+    assert result.stderr == ["two"]
+    assert _get_output(capsys.readouterr().out) == []
+
+    result = exec_process_output(["ls", "/a/b/c/d"], check=False)
+    assert result.returncode != 0
+    assert result.stderr
+
+    # Timeout
+    started = time.monotonic()
+    with pytest.raises(FailedCommandExecution, match="timeout"):
+        exec_process(["sleep", "10"], timeout=0.2)
+    assert time.monotonic() - started < 5
+
+
+def test_wrapper_lines():
+    """Line output test."""
+    lines = []
+    processes = []
+    ret = exec_process(
+        ["sh", "-c", "echo one; echo two >&2"],
+        on_line=lines.append,
+        on_start=processes.append,
+    )
     assert ret == 0
+    assert sorted(lines) == ["one", "two"]
+    assert len(processes) == 1
 
     with pytest.raises(FailedCommandExecution):
-        exec_process_with_output(["ls"], outfilter=lambda *args: 0 / 0)
+        exec_process(["ls", "/a/b/c/d"], on_line=lines.append)
 
+
+def test_wrapper_concurrency():
+    """Concurrent processes test."""
+    lines = []
+    started = time.monotonic()
+    ret = exec_processes(
+        [["sh", "-c", f"sleep 0.3; echo {i}"] for i in range(3)],
+        on_line=lambda index, line: lines.append((index, line)),
+    )
+    assert ret == [0, 0, 0]
+    assert sorted(lines) == [(0, "0"), (1, "1"), (2, "2")]
+    assert time.monotonic() - started < 0.9
+
+    # Fail fast
+    started = time.monotonic()
     with pytest.raises(FailedCommandExecution):
-        exec_process_with_output(["ls", "/a/b/c/d"])
+        exec_processes([["sleep", "10"], ["ls", "/a/b/c/d"]])
+    assert time.monotonic() - started < 5
+
+    assert exec_processes([["a"], ["b"]], dry_run=True) == [["a"], ["b"]]
+
+    # Cancellation
+    async def _cancel():
+        task = asyncio.ensure_future(
+            exec_process_async(["sleep", "10"], capture=True)
+        )
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    started = time.monotonic()
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(_cancel())
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    assert time.monotonic() - started < 5
+
+
+@pytest.mark.skipif(
+    sys.version_info >= (3, 12), reason="child watchers are deprecated"
+)
+def test_wrapper_thread():
+    """Execute processes from another thread."""
+    # Python 3.6 default watcher, only attached to the main thread loop
+    policy = asyncio.get_event_loop_policy()
+    watcher = policy.get_child_watcher()
+    policy.set_child_watcher(asyncio.SafeChildWatcher())
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [
+                pool.submit(exec_process, ["echo", "toto"]),
+                pool.submit(exec_process_output, ["echo", "tutu"]),
+            ]
+            assert futures[0].result(timeout=10) == 0
+            assert futures[1].result(timeout=10).stdout == ["tutu"]
+
+        # Still usable from the main thread
+        assert exec_process(["echo", "toto"]) == 0
+    finally:
+        policy.set_child_watcher(watcher)
 
 
 def test_docker():
@@ -72,3 +194,67 @@ def test_compose():
         "/project",
         "start",
     ]
+
+
+def test_docker_ps():
+    """Docker ps test."""
+    containers = [
+        fake_container("project", "web", status="Up 1 second (healthy)"),
+        fake_container("project", "ns_web"),
+        fake_container("project", "ns_web", 2),
+    ]
+
+    with using_fake_docker_client(containers) as client:
+        infos = docker_ps(client, "project")
+        assert [info["name"] for info in infos] == [
+            "project_web_1",
+            "project_ns_web_1",
+            "project_ns_web_2",
+        ]
+        assert infos[0] == {
+            "id": "project_web_1-id",
+            "name": "project_web_1",
+            "service": "web",
+            "number": 1,
+            "oneoff": False,
+            "status": "running",
+            "health": "healthy",
+            "ports": "80/tcp",
+        }
+        assert infos[1]["health"] is None
+        assert client.api.calls == [
+            (False, {"label": ["com.docker.compose.project=project"]})
+        ]
+
+        # Cached
+        assert len(docker_ps(client, "project", namespace_name="ns")) == 2
+        assert len(docker_ps(client, "project", service_names=["web"])) == 1
+        assert len(client.api.calls) == 1
+
+        docker_ps(client, "project", include_stopped=True)
+        assert len(client.api.calls) == 2
+
+        # State changes clear the cache
+        exec_docker("/project", ["stop", "project_web_1"], dry_run=True)
+        docker_ps(client, "project")
+        assert len(client.api.calls) == 3
+
+
+def _get_output(out):
+    # Without debug logs
+    return [line for line in out.splitlines() if "[DEBUG]" not in line]
+
+
+def test_docker_stat_path():
+    """Docker path stat test."""
+    with using_temporary_directory() as tempdir:
+        os.makedirs(os.path.join(tempdir, "ctr", "data"))
+        with using_fake_docker_client([], tempdir) as client:
+            # Paths are not archived
+            with mock.patch.object(
+                client.api, "get_archive", side_effect=AssertionError
+            ):
+                stat = docker_stat_path(client, "ctr", "/data")
+                assert stat["name"] == "data"
+                assert docker_stat_is_dir(stat)
+                assert docker_stat_path(client, "ctr", "/missing") is None